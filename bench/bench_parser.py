@@ -0,0 +1,106 @@
+"""Benchmark suite of the parsers and translators (pytest-benchmark)
+
+Run from the repository root (see README: benchmark):
+    python bench/run_benchmarks.py --save  # baseline of this machine (clean tree, before a change)
+    python bench/run_benchmarks.py  # fails if mean is 25% slower than the baseline
+"""
+
+import copy
+import json
+import pytest
+from config_generator import ConfigSpec, generate_config
+
+# see bench/pytest.ini, pythonpath (added ../src dir to pythonpath)
+# pylint: disable=import-error,wrong-import-position,protected-access
+pytest.importorskip("pytest_benchmark")
+import parse_bgp_policy as parse_bp  # noqa: E402
+import post_bgp_policies  # noqa: E402
+from json_io import OUTPUT_FORMATS  # noqa: E402
+from xr_translator import PMEncoder, XRTranslator  # noqa: E402
+
+# pylint: enable=import-error,wrong-import-position
+
+# sizes of generated configs (keep them fixed to compare with the baseline)
+SPECS = {
+    "small": ConfigSpec(prefix_lists=20, policies=20, terms=4, depth=1, communities=20, neighbors=8),
+    "large": ConfigSpec(prefix_lists=200, policies=50, terms=2, depth=3, communities=200, neighbors=64),
+}
+OS_TYPES = ["juniper", "cisco_ios_xr"]
+
+
+@pytest.fixture(scope="module", name="ttp_results")
+def fixture_ttp_results() -> dict:
+    """TTP parsed results of generated configs: (os_type, size) -> result"""
+    return {
+        (os_type, size): parse_bp._ttp_parse(generate_config(os_type, spec), os_type)
+        for os_type in OS_TYPES
+        for size, spec in SPECS.items()
+    }
+
+
+@pytest.fixture(scope="module", name="policy_models")
+def fixture_policy_models(ttp_results) -> dict:
+    """Policy models (as read from policy_model_output) of generated configs: size -> [juniper, cisco_ios_xr]"""
+    models = {}
+    for size in SPECS:
+        juniper = parse_bp._convert_juniper_ttp_result(copy.deepcopy(ttp_results[("juniper", size)]), "juniper")
+        xr = parse_bp._convert_cisco_ios_xr_ttp_result(copy.deepcopy(ttp_results[("cisco_ios_xr", size)]), "xr")
+        models[size] = [json.loads(json.dumps(m, cls=PMEncoder)) for m in [juniper, xr]]
+    return models
+
+
+def _pedantic(benchmark, func, data, rounds: int = 5):
+    # converters may modify their input: give a copy for each round (copy is not measured)
+    return benchmark.pedantic(func, setup=lambda: ((copy.deepcopy(data),), {}), rounds=rounds, warmup_rounds=1)
+
+
+@pytest.mark.parametrize("size", SPECS)
+@pytest.mark.parametrize("os_type", OS_TYPES)
+def test_ttp_parse(benchmark, os_type, size):
+    config_txt = generate_config(os_type, SPECS[size])
+    parse_bp._ttp_parse(config_txt, os_type)  # compile template (cached)
+    result = benchmark(parse_bp._ttp_parse, config_txt, os_type)
+    assert parse_bp.valid_parsed_result(os_type, size, result[0][0])
+
+
+@pytest.mark.parametrize("size", SPECS)
+@pytest.mark.parametrize("os_type", OS_TYPES)
+def test_native_parse(benchmark, ttp_results, os_type, size):
+    config_txt = generate_config(os_type, SPECS[size])
+    result = benchmark(parse_bp._parse_config, config_txt, os_type, "native")
+    ttp_result = copy.deepcopy(ttp_results[(os_type, size)])
+    if os_type == "cisco_ios_xr":
+        ttp_result[0][0].pop("vars")  # template variables (not in native result)
+    assert result == ttp_result
+
+
+@pytest.mark.parametrize("size", SPECS)
+def test_convert_juniper_ttp_to_policy_model(benchmark, ttp_results, size):
+    policy_model = _pedantic(benchmark, parse_bp._convert_juniper_ttp_to_policy_model, ttp_results[("juniper", size)])
+    assert len(policy_model["policies"]) >= SPECS[size].policies
+
+
+@pytest.mark.parametrize("size", SPECS)
+def test_xr_translate_policies(benchmark, ttp_results, size):
+    def _translate(ttp_result):
+        translator = XRTranslator(ttp_result)
+        translator.translate_policies()
+        return translator
+
+    translator = _pedantic(benchmark, _translate, ttp_results[("cisco_ios_xr", size)])
+    assert len(translator.policies) >= SPECS[size].policies
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+def test_save_file(benchmark, tmp_path, ttp_results, output_format):
+    policy_model = parse_bp._convert_cisco_ios_xr_ttp_result(copy.deepcopy(ttp_results[("cisco_ios_xr", "large")]), "")
+    save_file = benchmark(parse_bp._save_file, str(tmp_path), "xr", policy_model, True, output_format)
+    assert save_file.endswith(OUTPUT_FORMATS[output_format])
+
+
+@pytest.mark.parametrize("size", SPECS)
+def test_pack_policies(benchmark, policy_models, size):
+    # a snapshot of 50 devices
+    bgp_policies = policy_models[size] * 25
+    packed = benchmark(post_bgp_policies._pack_policies, bgp_policies)
+    assert len(packed["node"]) == len(bgp_policies)
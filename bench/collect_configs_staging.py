@@ -0,0 +1,73 @@
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout, redirect_stderr
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+import collect_configs as cc  # noqa: E402
+
+# pylint: enable=wrong-import-position
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "test", "inputs")
+
+
+def detect_src_file_name_linear(src_dir: str, node_name: str) -> str | None:
+    # collect_configs.detect_src_file_name before directory index (listdir and regex for each node)
+    for file_name in os.listdir(src_dir):
+        if re.match(rf"{node_name}.*", file_name, flags=re.IGNORECASE):
+            return file_name
+    return None
+
+
+def generate_snapshot(base_dir: str, files: int) -> list:
+    """Generate a snapshot which has config files and node_props"""
+    src_dir = os.path.join(base_dir, "src", "bench", "original_asis", "configs")
+    os.makedirs(src_dir)
+    with open(os.path.join(INPUT_DIR, "cisco_ios_xr.conf"), "r", encoding="utf-8") as f:
+        config_txt = f.read()
+    node_props = []
+    for i in range(files):
+        with open(os.path.join(src_dir, f"node-{i:05d}.cfg"), "w", encoding="utf-8") as f:
+            f.write(config_txt)
+        node_props.append({"Node": f"node-{i:05d}", "Configuration_Format": "CISCO_IOS_XR"})
+    return node_props
+
+
+def _measure(func, *func_args) -> float:
+    start = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+        func(*func_args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark node-to-config resolution and staging of configs")
+    parser.add_argument("--files", "-f", default=5000, type=int, help="Number of config files in a snapshot")
+    parser.add_argument("--lookup-samples", default=500, type=int, help="Number of nodes to look up by linear scan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        node_props = generate_snapshot(tmp_dir, args.files)
+        cc.CONFIGS_DIR = os.path.join(tmp_dir, "src")
+        cc.TTP_CONFIGS_DIR = os.path.join(tmp_dir, "configs")
+        src_dir = os.path.join(cc.CONFIGS_DIR, "bench", "original_asis", "configs")
+
+        # linear scan is too slow for all nodes: estimate from samples
+        samples = node_props[:: max(len(node_props) // args.lookup_samples, 1)]
+        linear = _measure(lambda: [detect_src_file_name_linear(src_dir, n["Node"]) for n in samples])
+        linear = linear / len(samples) * len(node_props)
+        indexed = _measure(lambda: [cc.ConfigIndex(src_dir).find(n["Node"]) for n in node_props[:1]])
+        index = cc.ConfigIndex(src_dir)
+        indexed += _measure(lambda: [index.find(n["Node"]) for n in node_props])
+        print(f"files: {args.files}")
+        print(f"- resolve nodes: linear scan: {linear:.3f} sec (estimated), index: {indexed:.3f} sec")
+
+        for staging_mode in cc.STAGING_MODES:
+            elapsed = _measure(cc.copy_configs, "bench", "original_asis", node_props, staging_mode)
+            print(f"- staging {staging_mode:>8}: {elapsed:.3f} sec")
+            shutil.rmtree(cc.TTP_CONFIGS_DIR, ignore_errors=True)
@@ -0,0 +1,92 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+import parse_bgp_policy as parse_bp  # noqa: E402
+from config_filter import filter_config, prescreen_config  # noqa: E402
+
+# pylint: enable=wrong-import-position
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "test", "inputs")
+
+
+def _juniper_firewall(entries: int) -> str:
+    lines = ["firewall {", "    family inet {"]
+    for i in range(entries):
+        lines.extend(
+            [
+                f"        filter filter-{i} {{",
+                f"            term term-{i} {{",
+                "                from {",
+                f"                    source-address {{ 10.{i // 256 % 256}.{i % 256}.0/24; }}",
+                "                    protocol tcp;",
+                "                }",
+                "                then discard;",
+                "            }",
+                "        }",
+            ]
+        )
+    lines.extend(["    }", "}"])
+    return "\n".join(lines) + "\n"
+
+
+def _cisco_ios_xr_acl(entries: int) -> str:
+    lines = []
+    for i in range(entries):
+        lines.extend(
+            [
+                f"interface GigabitEthernet0/0/{i // 64}/{i % 64}",
+                f" ipv4 address 172.{16 + i // 65536 % 16}.{i // 256 % 256}.{i % 256} 255.255.255.254",
+                f" ipv4 access-group acl-{i} ingress",
+                "!",
+                f"ipv4 access-list acl-{i}",
+                f" 10 permit tcp 10.{i // 256 % 256}.{i % 256}.0 0.0.0.255 any eq bgp",
+                " 20 deny ipv4 any any",
+                "!",
+            ]
+        )
+    return "\n".join(lines) + "\n"
+
+
+def generate_large_config(os_type: str, entries: int) -> str:
+    """Add firewall filters (juniper) or interfaces and ACLs (cisco_ios_xr) to test config"""
+    with open(os.path.join(INPUT_DIR, f"{os_type}.conf"), "r", encoding="utf-8") as f:
+        config_txt = f.read()
+    if os_type == "juniper":
+        return config_txt.replace("policy-options {", _juniper_firewall(entries) + "policy-options {", 1)
+    return config_txt.replace("prefix-set ", _cisco_ios_xr_acl(entries) + "prefix-set ", 1)
+
+
+def _measure(func, *func_args) -> float:
+    start = time.perf_counter()
+    func(*func_args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark config filter before TTP parse")
+    parser.add_argument("--entries", "-e", default="1000,5000", type=str, help="Numbers of filters/ACLs to add")
+    args = parser.parse_args()
+
+    for os_type in ["juniper", "cisco_ios_xr"]:
+        for entries in [int(e) for e in args.entries.split(",")]:
+            config = generate_large_config(os_type, entries)
+            full = _measure(parse_bp._ttp_parse, config, os_type)
+            filter_time = _measure(filter_config, config, os_type)
+            filtered = _measure(parse_bp._ttp_parse, filter_config(config, os_type), os_type)
+            print(
+                f"{os_type:>12}: {len(config) / 1024**2:5.1f} MiB config, "
+                f"full: {full:7.3f} sec, filter+parse: {filter_time + filtered:7.3f} sec "
+                f"(filter {filter_time:.3f} sec, x{full / (filter_time + filtered):.1f})"
+            )
+
+            # non-BGP device: prescreen (scan whole file) instead of parse
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".conf") as f:
+                f.write(config.replace("router bgp ", "router ospf ").replace("    bgp {", "    ospf {"))
+                f.flush()
+                prescreen = _measure(prescreen_config, f.name, os_type)
+            print(f"{'':>12}  without bgp: prescreen: {prescreen:7.3f} sec (x{full / prescreen:.1f})")
@@ -0,0 +1,127 @@
+import argparse
+import gzip
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# the only API of model-conductor used by post_bgp_policies
+POLICIES_PATH = re.compile(r"^/conduct/[^/]+/[^/]+/topology/bgp_proc/policies$")
+
+
+class ModelConductorStub:
+    """Local stand-in of model-conductor: accepts node-attribute patches, records their sizes
+    and injects latency (fixed + proportional to the patch size, to simulate merge time)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, latency_per_mib: float = 0.0):
+        self.latency = latency
+        self.latency_per_mib = latency_per_mib
+        self.records = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        """host:port to set to MODEL_CONDUCTOR_HOST"""
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self) -> "ModelConductorStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "ModelConductorStub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.records.clear()
+
+    def stats(self) -> dict:
+        """Summary of recorded requests (bytes: on the wire, raw_bytes: after decompression)"""
+        with self._lock:
+            records = list(self.records)
+        return {
+            "requests": len(records),
+            "bytes": sum(r["bytes"] for r in records),
+            "raw_bytes": sum(r["raw_bytes"] for r in records),
+            "nodes": sum(r["nodes"] for r in records),
+        }
+
+    def record(self, path: str, body: bytes, encoding: str | None) -> None:
+        raw_body = gzip.decompress(body) if encoding == "gzip" else body
+        nodes = len(json.loads(raw_body)["node"])
+        time.sleep(self.latency + self.latency_per_mib * len(raw_body) / 1024**2)
+        with self._lock:
+            self.records.append(
+                {"path": path, "bytes": len(body), "raw_bytes": len(raw_body), "nodes": nodes, "encoding": encoding}
+            )
+
+    def _handler_class(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive (connection pool of requests)
+
+            def _reply(self, status: int, data: dict) -> None:
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not POLICIES_PATH.match(self.path):
+                    self._reply(404, {"error": f"{self.path} is not found"})
+                    return
+                try:
+                    stub.record(self.path, body, self.headers.get("Content-Encoding"))
+                except (OSError, ValueError, KeyError) as e:
+                    self._reply(400, {"error": str(e)})
+                    return
+                self._reply(200, {})
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                if self.path != "/stats":
+                    self._reply(404, {"error": f"{self.path} is not found"})
+                    return
+                self._reply(200, stub.stats())
+
+            def do_DELETE(self):  # pylint: disable=invalid-name
+                stub.reset()
+                self._reply(200, {})
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in of model-conductor (GET/DELETE /stats)")
+    parser.add_argument("--host", default="127.0.0.1", type=str, help="Listen address")
+    parser.add_argument("--port", "-p", default=9292, type=int, help="Listen port")
+    parser.add_argument("--latency", default=0.0, type=float, help="Latency of each request (sec)")
+    parser.add_argument("--latency-per-mib", default=0.0, type=float, help="Latency per MiB of patches (sec)")
+    args = parser.parse_args()
+
+    with ModelConductorStub(args.host, args.port, args.latency, args.latency_per_mib) as model_conductor:
+        print(f"listen: {model_conductor.host} (set MODEL_CONDUCTOR_HOST={model_conductor.host})")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
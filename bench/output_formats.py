@@ -0,0 +1,41 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+from json_io import OUTPUT_FORMATS, dump_json, load_json  # noqa: E402
+from xr_translator import PMEncoder  # noqa: E402
+from policy_model_serialization import generate_policy_model_output  # noqa: E402
+
+# pylint: enable=wrong-import-position
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark output formats of policy model")
+    parser.add_argument("--statements", "-s", default=10000, type=int, help="Number of statements in a device")
+    args = parser.parse_args()
+
+    policy_model = generate_policy_model_output("slots", args.statements)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for output_format in OUTPUT_FORMATS:
+            file_path_wo_ext = os.path.join(tmp_dir, output_format)
+            start = time.perf_counter()
+            file_path = dump_json(policy_model, file_path_wo_ext, output_format, encoder=PMEncoder)
+            write_time = time.perf_counter() - start
+
+            tracemalloc.start()
+            dump_json(policy_model, file_path_wo_ext, output_format, encoder=PMEncoder)
+            _, write_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            load_json(file_path)
+            read_time = time.perf_counter() - start
+            print(
+                f"{output_format:>8}: {os.path.getsize(file_path) / 1024**2:6.2f} MiB, "
+                f"write: {write_time:.3f} sec (peak memory {write_peak / 1024**2:5.2f} MiB), read: {read_time:.3f} sec"
+            )
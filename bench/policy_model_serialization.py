@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict, is_dataclass
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+from xr_translator import AddressFamily, BGPNeighbor, PMEncoder, PolicyModel, Statement  # noqa: E402
+
+# pylint: enable=wrong-import-position
+
+
+# model classes before slots/to_dict
+@dataclass
+class LegacyStatement:
+    name: str = ""
+    conditions: list[dict] = field(default_factory=list)
+    actions: list[dict] = field(default_factory=list)
+
+
+@dataclass
+class LegacyPolicyModel:
+    name: str = ""
+    statements: list[LegacyStatement] = field(default_factory=list)
+    default: dict = field(default_factory=dict)
+
+
+@dataclass
+class LegacyAddressFamily:
+    afi: str
+    safi: str
+    send_community_ebgp: bool = False
+    next_hop_self: bool = False
+    remove_private_as: bool = False
+    route_policy_in: str = ""
+    route_policy_out: str = ""
+
+
+@dataclass
+class LegacyBGPNeighbor:
+    remote_as: int
+    remote_ip: str
+    address_families: list[LegacyAddressFamily] = field(default_factory=list)
+
+
+class LegacyPMEncoder(json.JSONEncoder):
+    def default(self, o):
+        if is_dataclass(o):
+            return asdict(o)
+        return json.JSONEncoder.default(self, o)
+
+
+MODEL_CLASSES = {
+    "legacy": (LegacyStatement, LegacyPolicyModel, LegacyAddressFamily, LegacyBGPNeighbor),
+    "slots": (Statement, PolicyModel, AddressFamily, BGPNeighbor),
+}
+
+
+def generate_policy_model_output(model: str, statements: int, per_policy: int = 10) -> dict:
+    """Generate policy model output of a device which has the number of statements"""
+    statement_class, policy_class, af_class, neighbor_class = MODEL_CLASSES[model]
+    policies = []
+    for i in range(statements // per_policy):
+        policy = policy_class(name=f"rp-{i}", default={"actions": [{"target": "reject"}]})
+        for j in range(per_policy):
+            policy.statements.append(
+                statement_class(
+                    name=f"rp-{i}-{j * 10}",
+                    conditions=[
+                        {"policy": f"if-condition-rp-{i}-{j * 10}"},
+                        {
+                            "route-filter": {
+                                "prefix": f"10.{i % 256}.{j}.0/24",
+                                "match-type": "exact",
+                                "length": {"min": "24", "max": "24"},
+                            }
+                        },
+                    ],
+                    actions=[{"local-preference": "200"}, {"community": {"action": "add", "name": f"com-{j}"}}],
+                )
+            )
+        policies.append(policy)
+    neighbors = [
+        neighbor_class(
+            remote_as=65001,
+            remote_ip=f"172.16.{i // 256}.{i % 256}",
+            address_families=[af_class(afi="ipv4", safi="unicast", route_policy_in=f"rp-{i}")],
+        )
+        for i in range(100)
+    ]
+    return {
+        "node": "192.168.255.1",
+        "prefix-set": [],
+        "as-path-set": [],
+        "community-set": [],
+        "policies": policies,
+        "bgp_neighbors": neighbors,
+    }
+
+
+def _measure_memory(model: str, statements: int) -> int:
+    tracemalloc.start()
+    data = generate_policy_model_output(model, statements)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size
+
+
+def _measure_serialize(data: dict, encoder: type, repeat: int) -> tuple[float, str]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = json.dumps(data, indent=2, cls=encoder)
+    return (time.perf_counter() - start) / repeat, output
+
+
+def _measure_write_peak_memory(data: dict, encoder: type, streaming: bool) -> int:
+    with tempfile.TemporaryFile("w", encoding="utf-8") as f:
+        tracemalloc.start()
+        if streaming:
+            json.dump(data, f, indent=2, cls=encoder)
+        else:
+            f.write(json.dumps(data, indent=2, cls=encoder))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark memory and serialization of policy model classes")
+    parser.add_argument("--statements", "-s", default=10000, type=int, help="Number of statements in a device")
+    parser.add_argument("--repeat", "-r", default=5, type=int, help="Number of times to serialize")
+    args = parser.parse_args()
+
+    outputs = {}
+    # legacy: asdict + json.dumps, slots: to_dict + json.dump (streaming write)
+    for model, encoder, streaming in [("legacy", LegacyPMEncoder, False), ("slots", PMEncoder, True)]:
+        memory = _measure_memory(model, args.statements)
+        policy_model = generate_policy_model_output(model, args.statements)
+        elapsed, outputs[model] = _measure_serialize(policy_model, encoder, args.repeat)
+        write_peak = _measure_write_peak_memory(policy_model, encoder, streaming)
+        print(
+            f"{model:>6}: model memory: {memory / 1024**2:6.2f} MiB, serialize: {elapsed:.3f} sec, "
+            f"peak memory to write: {write_peak / 1024**2:6.2f} MiB"
+        )
+    print(f"output: {len(outputs['slots']) / 1024**2:.1f} MiB, identical: {outputs['legacy'] == outputs['slots']}")
@@ -0,0 +1,37 @@
+import argparse
+import glob
+import os
+import sys
+import pytest
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# saved results of this machine (machine-specific: not in the repository)
+STORAGE_DIR = os.path.join(BENCH_DIR, ".benchmarks")
+# fail if mean of a benchmark is slower than the baseline by this percentage
+MAX_REGRESSION = int(os.environ.get("MDDO_BENCH_MAX_REGRESSION", "25"))
+
+
+def _has_baseline() -> bool:
+    return bool(glob.glob(os.path.join(STORAGE_DIR, "*", "*.json")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the benchmark suite and fail on regression against the baseline saved on this machine"
+    )
+    parser.add_argument("--save", action="store_true", help="Save a baseline (run on a clean tree before a change)")
+    parser.add_argument(
+        "--max-regression", type=int, default=MAX_REGRESSION, help="Allowed regression of mean time (%%)"
+    )
+    parser.add_argument("pytest_args", nargs="*", help="Arguments passed to pytest (e.g. -k native)")
+    args = parser.parse_args()
+
+    pytest_args = [BENCH_DIR, f"--benchmark-storage={STORAGE_DIR}", *args.pytest_args]
+    if args.save:
+        pytest_args.append("--benchmark-save=baseline")
+    elif _has_baseline():
+        # compare with the latest saved baseline
+        pytest_args += ["--benchmark-compare", f"--benchmark-compare-fail=mean:{args.max_regression}%"]
+    else:
+        sys.exit(f"no baseline in {STORAGE_DIR}: save a baseline on this machine first (--save)")
+    sys.exit(pytest.main(pytest_args))
@@ -0,0 +1,124 @@
+import argparse
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout, redirect_stderr
+from model_conductor_stub import ModelConductorStub
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+import collect_configs as cc  # noqa: E402
+import post_bgp_policies as post_bp  # noqa: E402
+from app import app  # noqa: E402
+
+# pylint: enable=wrong-import-position
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "test", "inputs")
+NETWORK = "bench"
+SNAPSHOT = "original_asis"
+# source configs (default of collect_configs.CONFIGS_DIR is same as TTP_CONFIGS_DIR, cleaned up before parse)
+SRC_CONFIGS_DIR = "src_configs"
+# loopback address (node-id) in input configs
+LOOPBACKS = {"juniper": re.compile(r"192\.168\.255\.5\b"), "cisco_ios_xr": re.compile(r"192\.168\.255\.2\b")}
+# a policy change of a router (what-if)
+POLICY_CHANGES = {
+    "juniper": ("prefix-length-range /25-/32", "prefix-length-range /26-/32"),
+    "cisco_ios_xr": ("0.0.0.0/0 ge 25", "0.0.0.0/0 ge 26"),
+}
+# topology API request body of each scenario
+SCENARIOS = {
+    "single": {"mode": "single"},
+    "batch": {"mode": "batch"},
+    "delta": {"mode": "single", "delta": True},
+}
+
+
+def _node(i: int) -> tuple[str, str]:
+    return f"node-{i:05d}", "juniper" if i % 2 == 0 else "cisco_ios_xr"
+
+
+def generate_snapshot(nodes: int) -> None:
+    """Generate configs and node_props of a snapshot in current directory (default dirs of the tools)"""
+    config_dir = os.path.join(SRC_CONFIGS_DIR, NETWORK, SNAPSHOT, "configs")
+    queries_dir = os.path.join("queries", NETWORK, SNAPSHOT)
+    os.makedirs(config_dir)
+    os.makedirs(queries_dir)
+    config_txts = {}
+    for os_type in LOOPBACKS:
+        with open(os.path.join(INPUT_DIR, f"{os_type}.conf"), "r", encoding="utf-8") as f:
+            config_txts[os_type] = f.read()
+
+    with open(os.path.join(queries_dir, "node_props.csv"), "w", encoding="utf-8") as f:
+        f.write("Node,Configuration_Format\n")
+        for i in range(nodes):
+            node, os_type = _node(i)
+            loopback = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+            with open(os.path.join(config_dir, f"{node}.cfg"), "w", encoding="utf-8") as cf:
+                cf.write(LOOPBACKS[os_type].sub(loopback, config_txts[os_type]))
+            f.write(f"{node},{os_type.upper()}\n")
+
+
+def toggle_policy_change(i: int) -> None:
+    """Change (or revert) the policy of a node"""
+    node, os_type = _node(i)
+    config_file = os.path.join(SRC_CONFIGS_DIR, NETWORK, SNAPSHOT, "configs", f"{node}.cfg")
+    with open(config_file, "r", encoding="utf-8") as f:
+        config_txt = f.read()
+    before, after = POLICY_CHANGES[os_type]
+    config_txt = config_txt.replace(after, before) if after in config_txt else config_txt.replace(before, after)
+    with open(config_file, "w", encoding="utf-8") as f:
+        f.write(config_txt)
+
+
+def _request(client, path: str, body: dict) -> tuple[float, dict]:
+    start = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+        response = client.post(f"/bgp_policy/{NETWORK}/{SNAPSHOT}/{path}", json=body)
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"{path}: {response.status_code} {response.get_json()}")
+    return elapsed, response.get_json()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parse -> post (topology API) with local model-conductor")
+    parser.add_argument("--nodes", "-n", default=200, type=int, help="Number of nodes in a snapshot")
+    parser.add_argument("--jobs", "-j", default=1, type=int, help="Number of worker processes to parse")
+    parser.add_argument("--latency", default=0.0, type=float, help="Latency of each post (sec)")
+    parser.add_argument("--latency-per-mib", default=0.5, type=float, help="Latency per MiB of patches (sec)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # ttp warns template lines (and MDDO_LOG_LEVEL may be set)
+    cwd = os.getcwd()
+    with (
+        tempfile.TemporaryDirectory() as tmp_dir,
+        ModelConductorStub(latency=args.latency, latency_per_mib=args.latency_per_mib) as model_conductor,
+    ):
+        os.chdir(tmp_dir)
+        generate_snapshot(args.nodes)
+        cc.CONFIGS_DIR = os.path.join(tmp_dir, SRC_CONFIGS_DIR)
+        post_bp.BGP_POLICIES_DIR = os.path.join(tmp_dir, "policy_model_output")
+        post_bp.MODEL_CONDUCTOR_HOST = model_conductor.host
+        test_client = app.test_client()
+
+        # base of delta post
+        _request(test_client, "parsed_result", {"jobs": args.jobs})
+        _request(test_client, "topology", {"mode": "single"})
+
+        print(f"nodes: {args.nodes}, a node is changed from the previous post in each scenario")
+        for scenario, topology_body in SCENARIOS.items():
+            toggle_policy_change(0)
+            model_conductor.reset()
+            parse_time, _ = _request(test_client, "parsed_result", {"jobs": args.jobs})
+            post_time, _ = _request(test_client, "topology", topology_body)
+            stats = model_conductor.stats()
+            print(
+                f"- {scenario:>6}: end-to-end: {parse_time + post_time:.3f} sec "
+                f"(parse: {parse_time:.3f} sec, post: {post_time:.3f} sec), "
+                f"sent: {stats['bytes'] / 1024:.1f} KiB ({stats['raw_bytes'] / 1024:.1f} KiB uncompressed), "
+                f"nodes: {stats['nodes']}, requests: {stats['requests']} ({stats['requests'] / post_time:.1f} req/sec)"
+            )
+        os.chdir(cwd)
@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+import time
+from ttp import ttp
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+import parse_bgp_policy as parse_bp  # noqa: E402
+
+# pylint: enable=wrong-import-position
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "test", "inputs")
+
+
+def _ttp_parse_uncached(text: str, os_type: str) -> list:
+    # compile template for each config (parse_bgp_policy._ttp_parse before template cache)
+    template_file = os.path.join(parse_bp.TTP_TEMPLATES_DIR, f"{os_type}.ttp")
+    parser = ttp(text, template_file)
+    parser.parse()
+    return parser.result()
+
+
+def _measure(parse_func, configs: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for os_type, text in configs:
+            parse_func(text, os_type)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TTP template cache")
+    parser.add_argument("--repeat", "-r", default=50, type=int, help="Number of times to parse each config")
+    args = parser.parse_args()
+
+    configs = []
+    for os_type in ["juniper", "cisco_ios_xr"]:
+        with open(os.path.join(INPUT_DIR, f"{os_type}.conf"), "r", encoding="utf-8") as f:
+            configs.append((os_type, f.read()))
+    files = len(configs) * args.repeat
+
+    # warm up (ttp function modules are loaded lazily)
+    _measure(_ttp_parse_uncached, configs, 1)
+    _measure(parse_bp._ttp_parse, configs, 1)
+
+    uncached = _measure(_ttp_parse_uncached, configs, args.repeat)
+    cached = _measure(parse_bp._ttp_parse, configs, args.repeat)
+    print(f"files: {files}")
+    print(f"- compile template for each file: {uncached:.3f} sec ({uncached / files * 1000:.2f} msec/file)")
+    print(f"- cached template               : {cached:.3f} sec ({cached / files * 1000:.2f} msec/file)")
+    print(f"- overhead removed              : {(uncached - cached) / files * 1000:.2f} msec/file")
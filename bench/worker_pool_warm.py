@@ -0,0 +1,67 @@
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+import parse_bgp_policy as parse_bp  # noqa: E402
+from worker_pool import WorkerPool  # noqa: E402
+
+# pylint: enable=wrong-import-position
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "test", "inputs")
+NETWORK = "bench"
+SNAPSHOT = "original_asis"
+
+
+def _stage_snapshot(nodes: int) -> None:
+    # configs in TTP_CONFIGS_DIR (default: ./configs) of current directory
+    for i in range(nodes):
+        os_type = "juniper" if i % 2 == 0 else "cisco_ios_xr"
+        config_dir = os.path.join(parse_bp.TTP_CONFIGS_DIR, NETWORK, SNAPSHOT, os_type)
+        os.makedirs(config_dir, exist_ok=True)
+        shutil.copy(os.path.join(INPUT_DIR, f"{os_type}.conf"), os.path.join(config_dir, f"node-{i:05d}.conf"))
+
+
+def _measure(options: parse_bp.ParseOptions, requests: int, executor=None) -> list:
+    elapsed = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        parse_bp.parse_bgp_policies(NETWORK, SNAPSHOT, options, executor=executor)
+        elapsed.append(time.perf_counter() - start)
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark back-to-back parse requests with a warm worker pool")
+    parser.add_argument("--nodes", "-n", default=20, type=int, help="Number of nodes in a snapshot")
+    parser.add_argument("--jobs", "-j", default=4, type=int, help="Number of worker processes")
+    parser.add_argument("--requests", "-r", default=5, type=int, help="Number of back-to-back requests")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # ttp warns template lines
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        _stage_snapshot(args.nodes)
+        parse_options = parse_bp.ParseOptions(jobs=args.jobs, save_ttp_output=False)
+
+        # workers are started (and compile templates) for each request
+        cold = _measure(parse_options, args.requests)
+        boot_start = time.perf_counter()
+        pool = WorkerPool(args.jobs, max_tasks_per_child=0).start()
+        boot = time.perf_counter() - boot_start
+        try:
+            warm = _measure(parse_options, args.requests, pool)
+        finally:
+            pool.shutdown()
+        os.chdir(cwd)
+
+    print(f"nodes: {args.nodes}, workers: {args.jobs}, requests: {args.requests}")
+    print(f"- workers for each request: {sum(cold) / len(cold):.3f} sec/request (first: {cold[0]:.3f} sec)")
+    print(f"- warm worker pool        : {sum(warm) / len(warm):.3f} sec/request (first: {warm[0]:.3f} sec)")
+    print(f"  (pool start-up at boot  : {boot:.3f} sec)")
@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Union
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+from xr_translator import XRTranslator, PolicyModel, PMEncoder  # noqa: E402
+
+# pylint: enable=wrong-import-position
+
+
+class LinearScanXRTranslator(XRTranslator):
+    """XRTranslator with linear scan of policies and sets (before name indexes)"""
+
+    def get_policy_by_name(self, name: str) -> Union[PolicyModel, None]:
+        result = [p for p in self.policies if p.name == name]
+        if len(result) == 0:
+            return None
+        return result[0]
+
+    def convert_prefix_list_into_route_filter(self, prefix_list_name: str) -> list:
+        for item in self.prefix_set:
+            if item["name"] == prefix_list_name:
+                return [{"route-filter": prefix_item} for prefix_item in item["prefixes"]]
+        return []
+
+    def check_prefix_list_only_exact_matchtype(self, prefix_list_name: str) -> bool | None:
+        for item in self.prefix_set:
+            if item["name"] == prefix_list_name:
+                return all(prefix_item["match-type"] == "exact" for prefix_item in item["prefixes"])
+        return None
+
+    def create_community_set_in_and_condition(self, communities: list):
+        names = []
+        members = []
+        for item in communities:
+            for community_set in self.community_set:
+                if "community" in item and community_set["name"] == item["community"][0]:
+                    names.append(item["community"][0])
+                    members.extend(community_set["communities"])
+        self.community_set.append({"name": "-and-".join(names), "communities": members})
+        return self.community_set[-1]["name"]
+
+
+def generate_ttp_parsed_data(policies: int, sets: int = 100) -> list:
+    """Generate TTP parsed data (IOS-XR) with route-policies which have nested if/elseif/else"""
+    prefix_sets = [
+        {"name": f"pfx-{i}", "prefixes": [{"prefix": f"10.{i // 256 % 256}.{i % 256}.0/24"}]} for i in range(sets)
+    ]
+    community_sets = [{"name": f"com-{i}", "communities": [{"community": f"65000:{i}"}]} for i in range(sets)]
+    route_policies = []
+    for i in range(policies):
+        route_policies.append(
+            {
+                "name": f"rp-{i}",
+                "rules": [
+                    {
+                        "if": "if",
+                        "condition": {"op": "state", "matches": [f"destination in pfx-{(sets - 1 - i) % sets}"]},
+                        "rules": [
+                            {
+                                "if": "if",
+                                "condition": {
+                                    "op": "and",
+                                    "matches": [
+                                        f"community matches-any com-{(sets - 1 - i) % sets}",
+                                        f"community matches-any com-{i % sets}",
+                                    ],
+                                },
+                                "rules": [{"action": "set", "attr": "local-preference", "value": "200"}],
+                            },
+                            {"action": "done"},
+                        ],
+                    },
+                    {
+                        "if": "elseif",
+                        "condition": {"op": "state", "matches": [f"community matches-any com-{(i + 1) % sets}"]},
+                        "rules": [{"action": "set", "attr": "med", "value": "100"}, {"action": "pass"}],
+                    },
+                    {"if": "else", "rules": [{"action": "drop"}]},
+                ],
+            }
+        )
+    neighbors = [
+        {
+            "remote-as": "65001",
+            "remote-ip": f"172.16.{i // 256}.{i % 256}",
+            "address-families": [
+                {
+                    "afi": "ipv4",
+                    "safi": "unicast",
+                    "configs": {
+                        "attrs": [{"value": "next-hop-self"}],
+                        "route-policy": {"in": f"rp-{i}", "out": f"rp-{policies - i - 1}"},
+                    },
+                }
+            ],
+        }
+        for i in range(min(policies, 100))
+    ]
+    return [
+        [
+            {
+                "interfaces": [{"name": "Loopback0", "ipv4": {"address": "192.168.255.1", "mask": "255.255.255.255"}}],
+                "prefix-sets": prefix_sets,
+                "community-sets": community_sets,
+                "policies": route_policies,
+                "bgp": {"asn": "65000", "neighbors": neighbors},
+            }
+        ]
+    ]
+
+
+def _measure(translator_class: type, ttp_parsed_data: list) -> float:
+    start = time.perf_counter()
+    translator = translator_class(ttp_parsed_data)
+    translator.translate_policies()
+    return time.perf_counter() - start
+
+
+def _measure_dedupe(ttp_parsed_data: list, dedupe: bool) -> str:
+    start = time.perf_counter()
+    translator = XRTranslator(ttp_parsed_data, dedupe_conditional_policies=dedupe)
+    translator.translate_policies()
+    elapsed = time.perf_counter() - start
+    output_bytes = len(json.dumps(translator.policies, cls=PMEncoder))
+    return f"{elapsed:8.3f} sec, {len(translator.policies):>6} policies, {output_bytes / 1024**2:6.1f} MiB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark XRTranslator with many route-policies")
+    parser.add_argument("--sizes", default="1000,5000,20000", type=str, help="Numbers of route-policies")
+    parser.add_argument("--sets", default=100, type=int, help="Numbers of prefix-sets and community-sets")
+    parser.add_argument(
+        "--compare-max", default=5000, type=int, help="Max number of route-policies to measure linear scan version"
+    )
+    parser.add_argument("--dedupe", action="store_true", help="Compare with/without dedupe of conditional policies")
+    args = parser.parse_args()
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        data = generate_ttp_parsed_data(size, args.sets)
+        indexed = _measure(XRTranslator, data)
+        result = f"route-policies: {size:>6}, name index: {indexed:8.3f} sec"
+        if size <= args.compare_max:
+            linear = _measure(LinearScanXRTranslator, data)
+            result += f", linear scan: {linear:8.3f} sec (x{linear / indexed:.1f})"
+        print(result)
+        if args.dedupe:
+            print(f"  - without dedupe: {_measure_dedupe(data, False)}")
+            print(f"  - with dedupe   : {_measure_dedupe(data, True)}")
@@ -1,35 +1,228 @@
+import atexit
 import logging
-from flask import Flask, jsonify
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Tuple
+from flask import Flask, g, jsonify, request
 from flask.logging import create_logger
+from werkzeug.serving import is_running_from_reloader
 import collect_configs as cc
 import parse_bgp_policy as parse_bp
 import post_bgp_policies as post_bp
+from parse_jobs import ParseJobManager, ParseJobConflict
+from json_io import OUTPUT_FORMATS
+from instrumentation import StageRecorder
+from log_config import LOG_LEVEL, setup_logging
+from worker_pool import WorkerPool, WORKER_POOL_SIZE
+import metrics
 
 app = Flask(__name__)
 app_logger = create_logger(app)
-logging.basicConfig(level=logging.DEBUG)
-# logging.basicConfig(level=logging.WARNING)
+# MDDO_LOG_LEVEL for flask (root logger) and the tools (main logger, TRACE: per-rule logs of translators)
+logging.basicConfig(level=LOG_LEVEL)
+setup_logging()
 
 
-@app.route("/bgp_policy/<network>/<snapshot>/parsed_result", methods=["POST"])
-def post_parsed_result(network: str, snapshot: str):
+# debug mode of flask (with the reloader) when run by this script
+API_DEBUG = os.environ.get("MDDO_API_DEBUG", "true").lower() == "true"
+
+job_manager = ParseJobManager()
+# long-lived workers shared by requests (started by _start_worker_pool)
+worker_pool = WorkerPool(WORKER_POOL_SIZE) if WORKER_POOL_SIZE > 0 else None
+_worker_pool_lock = threading.Lock()
+_worker_pool_started = threading.Event()
+
+
+def _start_worker_pool() -> None:
+    """Start the worker pool once in a process serving the app
+    It is started at boot when run by this script, or by the first request otherwise (e.g. each gunicorn worker)
+    """
+    if worker_pool is None or _worker_pool_started.is_set():
+        return
+    with _worker_pool_lock:
+        if _worker_pool_started.is_set():
+            return
+        worker_pool.start()
+        # graceful shutdown: finish running devices, cancel queued ones
+        atexit.register(worker_pool.shutdown, cancel_futures=True)
+        _worker_pool_started.set()
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    _start_worker_pool()
+
+
+@app.after_request
+def _observe_request(response):
+    # endpoint label is the URL rule (not the path) to keep the number of label values small
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.REQUEST_DURATION.observe(
+        time.perf_counter() - g.request_start,
+        method=request.method,
+        endpoint=endpoint,
+        status=str(response.status_code),
+    )
+    return response
+
+
+def _parse_snapshot(
+    network: str,
+    snapshot: str,
+    parse_options: parse_bp.ParseOptions,
+    progress: Callable[[Dict, int, int], None] | None = None,
+    staging_mode: str = cc.STAGING_MODE,
+) -> Dict:
+    def _progress(result: Dict, done: int, total: int) -> None:
+        metrics.observe_parse_result(result)
+        if progress:
+            progress(result, done, total)
+
+    recorder = StageRecorder(parse_options.trace_memory)
     # cleanup
-    cc.cleanup_snapshot_dir(network, snapshot)
+    with recorder.stage("cleanup"):
+        cc.cleanup_snapshot_dir(network, snapshot)
     # collect configs
     node_props = cc.read_node_props(network, snapshot)
-    cc.copy_configs(network, snapshot, node_props)
-    # parse bgp policy
-    parse_bp.parse_juniper_bgp_policy(network, snapshot)
-    parse_bp.parse_cisco_ios_xr_bgp_policy(network, snapshot)
-    # response
-    return jsonify({})
+    config_files = cc.copy_configs(network, snapshot, node_props, staging_mode, recorder)
+    # parse bgp policy (the summary includes stages and is saved as run manifest)
+    return parse_bp.parse_bgp_policies(
+        network, snapshot, parse_options, _progress, config_files, recorder=recorder, executor=worker_pool
+    )
+
+
+def _bool_option(req: Dict, key: str, default: bool) -> bool:
+    """Get a flag of a request, only JSON true/false is accepted (bool("false") is True)
+    Raises:
+        ValueError: the value is not a JSON boolean
+    """
+    value = req.get(key, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"{key} must be true or false: {value!r}")
+    return value
+
+
+def _number_option(req: Dict, key: str, default: Any, integer: bool = False) -> Any:
+    """Get a (finite) number of a request, strings and booleans are not accepted
+    Raises:
+        ValueError: the value is not a JSON number (integer if integer is True)
+    """
+    value = req.get(key, default)
+    types = int if integer else (int, float)
+    if isinstance(value, bool) or not isinstance(value, types) or not math.isfinite(value):
+        raise ValueError(f"{key} must be {'an integer' if integer else 'a number'}: {value!r}")
+    return value
+
+
+def _parse_request_options(req: Dict) -> Tuple[parse_bp.ParseOptions, str, bool]:
+    """Get options of a parse request
+    Args:
+        req (Dict): Request body
+    Returns:
+        Tuple[ParseOptions, str, bool]: parse options, staging mode and whether to run asynchronously
+    Raises:
+        ValueError: an option has a wrong type or an unknown value
+    """
+    parse_options = parse_bp.ParseOptions()
+    parse_options.jobs = _number_option(req, "jobs", parse_options.jobs, integer=True)
+    parse_options.device_timeout = float(_number_option(req, "device_timeout", parse_options.device_timeout))
+    for flag in [
+        "save_ttp_output",
+        "dedupe_conditional_policies",
+        "filter_config",
+        "prescreen",
+        "trace_memory",
+        "referenced_only",
+    ]:
+        setattr(parse_options, flag, _bool_option(req, flag, getattr(parse_options, flag)))
+    parse_options.output_format = req.get("output_format", parse_options.output_format)
+    if parse_options.output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown output format: {parse_options.output_format}")
+    parse_options.parser_backend = req.get("parser_backend", parse_options.parser_backend)
+    if parse_options.parser_backend not in parse_bp.PARSER_BACKENDS:
+        raise ValueError(f"unknown parser backend: {parse_options.parser_backend}")
+    staging_mode = req.get("staging_mode", cc.STAGING_MODE)
+    if staging_mode not in cc.STAGING_MODES:
+        raise ValueError(f"unknown staging mode: {staging_mode}")
+    return parse_options, staging_mode, _bool_option(req, "async", False)
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return metrics.registry.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+
+@app.route("/bgp_policy/<network>/<snapshot>/parsed_result", methods=["POST"])
+def post_parsed_result(network: str, snapshot: str):
+    req = request.get_json(silent=True) or {}
+    try:
+        parse_options, staging_mode, run_async = _parse_request_options(req)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # sync and async requests are jobs: a snapshot staged (cleaned up) by a running job is not touched by others
+    work = partial(_parse_snapshot, network, snapshot, parse_options, staging_mode=staging_mode)
+    try:
+        if not run_async:
+            run_summary = job_manager.run(network, snapshot, work)
+            # response
+            return jsonify(run_summary)
+
+        # async: run in background, the job status can be polled with job ID
+        job = job_manager.submit(network, snapshot, work)
+    except ParseJobConflict as e:
+        return jsonify({"error": str(e), "job_id": e.job_id}), 409
+    return jsonify({"job_id": job.job_id, "state": job.state}), 202, {"Location": f"/jobs/{job.job_id}"}
+
+
+@app.route("/jobs", methods=["GET"])
+def get_jobs():
+    return jsonify(job_manager.list_jobs())
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id: str):
+    job_status = job_manager.get(job_id)
+    if job_status is None:
+        return jsonify({"error": f"job:{job_id} is not found"}), 404
+    return jsonify(job_status)
 
 
 @app.route("/bgp_policy/<network>/<snapshot>/topology", methods=["POST"])
 def post_topology_data(network: str, snapshot: str):
-    response = post_bp.post_bgp_policy(network, snapshot)
-    return jsonify({"status": response.status_code})
+    req = request.get_json(silent=True) or {}
+    mode = req.get("mode", post_bp.POST_MODE)
+    if mode not in post_bp.POST_MODES:
+        return jsonify({"error": f"unknown post mode: {mode}"}), 400
+    try:
+        trace_memory = _bool_option(req, "trace_memory", parse_bp.TRACE_MEMORY)
+        delta = _bool_option(req, "delta", post_bp.POST_DELTA)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    recorder = StageRecorder(trace_memory)
+    if delta:
+        # status, node-ids of posted/unchanged/removed nodes
+        result = post_bp.post_bgp_policy_delta(network, snapshot, mode, recorder)
+        return jsonify({**result, "stages": recorder.to_dict()})
+    response = post_bp.post_bgp_policy(network, snapshot, mode, recorder)
+    return jsonify({"status": response.status_code, "stages": recorder.to_dict()})
+
+
+def _exit_on_sigterm(signum, _frame):
+    # raise SystemExit in the main thread to run atexit handlers (shutdown worker pool)
+    sys.exit(128 + signum)
 
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    # the reloader of debug mode serves the app in a child process and only watches files in the parent process:
+    # start workers unless this is the parent
+    if worker_pool and (not API_DEBUG or is_running_from_reloader()):
+        _start_worker_pool()
+        signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    app.run(debug=API_DEBUG, host="0.0.0.0", port=5000)
@@ -1,16 +1,22 @@
 import argparse
+import bisect
 import csv
+import errno
 import os
-import re
 import shutil
 import sys
-from typing import List
+from typing import Dict, List, Tuple
 
+from instrumentation import StageRecorder
 from parse_bgp_policy import TTP_OUTPUTS_DIR, TTP_CONFIGS_DIR, TTP_BGP_POLICIES_DIR
 
 CONFIGS_DIR = os.environ.get("MDDO_CONFIGS_DIR", "./configs")
 QUERIES_DIR = os.environ.get("MDDO_QUERIES_DIR", "./queries")
 OS_TYPES = ["JUNIPER", "CISCO_IOS_XR"]
+# how to stage configs into TTP_CONFIGS_DIR
+#   copy, hardlink (copy if not possible), symlink, none (parse source configs in place)
+STAGING_MODES = ["copy", "hardlink", "symlink", "none"]
+STAGING_MODE = os.environ.get("MDDO_STAGING_MODE", "copy")
 
 
 def cleanup_snapshot_dir(network: str, snapshot: str) -> None:
@@ -46,50 +52,124 @@ def read_node_props(network: str, snapshot: str) -> List:
     return rows
 
 
-def detect_src_file_name(src_dir: os.path, node_name: str) -> str | None:
+class ConfigIndex:
+    """Index of configuration files in a directory (read the directory once) to find a file by node name"""
+
+    def __init__(self, src_dir: str):
+        self.src_dir = src_dir
+        # (lower-cased file name, file name), sorted to search by prefix
+        self._names = sorted((file_name.lower(), file_name) for file_name in os.listdir(src_dir))
+        self._lower_names = [lower_name for lower_name, _ in self._names]
+        self._exact: Dict[str, str] = {}
+        self._stem: Dict[str, str] = {}
+        for lower_name, file_name in self._names:
+            self._exact.setdefault(lower_name, file_name)
+            self._stem.setdefault(os.path.splitext(lower_name)[0], file_name)
+
+    def find(self, node_name: str) -> str | None:
+        """Find configuration file name starting with node name (case-insensitive)
+        Args:
+            node_name (str): Node name
+        Returns:
+            str|None: configuration file name (None if not found)
+        """
+        key = node_name.lower()
+        # same name (without extension) is preferred to other names starting with the node name
+        if key in self._exact:
+            return self._exact[key]
+        if key in self._stem:
+            return self._stem[key]
+        i = bisect.bisect_left(self._lower_names, key)
+        if i < len(self._lower_names) and self._lower_names[i].startswith(key):
+            return self._names[i][1]
+        return None
+
+
+def detect_src_file_name(src_dir: os.path, node_name: str, index: ConfigIndex | None = None) -> str | None:
     """Detect configuration file name using node name
     Args:
         src_dir (os.path): Source, snapshot directory (path)
         node_name (str): Node name to find configuration file
+        index (ConfigIndex): Index of src_dir (read src_dir if not specified)
     Returns:
         str: configuration file name
     """
-    file_names = os.listdir(src_dir)
-    for file_name in file_names:
-        # NOTE: search configuration file name starting node name
-        if re.match(rf"{node_name}.*", file_name, flags=re.IGNORECASE):
-            return file_name
-    print(
-        f"Error: source config is not found in {src_dir}, node_name:{node_name}",
-        file=sys.stderr,
-    )
-    return None
-
-
-def copy_configs(network: str, snapshot: str, node_props: List) -> None:
+    # NOTE: search configuration file name starting node name
+    file_name = (index or ConfigIndex(src_dir)).find(node_name)
+    if file_name is None:
+        print(
+            f"Error: source config is not found in {src_dir}, node_name:{node_name}",
+            file=sys.stderr,
+        )
+    return file_name
+
+
+def _stage_file(src_file: str, dst_file: str, staging_mode: str) -> int:
+    # returns bytes written (0 if linked)
+    if os.path.lexists(dst_file):
+        os.remove(dst_file)
+    if staging_mode == "symlink":
+        os.symlink(os.path.abspath(src_file), dst_file)
+        return 0
+    if staging_mode == "hardlink":
+        try:
+            os.link(src_file, dst_file)
+            return 0
+        except OSError as e:
+            # e.g. different filesystem
+            if e.errno not in [errno.EXDEV, errno.EPERM, errno.EMLINK]:
+                raise
+    shutil.copy(src_file, dst_file)
+    return os.path.getsize(dst_file)
+
+
+def copy_configs(
+    network: str,
+    snapshot: str,
+    node_props: List,
+    staging_mode: str = STAGING_MODE,
+    recorder: StageRecorder | None = None,
+) -> List[Tuple[str, str]]:
     """Copy configurations for bgp-policy-parser
     Args:
         network (str): Network name
         snapshot (str): Snapshot name
         node_props (List): node_props data
+        staging_mode (str): How to stage configs (copy, hardlink, symlink, none)
+        recorder (StageRecorder): Recorder of stages (collect_configs stage)
     Returns:
-        None
+        List[Tuple[str, str]]: pairs of OS type and config file path to parse
+            (source config file path if staging_mode is none)
     """
-    src_dir = os.path.join(CONFIGS_DIR, network, snapshot, "configs")
-    for node_prop in node_props:
-        os_type = node_prop["Configuration_Format"].lower()
-        if os_type not in [t.lower() for t in OS_TYPES]:
-            continue
-
-        print("* node_prop: ", node_prop)
-        file_name = detect_src_file_name(src_dir, node_prop["Node"])
-        src_file = os.path.join(src_dir, file_name)
-
-        dst_dir = os.path.join(TTP_CONFIGS_DIR, network, snapshot, os_type)
-        os.makedirs(dst_dir, exist_ok=True)
-        dst_file = os.path.join(dst_dir, file_name)
-        print(f"  * copy {src_file} -> {dst_file}")
-        shutil.copy(src_file, dst_file)
+    if staging_mode not in STAGING_MODES:
+        raise ValueError(f"unknown staging mode: {staging_mode}")
+    recorder = recorder or StageRecorder()
+    with recorder.stage("collect_configs") as stage:
+        src_dir = os.path.join(CONFIGS_DIR, network, snapshot, "configs")
+        index = ConfigIndex(src_dir)
+        os_types = [t.lower() for t in OS_TYPES]
+        config_files = []
+        for node_prop in node_props:
+            os_type = node_prop["Configuration_Format"].lower()
+            if os_type not in os_types:
+                continue
+
+            print("* node_prop: ", node_prop)
+            file_name = detect_src_file_name(src_dir, node_prop["Node"], index)
+            if file_name is None:
+                continue
+            src_file = os.path.join(src_dir, file_name)
+            if staging_mode == "none":
+                config_files.append((os_type, src_file))
+                continue
+
+            dst_file = os.path.join(TTP_CONFIGS_DIR, network, snapshot, os_type, file_name)
+            os.makedirs(os.path.dirname(dst_file), exist_ok=True)
+            print(f"  * {staging_mode} {src_file} -> {dst_file}")
+            stage["bytes_out"] += _stage_file(src_file, dst_file, staging_mode)
+            config_files.append((os_type, dst_file))
+        stage["bytes_in"] += sum(os.path.getsize(config_file) for _, config_file in config_files)
+    return config_files
 
 
 if __name__ == "__main__":
@@ -102,7 +182,14 @@ if __name__ == "__main__":
         type=str,
         help="Specify a target snapshot name",
     )
+    parser.add_argument(
+        "--staging-mode",
+        default=STAGING_MODE if STAGING_MODE != "none" else "copy",
+        # none: only for API (parse_bgp_policy.py reads staged configs)
+        choices=[m for m in STAGING_MODES if m != "none"],
+        help="How to stage configs into configs dir for parser",
+    )
     args = parser.parse_args()
 
     node_props = read_node_props(args.network, args.snapshot)
-    copy_configs(args.network, args.snapshot, node_props)
+    copy_configs(args.network, args.snapshot, node_props, args.staging_mode)
@@ -0,0 +1,130 @@
+import argparse
+import re
+import sys
+from typing import Callable, List, Tuple
+
+# beginning of top-level (not indented) lines of a config
+# (starts with a literal to make regex search fast, instead of "^" with re.MULTILINE)
+TOP_LEVEL_LINE = re.compile(r"\n(?=\S)")
+# top-level stanzas used in TTP templates
+JUNIPER_STANZAS = {"interfaces", "protocols", "policy-options"}
+CISCO_IOS_XR_STANZAS = re.compile(
+    r"interface Loopback|(router bgp|route-policy|prefix-set|as-path-set|community-set) "
+)
+# lines which must be in a config to get valid parsed result (see parse_bgp_policy.valid_parsed_result)
+# NOTE: conservative, a config without them is never valid but a config with them may be invalid
+# (match from "\n" of the previous line, as same as TOP_LEVEL_LINE)
+PRESCREEN_MARKERS = {
+    "juniper": {
+        "bgp": re.compile(r"\n[ \t]*bgp[ \t]*\{"),
+        "loopback": re.compile(r"\n[ \t]*[Ll]o(opback)?\d\S*[ \t]*\{"),
+    },
+    "cisco_ios_xr": {
+        "bgp": re.compile(r"\n[ \t]*router bgp\b"),
+        "loopback": re.compile(r"\n[ \t]*interface [Ll]o(opback)?\d"),
+    },
+}
+PRESCREEN_CHUNK_SIZE = 1024**2
+
+
+def _juniper_line(line: str, keep: bool) -> Tuple[bool, bool]:
+    # stanza: "name {" ... "}"
+    if line.startswith("}"):
+        return keep, False
+    if line.rstrip().endswith("{"):
+        keep = line.split()[0] in JUNIPER_STANZAS
+        return keep, keep
+    return False, False
+
+
+def _cisco_ios_xr_line(line: str, keep: bool) -> Tuple[bool, bool]:
+    # stanza: "name ..." ... ("end-set"/"end-policy") "!"
+    if line.startswith("!"):
+        return keep, False
+    if line.startswith("end-"):
+        return keep, keep
+    keep = CISCO_IOS_XR_STANZAS.match(line) is not None
+    return keep, keep
+
+
+def _extract_stanzas(config_txt: str, classify: Callable[[str, bool], Tuple[bool, bool]]) -> str:
+    """Extract stanzas in a pass: a stanza is a top-level line and indented lines following it
+    Args:
+        config_txt (str): Text data of config file
+        classify (Callable): Function to decide (keep the line and its indented lines, keep following stanza)
+    Returns:
+        str: Extracted config text
+    """
+    chunks = []
+    keep = False
+    starts = [0] if config_txt[:1].strip() else []
+    starts.extend(m.end() for m in TOP_LEVEL_LINE.finditer(config_txt))
+    ends = starts[1:] + [len(config_txt)]
+    for start, end in zip(starts, ends):
+        line_end = config_txt.find("\n", start, end)
+        if line_end < 0:
+            line_end = end
+        emit, keep = classify(config_txt[start:line_end], keep)
+        if emit:
+            chunks.append(config_txt[start:end])
+    return "".join(chunks)
+
+
+def filter_config(config_txt: str, os_type: str) -> str:
+    """Keep only BGP-relevant top-level stanzas of a config (used in TTP templates)
+    Args:
+        config_txt (str): Text data of config file
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+    Returns:
+        str: Filtered config text (config_txt as-is if the format is not known)
+    """
+    if os_type == "juniper":
+        filtered = _extract_stanzas(config_txt, _juniper_line)
+    elif os_type == "cisco_ios_xr":
+        filtered = _extract_stanzas(config_txt, _cisco_ios_xr_line)
+    else:
+        return config_txt
+    # e.g. junos "set" style config: nothing is extracted, pass it to TTP as-is
+    return filtered or config_txt
+
+
+def prescreen_config(config_file: str, os_type: str, chunk_size: int = PRESCREEN_CHUNK_SIZE) -> List[str]:
+    """Scan a config file for BGP and loopback markers without parsing it
+    (read by chunks and stop as soon as all markers are found)
+    Args:
+        config_file (str): File path of a config file
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+        chunk_size (int): Size of chunk to read at once
+    Returns:
+        List[str]: Missing markers (empty if the config may have BGP policies)
+    """
+    markers = dict(PRESCREEN_MARKERS.get(os_type, {}))
+    rest = "\n"  # markers match from the end of previous line
+    with open(config_file, "r", encoding="utf-8") as f:
+        while markers:
+            chunk = f.read(chunk_size)
+            text = rest + chunk
+            if chunk:
+                # search complete lines, the last (partial) line is searched with next chunk
+                line_end = text.rfind("\n")
+                text, rest = text[:line_end], text[line_end:]
+            for name in [name for name, marker in markers.items() if marker.search(text)]:
+                del markers[name]
+            if not chunk:
+                break
+    return sorted(markers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print BGP-relevant stanzas of a config")
+    parser.add_argument("--os-type", "-o", required=True, choices=["juniper", "cisco_ios_xr"], help="OS type")
+    parser.add_argument("--prescreen", action="store_true", help="Print missing BGP/loopback markers instead")
+    parser.add_argument("config_file", type=str, help="Config file")
+    args = parser.parse_args()
+
+    if args.prescreen:
+        print(", ".join(prescreen_config(args.config_file, args.os_type)) or "ok")
+        sys.exit(0)
+
+    with open(args.config_file, "r", encoding="utf-8") as f:
+        sys.stdout.write(filter_config(f.read(), args.os_type))
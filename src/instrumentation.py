@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List
+
+# trace peak memory of stages with tracemalloc (slows down memory allocation, disabled by default)
+TRACE_MEMORY = os.environ.get("MDDO_TRACE_MEMORY", "false").lower() == "true"
+BGP_POLICIES_DIR = os.environ.get("MDDO_BGP_POLICIES_DIR", "./policy_model_output")
+STAGE_COUNTERS = ["count", "wall_time", "cpu_time", "bytes_in", "bytes_out"]
+
+
+def _new_stage() -> Dict:
+    return {"count": 0, "wall_time": 0.0, "cpu_time": 0.0, "peak_memory": None, "bytes_in": 0, "bytes_out": 0}
+
+
+def _max_memory(a: int | None, b: int | None) -> int | None:
+    return b if a is None else a if b is None else max(a, b)
+
+
+class _MemoryTracer:
+    """Peak memory of (nested or concurrent) stages with the process-global tracemalloc
+    tracemalloc is started by the first traced stage and stopped after the last one. Its peak is reset when a stage
+    starts: the peak until then is folded into stages already running, so a reset does not lose their peaks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: List[Dict] = []
+        self._started = False
+
+    def _fold_peak(self) -> int:
+        # call with lock: update peaks of running stages with the peak since last reset
+        current, peak = tracemalloc.get_traced_memory()
+        for trace in self._active:
+            trace["peak"] = max(trace["peak"], peak)
+        return current
+
+    def enter(self) -> Dict:
+        with self._lock:
+            if not self._active and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            current = self._fold_peak()
+            tracemalloc.reset_peak()
+            trace = {"base": current, "peak": current}
+            self._active.append(trace)
+        return trace
+
+    def exit(self, trace: Dict) -> int:
+        with self._lock:
+            self._fold_peak()
+            self._active.remove(trace)
+            if not self._active and self._started:
+                tracemalloc.stop()
+                self._started = False
+        return trace["peak"] - trace["base"]
+
+
+_memory_tracer = _MemoryTracer()
+
+
+class StageRecorder:
+    """Record wall time, CPU time (of the thread), peak memory and bytes in/out of stages
+    A stage recorded several times is accumulated (peak memory is the max of them).
+    NOTE: peak memory is traced for the whole process: it includes allocations of other threads
+    (e.g. other jobs running at the same time).
+    """
+
+    def __init__(self, trace_memory: bool = TRACE_MEMORY):
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict] = {}
+
+    @contextmanager
+    def stage(self, name: str, trace_memory: bool | None = None) -> Iterator[Dict]:
+        """Record a stage
+        Args:
+            name (str): Stage name
+            trace_memory (bool): Trace peak memory of the stage (default: recorder setting)
+        Yields:
+            Dict: Counters of the stage (add bytes_in/bytes_out to it)
+        """
+        trace_memory = self.trace_memory if trace_memory is None else trace_memory
+        counters = {"bytes_in": 0, "bytes_out": 0}
+        memory_trace = _memory_tracer.enter() if trace_memory else None
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield counters
+        finally:
+            wall_time, cpu_time = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            peak_memory = _memory_tracer.exit(memory_trace) if memory_trace else None
+            stage = self.stages.setdefault(name, _new_stage())
+            stage["count"] += 1
+            stage["wall_time"] += wall_time
+            stage["cpu_time"] += cpu_time
+            stage["peak_memory"] = _max_memory(stage["peak_memory"], peak_memory)
+            stage["bytes_in"] += counters["bytes_in"]
+            stage["bytes_out"] += counters["bytes_out"]
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """Recorded stages (times are rounded)
+        Returns:
+            Dict[str, Dict]: stage name -> count, wall_time, cpu_time, peak_memory, bytes_in, bytes_out
+        """
+        return {
+            name: {k: round(v, 6) if isinstance(v, float) else v for k, v in stage.items()}
+            for name, stage in self.stages.items()
+        }
+
+
+def merge_stages(stages_list: Iterable[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """Total of stages (e.g. stages of all devices)
+    Args:
+        stages_list (Iterable[Dict[str, Dict]]): Recorded stages (StageRecorder.to_dict)
+    Returns:
+        Dict[str, Dict]: stage name -> total counters (peak memory is the max of them)
+    """
+    merged = {}
+    for stages in stages_list:
+        for name, stage in stages.items():
+            total = merged.setdefault(name, _new_stage())
+            for key in STAGE_COUNTERS:
+                total[key] += stage[key]
+            total["peak_memory"] = _max_memory(total["peak_memory"], stage["peak_memory"])
+    for total in merged.values():
+        total["wall_time"] = round(total["wall_time"], 6)
+        total["cpu_time"] = round(total["cpu_time"], 6)
+    return merged
+
+
+def manifest_path(network: str, snapshot: str, base_dir: str = BGP_POLICIES_DIR) -> str:
+    # next to the snapshot directory of policy_model_output (files in the directory are read as bgp policies)
+    return os.path.join(base_dir, network, f"{snapshot}.manifest.json")
+
+
+def read_run_manifest(network: str, snapshot: str, base_dir: str = BGP_POLICIES_DIR) -> Dict:
+    """Read a run manifest
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        base_dir (str): Base directory of policy model output
+    Returns:
+        Dict: Run manifest (empty if not found)
+    """
+    try:
+        with open(manifest_path(network, snapshot, base_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_run_manifest(network: str, snapshot: str, manifest: Dict, base_dir: str = BGP_POLICIES_DIR) -> str:
+    """Write a run manifest (replace whole of it)
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        manifest (Dict): Run manifest
+        base_dir (str): Base directory of policy model output
+    Returns:
+        str: File path of the manifest
+    """
+    file_path = manifest_path(network, snapshot, base_dir)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def update_run_manifest(
+    network: str, snapshot: str, section: str, data: Dict, base_dir: str = BGP_POLICIES_DIR
+) -> str:
+    """Write a section of a run manifest (e.g. post after parse)
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        section (str): Section name
+        data (Dict): Data of the section
+        base_dir (str): Base directory of policy model output
+    Returns:
+        str: File path of the manifest
+    """
+    manifest = read_run_manifest(network, snapshot, base_dir) or {"network": network, "snapshot": snapshot}
+    manifest[section] = data
+    return write_run_manifest(network, snapshot, manifest, base_dir)
+
+
+def _format_stages(stages: Dict[str, Dict]) -> Iterator[str]:
+    yield f"{'stage':<20} {'count':>7} " + " ".join(
+        f"{h:>10}" for h in ["wall[s]", "cpu[s]", "peak[MiB]", "in[MiB]", "out[MiB]"]
+    )
+    for name, stage in stages.items():
+        peak = "-" if stage["peak_memory"] is None else f"{stage['peak_memory'] / 1024**2:.2f}"
+        yield (
+            f"{name:<20} {stage['count']:>7} {stage['wall_time']:>10.3f} {stage['cpu_time']:>10.3f} {peak:>10} "
+            f"{stage['bytes_in'] / 1024**2:>10.2f} {stage['bytes_out'] / 1024**2:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print stages of a run manifest")
+    parser.add_argument("--network", "-n", required=True, type=str, help="Specify a target network name")
+    parser.add_argument("--snapshot", "-s", default="original_asis", type=str, help="Specify a target snapshot name")
+    args = parser.parse_args()
+
+    run_manifest = read_run_manifest(args.network, args.snapshot)
+    for manifest_section in ["summary", "post"]:
+        if manifest_section in run_manifest:
+            print(f"# {manifest_section}")
+            print("\n".join(_format_stages(run_manifest[manifest_section].get("stages", {}))))
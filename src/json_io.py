@@ -0,0 +1,147 @@
+import argparse
+import gzip
+import json
+import os
+from typing import Any, Iterator, List
+
+# output format -> file extension
+OUTPUT_FORMATS = {
+    "pretty": ".json",  # indented JSON (default)
+    "compact": ".json",  # JSON without whitespaces
+    "gzip": ".json.gz",  # gzip compressed compact JSON
+    "ndjson": ".ndjson",  # newline delimited JSON (a line for each key/item, see _iter_ndjson)
+}
+OUTPUT_FORMAT = os.environ.get("MDDO_OUTPUT_FORMAT", "pretty")
+GZIP_COMPRESS_LEVEL = 6
+COMPACT_SEPARATORS = (",", ":")
+
+
+def _iter_compact(data: Any, encoder: type) -> Iterator[str]:
+    # encode each item of top-level (and its list values) at once:
+    # json.dump (streaming) can not use C encoder, json.dumps of whole data builds whole string in memory
+    def _dumps(o: Any) -> str:
+        return json.dumps(o, separators=COMPACT_SEPARATORS, cls=encoder)
+
+    def _iter_list(items: List) -> Iterator[str]:
+        yield "["
+        for i, item in enumerate(items):
+            yield f",{_dumps(item)}" if i else _dumps(item)
+        yield "]"
+
+    if isinstance(data, dict):
+        yield "{"
+        for i, (key, value) in enumerate(data.items()):
+            yield f",{_dumps(key)}:" if i else f"{_dumps(key)}:"
+            if isinstance(value, list):
+                yield from _iter_list(value)
+            else:
+                yield _dumps(value)
+        yield "}"
+    elif isinstance(data, list):
+        yield from _iter_list(data)
+    else:
+        yield _dumps(data)
+
+
+def _iter_ndjson(data: Any, encoder: type) -> Iterator[str]:
+    # dict: a line for each key ({key: value}), a line for each item of list value ({key: [item]})
+    # list: a line for each item ([item])
+    def _dumps(o: Any) -> str:
+        return json.dumps(o, separators=COMPACT_SEPARATORS, cls=encoder) + "\n"
+
+    if isinstance(data, dict):
+        if not data:
+            yield _dumps({})
+        for key, value in data.items():
+            if isinstance(value, list) and value:
+                for item in value:
+                    yield _dumps({key: [item]})
+            else:
+                yield _dumps({key: value})
+    elif isinstance(data, list):
+        if not data:
+            yield _dumps([])
+        for item in data:
+            yield _dumps([item])
+    else:
+        raise TypeError(f"ndjson output supports only dict or list, not {type(data).__name__}")
+
+
+def _remove_other_formats(file_path_wo_ext: str, ext: str) -> None:
+    # remove an output of same data in other format (it is read twice)
+    for other_ext in set(OUTPUT_FORMATS.values()) - {ext}:
+        if os.path.exists(f"{file_path_wo_ext}{other_ext}"):
+            os.remove(f"{file_path_wo_ext}{other_ext}")
+
+
+def dump_json(data: Any, file_path_wo_ext: str, output_format: str = OUTPUT_FORMAT, encoder: type = None) -> str:
+    """Write data to a file while encoding it (without building whole JSON string in memory)
+    Args:
+        data (Any): Data to write
+        file_path_wo_ext (str): File path without extension (extension is decided by output format)
+        output_format (str): Output format (pretty, compact, gzip, ndjson)
+        encoder (type): JSON encoder class
+    Returns:
+        str: File path of the written file
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown output format: {output_format}")
+    ext = OUTPUT_FORMATS[output_format]
+    file_path = f"{file_path_wo_ext}{ext}"
+    _remove_other_formats(file_path_wo_ext, ext)
+
+    if output_format == "pretty":
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, cls=encoder)
+    elif output_format == "compact":
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.writelines(_iter_compact(data, encoder))
+    elif output_format == "gzip":
+        with gzip.open(file_path, "wt", encoding="utf-8", compresslevel=GZIP_COMPRESS_LEVEL) as f:
+            f.writelines(_iter_compact(data, encoder))
+    else:
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.writelines(_iter_ndjson(data, encoder))
+    return file_path
+
+
+def _load_ndjson(lines: Iterator[str]) -> Any:
+    data = None
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if isinstance(record, list):
+            data = [] if data is None else data
+            data.extend(record)
+            continue
+        data = {} if data is None else data
+        for key, value in record.items():
+            if isinstance(value, list) and isinstance(data.get(key), list):
+                data[key].extend(value)
+            else:
+                data[key] = value
+    return data
+
+
+def load_json(file_path: str) -> Any:
+    """Read a file written by dump_json (in any output format)
+    Args:
+        file_path (str): File path
+    Returns:
+        Any: Data
+    """
+    if file_path.endswith(".gz"):
+        with gzip.open(file_path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    with open(file_path, "r", encoding="utf-8") as f:
+        if file_path.endswith(".ndjson"):
+            return _load_ndjson(f)
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print a JSON file written in any output format (as pretty)")
+    parser.add_argument("file", type=str, help="File written by parse_bgp_policy.py")
+    args = parser.parse_args()
+    print(json.dumps(load_json(args.file), indent=2))
@@ -0,0 +1,243 @@
+import argparse
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List
+
+# quoted string, /* annotation */, # comment (to end of line), braces/semicolon, word
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|/\*.*?\*/|#[^\n]*|[{};]|[^\s{};"]+', re.DOTALL)
+# top-level statements which have data of the policy model (same as template/juniper.ttp)
+TOP_LEVEL_BLOCKS = ["interfaces", "protocols", "policy-options"]
+
+
+@dataclass(slots=True)
+class Statement:
+    """A statement of a curly-brace config: words and children (None: leaf statement terminated by ';')"""
+
+    words: List[str]
+    children: List["Statement"] | None = None
+
+
+def _tokens(text: str) -> Iterator[str]:
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group()
+        if token[0] == "#" or token.startswith("/*"):
+            continue
+        yield token
+
+
+def _active_statements(statements: List[Statement]) -> List[Statement]:
+    # drop inactive statements and strip tags of statements (protect:, replace:)
+    active = []
+    for statement in statements:
+        if statement.words and statement.words[0] == "inactive:":
+            continue
+        if statement.words and statement.words[0] in ["protect:", "replace:"]:
+            statement.words = statement.words[1:]
+        if statement.children is not None:
+            statement.children = _active_statements(statement.children)
+        active.append(statement)
+    return active
+
+
+def parse_statements(text: str) -> List[Statement]:
+    """Parse a curly-brace (Junos) config into a statement tree
+    Args:
+        text (str): Config text
+    Returns:
+        List[Statement]: Top-level statements (inactive statements are dropped)
+    """
+    root: List[Statement] = []
+    stack = [root]
+    words = []
+    for token in _tokens(text):
+        if token == "{":
+            block = Statement(words, [])
+            stack[-1].append(block)
+            stack.append(block.children)
+            words = []
+        elif token == ";":
+            if words:
+                stack[-1].append(Statement(words))
+            words = []
+        elif token == "}":
+            words = []
+            if len(stack) > 1:
+                stack.pop()
+        else:
+            words.append(token)
+    return _active_statements(root)
+
+
+def _blocks(statements: List[Statement], keyword: str, length: int) -> Iterator[Statement]:
+    # blocks of `keyword <name>... {` which have `length` words
+    for statement in statements:
+        if statement.children is not None and len(statement.words) == length and statement.words[0] == keyword:
+            yield statement
+
+
+def _line(words: List[str]) -> str:
+    # join words with single spaces (as a line of TTP results split and joined)
+    return " ".join(" ".join(words).split())
+
+
+def _rule(words: List[str]) -> Dict:
+    if len(words) == 1:
+        return {"target": words[0]}
+    return {words[0]: _line(words[1:])}
+
+
+def _interface(statement: Statement) -> Dict:
+    # first unit/family/address of the interface (as matched by TTP)
+    interface = {}
+    for unit in _blocks(statement.children, "unit", 2):
+        interface.setdefault("unit", unit.words[1])
+        for family in _blocks(unit.children, "family", 2):
+            interface.setdefault("family", family.words[1])
+            for address in family.children:
+                if address.children is None and len(address.words) == 2 and address.words[0] == "address":
+                    interface.setdefault("address", address.words[1])
+    interface["name"] = statement.words[0]
+    return interface
+
+
+def _term(statement: Statement) -> List[Dict]:
+    rules = []
+    for child in statement.children:
+        if not child.words or child.words[0] not in ["from", "then"]:
+            continue
+        key = "conditions" if child.words[0] == "from" else "actions"
+        if child.children is None and len(child.words) > 1:
+            rules.append({key: [_rule(child.words[1:])]})
+        elif child.children is not None and len(child.words) == 1:
+            items = [_rule(c.words) for c in child.children if c.children is None and c.words]
+            if items:
+                rules.append({key: items})
+    return rules
+
+
+def _policy(statement: Statement) -> Dict:
+    policy = {"name": statement.words[1]}
+    for term in _blocks(statement.children, "term", 2):
+        policy.setdefault("statements", {})[term.words[1]] = _term(term)
+    for child in statement.children:
+        # default action of the policy (single line `then` as TTP template)
+        if child.children is None and len(child.words) > 1 and child.words[0] == "then":
+            policy["default"] = {"actions": [_rule(child.words[1:])]}
+    return policy
+
+
+def _community_members(words: List[str]) -> str:
+    return " ".join(words).strip("[").strip("]").strip(" ")
+
+
+def _community(statement: Statement) -> Dict | None:
+    if statement.children is None:
+        # community <name> members <members>;
+        if len(statement.words) < 4 or statement.words[2] != "members":
+            return None
+        return {"community": statement.words[1], "members": _community_members(statement.words[3:])}
+    community = {"community": statement.words[1]}
+    for child in statement.children:
+        if child.children is not None or not child.words:
+            continue
+        if child.words[0] == "members" and len(child.words) > 1:
+            community.setdefault("members", _community_members(child.words[1:]))
+        elif len(child.words) == 1:
+            community.setdefault("properties", []).append({"property": child.words[0]})
+    return community
+
+
+def _aspath_group(statement: Statement) -> Dict:
+    aspath_group = {"group-name": statement.words[1]}
+    for child in statement.children:
+        if child.children is None and len(child.words) > 2 and child.words[0] == "as-path":
+            pattern = " ".join(child.words[2:]).replace('"', "")
+            aspath_group.setdefault("as-path", []).append({"name": child.words[1], "pattern": pattern})
+    return aspath_group
+
+
+def _policy_options(statement: Statement, data: Dict) -> None:
+    for child in statement.children:
+        if len(child.words) < 2:
+            continue
+        keyword = child.words[0]
+        if keyword == "prefix-list" and child.children is not None and len(child.words) == 2:
+            prefix_set = {"name": child.words[1]}
+            for prefix in child.children:
+                if prefix.children is None and len(prefix.words) == 1:
+                    prefix_set.setdefault("prefixes", []).append({"prefix": prefix.words[0]})
+            data.setdefault("prefix-sets", []).append(prefix_set)
+        elif keyword == "policy-statement" and child.children is not None and len(child.words) == 2:
+            data.setdefault("policies", []).append(_policy(child))
+        elif keyword == "community":
+            community = _community(child)
+            if community:
+                data.setdefault("community-sets", []).append(community)
+        elif keyword == "as-path-group" and child.children is not None and len(child.words) == 2:
+            data.setdefault("aspath-sets", []).append(_aspath_group(child))
+
+
+def parse_junos_config(text: str) -> List:
+    """Parse BGP policy data of a Junos config without TTP (single pass over the config)
+    Args:
+        text (str): Config text (curly-brace format)
+    Returns:
+        List: Parsed result in the same structure as TTP with template/juniper.ttp
+    """
+    data = {}
+    for statement in parse_statements(text):
+        if statement.children is None or len(statement.words) != 1 or statement.words[0] not in TOP_LEVEL_BLOCKS:
+            continue
+        if statement.words[0] == "interfaces":
+            interfaces = [_interface(s) for s in statement.children if s.children is not None and len(s.words) == 1]
+            data.setdefault("interfaces", []).extend(interfaces)
+        elif statement.words[0] == "protocols":
+            for protocol in statement.children:
+                if protocol.children is not None and len(protocol.words) == 1:
+                    data[protocol.words[0]] = {}
+        else:
+            _policy_options(statement, data)
+    # TTP returns results of matched groups in a list (and an empty dict if nothing matched)
+    return [[[data]]] if data else [[{}]]
+
+
+def _bgp_blocks(statements: List[Statement]) -> Iterator[Statement]:
+    # protocols bgp of the main instance and routing-instances
+    for statement in statements:
+        if statement.children is None:
+            continue
+        if statement.words == ["protocols"]:
+            yield from _blocks(statement.children, "bgp", 1)
+        elif statement.words == ["routing-instances"]:
+            for instance in statement.children:
+                if instance.children is not None:
+                    yield from _bgp_blocks(instance.children)
+
+
+def bgp_policy_references(text: str) -> List[str]:
+    """Names of policies used by BGP (import/export of bgp, its groups and neighbors)
+    Args:
+        text (str): Config text (curly-brace format)
+    Returns:
+        List[str]: Policy names (in order of appearance, without duplicates)
+    """
+    names = {}
+    # depth-first in order of the config
+    stack = list(reversed(list(_bgp_blocks(parse_statements(text)))))
+    while stack:
+        statement = stack.pop()
+        if statement.children is not None:
+            stack.extend(reversed(statement.children))
+        elif statement.words[0] in ["import", "export"]:
+            names.update((word, None) for word in statement.words[1:] if word not in ["[", "]"])
+    return list(names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse BGP policy data of a Junos config (native parser)")
+    parser.add_argument("config_file", type=str, help="Config file")
+    args = parser.parse_args()
+
+    with open(args.config_file, "r", encoding="utf-8") as f:
+        print(json.dumps(parse_junos_config(f.read()), indent=2))
@@ -0,0 +1,185 @@
+import multiprocessing
+import queue
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging import getLogger
+from multiprocessing.context import BaseContext
+from typing import Callable, List
+
+logger = getLogger("main")
+
+
+class WorkerTimeout(TimeoutError):
+    """A task ran longer than its timeout (the worker process was killed)"""
+
+    def __init__(self, timeout: float, elapsed: float):
+        super().__init__(f"timed out after {timeout} sec (worker killed)")
+        self.timeout = timeout
+        self.elapsed = elapsed
+
+
+class WorkerDied(BrokenProcessPool):
+    """A worker process exited while running a task (e.g. killed by the OOM killer), restarted by the next task"""
+
+    def __init__(self, exitcode: int | None, elapsed: float):
+        super().__init__(f"worker process exited while running a task (exit code: {exitcode})")
+        self.exitcode = exitcode
+        self.elapsed = elapsed
+
+
+def _worker_main(conn, initializer: Callable[[], None] | None) -> None:
+    # run tasks received from the pipe one by one, None: exit
+    if initializer:
+        initializer()
+    conn.send(("ready", None))
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        fn, args, kwargs = task
+        try:
+            conn.send(("ok", fn(*args, **kwargs)))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            conn.send(("error", e))
+    conn.close()
+
+
+class _KillableWorker:
+    """A worker process which can be killed when a task runs too long (restarted by the next task)"""
+
+    def __init__(self, mp_context: BaseContext, initializer: Callable[[], None] | None, max_tasks: int | None):
+        self._mp_context = mp_context
+        self._initializer = initializer
+        self._max_tasks = max_tasks
+        self._process = None
+        self._conn = None
+        self._ready = False
+        self._tasks = 0
+
+    def start(self) -> None:
+        parent_conn, child_conn = self._mp_context.Pipe()
+        self._process = self._mp_context.Process(
+            target=_worker_main, args=(child_conn, self._initializer), daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._ready = False
+        self._tasks = 0
+
+    def wait_ready(self) -> None:
+        # wait for the initializer (not included in timeout of tasks)
+        if self._ready:
+            return
+        try:
+            self._conn.recv()
+        except EOFError as e:
+            self.kill()
+            raise BrokenProcessPool("worker process exited in initializer") from e
+        self._ready = True
+
+    def kill(self) -> None:
+        if self._process is None:
+            return
+        self._process.kill()
+        self._process.join()
+        self._conn.close()
+        self._process = None
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self._process.join(timeout)
+        self.kill()
+
+    def run(self, fn: Callable, args: tuple, kwargs: dict, timeout: float | None):
+        if self._process is None or not self._process.is_alive():
+            self.kill()
+            self.start()
+        self.wait_ready()
+        start = time.perf_counter()
+        self._conn.send((fn, args, kwargs))
+        if not self._conn.poll(timeout):
+            self.kill()
+            raise WorkerTimeout(timeout, time.perf_counter() - start)
+        try:
+            status, value = self._conn.recv()
+        except EOFError as e:
+            elapsed = time.perf_counter() - start
+            self._process.join(1)  # reap the exited process to get its exit code
+            exitcode = self._process.exitcode
+            self.kill()
+            raise WorkerDied(exitcode, elapsed) from e
+        self._tasks += 1
+        if self._max_tasks and self._tasks >= self._max_tasks:
+            self.stop()
+        if status == "error":
+            raise value
+        return value
+
+
+class KillablePool(Executor):
+    """Pool of worker processes to run tasks with a timeout
+    Each worker runs a task at a time, a worker running a task longer than its timeout is killed
+    (the task raises WorkerTimeout) and replaced, other tasks are not affected.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        *,
+        mp_context: BaseContext | None = None,
+        initializer: Callable[[], None] | None = None,
+        max_tasks_per_child: int | None = None,
+    ):
+        self.workers = max(workers, 1)
+        mp_context = mp_context or multiprocessing.get_context()
+        self._workers: List[_KillableWorker] = [
+            _KillableWorker(mp_context, initializer, max_tasks_per_child) for _ in range(self.workers)
+        ]
+        self._idle_workers = queue.SimpleQueue()
+        for worker in self._workers:
+            self._idle_workers.put(worker)
+        self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="killable-pool")
+
+    def start(self) -> "KillablePool":
+        """Start worker processes and wait for their initializers (otherwise started by the first tasks)"""
+        for worker in self._workers:
+            worker.start()
+        for worker in self._workers:
+            worker.wait_ready()
+        return self
+
+    def _run(self, fn: Callable, args: tuple, kwargs: dict, timeout: float | None):
+        worker = self._idle_workers.get()
+        try:
+            return worker.run(fn, args, kwargs, timeout)
+        finally:
+            self._idle_workers.put(worker)
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        return self._threads.submit(self._run, fn, args, kwargs, None)
+
+    def submit_with_timeout(self, timeout: float | None, fn: Callable, /, *args, **kwargs) -> Future:
+        """Submit a task with timeout
+        Args:
+            timeout (float): Timeout of the task (sec, None: no timeout)
+            fn (Callable): Function to run in a worker process
+        Returns:
+            Future: Result of fn (WorkerTimeout if timed out)
+        """
+        return self._threads.submit(self._run, fn, args, kwargs, timeout)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Stop worker processes (graceful: running tasks are finished when wait=True)"""
+        self._threads.shutdown(wait=wait, cancel_futures=cancel_futures)
+        for worker in self._workers:
+            if wait:
+                worker.stop()
+            else:
+                worker.kill()
@@ -0,0 +1,62 @@
+import itertools
+import logging
+import os
+import sys
+
+# level of the tools' logger ("main"): TRACE, DEBUG, INFO, WARNING, ERROR
+# TRACE (opt-in) enables per-rule messages of translators, they are too many (and costly) even for DEBUG
+LOG_LEVEL = os.environ.get("MDDO_LOG_LEVEL", "WARNING").upper()
+# log file (empty: log only to stdout)
+LOG_FILE = os.environ.get("MDDO_LOG_FILE", "")
+# log 1 of every N per-rule trace messages in a translator
+LOG_TRACE_SAMPLE = int(os.environ.get("MDDO_LOG_TRACE_SAMPLE", "1"))
+LOG_FORMAT = "[{asctime} @{funcName}-{lineno} - {levelname}] {message}"
+TRACE = 5
+LOG_LEVELS = ["TRACE", "DEBUG", "INFO", "WARNING", "ERROR"]
+
+logging.addLevelName(TRACE, "TRACE")
+
+
+def setup_logging(level: str = LOG_LEVEL, log_file: str = LOG_FILE) -> logging.Logger:
+    """Set handlers of the tools' logger (call it in entry points, not at import)
+    Args:
+        level (str): Log level (TRACE, DEBUG, INFO, WARNING, ERROR)
+        log_file (str): Log file (empty: no log file)
+    Returns:
+        logging.Logger: the tools' logger
+    """
+    if level.upper() not in LOG_LEVELS:
+        raise ValueError(f"unknown log level: {level}")
+    logger = logging.getLogger("main")
+    logger.setLevel(level.upper())
+    # replace handlers of previous setup
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    formatter = logging.Formatter(LOG_FORMAT, style="{")
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    logger.propagate = False
+    return logger
+
+
+class TraceSampler:
+    """Log messages in TRACE level, only 1 of every `sample` messages
+    Messages are formatted lazily: pass arguments instead of f-string (nothing is done unless TRACE is enabled).
+    """
+
+    def __init__(self, logger: logging.Logger, sample: int = LOG_TRACE_SAMPLE):
+        self.logger = logger
+        self.sample = max(sample, 1)
+        self._counter = itertools.count()
+
+    def __call__(self, msg: str, *args) -> None:
+        if not self.logger.isEnabledFor(TRACE):
+            return
+        if next(self._counter) % self.sample == 0:
+            # stacklevel: funcName/lineno of the caller
+            self.logger.log(TRACE, msg, *args, stacklevel=2)
@@ -0,0 +1,205 @@
+import bisect
+import math
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+# buckets (upper bounds, seconds) of duration histograms
+REQUEST_DURATION_BUCKETS = [0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600]
+DEVICE_DURATION_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60]
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base of metrics: values are kept for each combination of label values"""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: List[str] | None = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames or [])
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels must be {self.labelnames}: {sorted(labels)}")
+        return tuple(str(labels[k]) for k in self.labelnames)
+
+    def _samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {_escape(self.documentation)}"
+        yield f"# TYPE {self.name} {self.metric_type}"
+        for name, labels, value in self._samples():
+            yield f"{name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError(f"{self.name}: counter can only increase: {amount}")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets (with sum and count)"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: List[str] | None = None, buckets: List[float] | None = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        # last bucket is always +Inf (only once even if given)
+        self.buckets = sorted(b for b in buckets or REQUEST_DURATION_BUCKETS if b != math.inf) + [math.inf]
+
+    def observe(self, value: float, **labels: str) -> None:
+        if math.isnan(value):
+            raise ValueError(f"metric:{self.name} can not observe NaN")
+        key = self._key(labels)
+        with self._lock:
+            # [count of each bucket (not cumulative)..., sum]
+            data = self._values.setdefault(key, [0] * len(self.buckets) + [0.0])
+            data[bisect.bisect_left(self.buckets, value)] += 1
+            data[-1] += value
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            data = self._values.get(self._key(labels))
+        return sum(data[:-1]) if data else 0
+
+    def _samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = sorted((key, list(data)) for key, data in self._values.items())
+        for key, data in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, data[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, data[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """Metrics of the process, rendered in Prometheus text exposition format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric:{metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: List[str] | None = None) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: List[str] | None = None, buckets: List[float] | None = None
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render all metrics
+        Returns:
+            str: Metrics in Prometheus text format (Content-Type: CONTENT_TYPE)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(f"{line}\n" for metric in metrics for line in metric.render())
+
+
+registry = MetricsRegistry()
+REQUEST_DURATION = registry.histogram(
+    "mddo_http_request_duration_seconds",
+    "Latency of API requests",
+    ["method", "endpoint", "status"],
+    REQUEST_DURATION_BUCKETS,
+)
+PARSED_DEVICES = registry.counter(
+    "mddo_parsed_devices_total",
+    "Devices parsed (status: converted, skipped, invalid, failed)",
+    ["os_type", "status"],
+)
+CONFIG_PARSE_DURATION = registry.histogram(
+    "mddo_config_parse_duration_seconds",
+    "Time to parse a config (backend: ttp, native)",
+    ["os_type", "backend"],
+    DEVICE_DURATION_BUCKETS,
+)
+TRANSLATE_DURATION = registry.histogram(
+    "mddo_translate_duration_seconds",
+    "Time to convert a TTP result to policy model",
+    ["os_type"],
+    DEVICE_DURATION_BUCKETS,
+)
+OUTPUT_BYTES = registry.counter(
+    "mddo_output_bytes_total", "Bytes of output files (output: ttp_output, policy_model)", ["output"]
+)
+PARSE_CACHE_REQUESTS = registry.counter(
+    "mddo_parse_cache_requests_total", "Lookups of parse cache (result: hit, miss)", ["result"]
+)
+# stage name in parse results -> output label of OUTPUT_BYTES
+OUTPUT_STAGES = {"save_ttp_output": "ttp_output", "save_policy_model": "policy_model"}
+# stage name in parse results -> backend label of CONFIG_PARSE_DURATION
+PARSE_STAGES = {"ttp_parse": "ttp", "native_parse": "native"}
+
+
+def observe_parse_result(result: Dict) -> None:
+    """Update metrics with a parse result of a device (parse_bgp_policy._parse_device_safely)
+    Args:
+        result (Dict): Parse result of a device
+    Returns:
+        None
+    """
+    os_type = result["os_type"]
+    stages = result.get("stages", {})
+    PARSED_DEVICES.inc(os_type=os_type, status=result["status"])
+    if result.get("cache_hit") is not None:
+        PARSE_CACHE_REQUESTS.inc(result="hit" if result["cache_hit"] else "miss")
+    for stage_name, backend in PARSE_STAGES.items():
+        if stage_name in stages:
+            CONFIG_PARSE_DURATION.observe(stages[stage_name]["wall_time"], os_type=os_type, backend=backend)
+    if "convert" in stages:
+        TRANSLATE_DURATION.observe(stages["convert"]["wall_time"], os_type=os_type)
+    for stage_name, output in OUTPUT_STAGES.items():
+        if stage_name in stages:
+            OUTPUT_BYTES.inc(stages[stage_name]["bytes_out"], output=output)
@@ -1,36 +1,146 @@
+# pylint: disable=too-many-lines
 import argparse
 import glob
 import json
 import os
 import re
-import sys
-from logging import getLogger, Formatter, DEBUG, ERROR, FileHandler, StreamHandler
-from typing import Dict, List
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Callable, ContextManager, Dict, List, Tuple
 from ttp import ttp
+from config_filter import filter_config, prescreen_config
+from instrumentation import StageRecorder, TRACE_MEMORY, merge_stages, write_run_manifest
+from log_config import LOG_FILE, LOG_LEVEL, LOG_LEVELS, TraceSampler, setup_logging
+from killable_pool import KillablePool, WorkerTimeout
+from junos_parser import bgp_policy_references as junos_bgp_policy_references, parse_junos_config
+from xr_parser import bgp_policy_references as xr_bgp_policy_references, parse_xr_config
+from json_io import dump_json, OUTPUT_FORMAT, OUTPUT_FORMATS
+from parse_cache import ParseCache, PARSE_CACHE_DIR
+from policy_references import prune_policy_model
 from xr_translator import XRTranslator, PMEncoder
 
-
 # constants
 SRC_DIR = os.path.dirname(os.path.realpath(__file__))
 TTP_TEMPLATES_DIR = os.path.join(SRC_DIR, "template")
 TTP_CONFIGS_DIR = os.environ.get("MDDO_TTP_CONFIGS_DIR", "./configs")
 TTP_OUTPUTS_DIR = os.environ.get("MDDO_TTP_OUTPUTS_DIR", "./ttp_output")
 TTP_BGP_POLICIES_DIR = os.environ.get("MDDO_BGP_POLICIES_DIR", "./policy_model_output")
+# number of worker processes to parse config files (0: use all cpus)
+PARSE_JOBS = int(os.environ.get("MDDO_PARSE_JOBS", "1"))
+# save TTP parsed result into TTP_OUTPUTS_DIR (debug artifact)
+SAVE_TTP_OUTPUT = os.environ.get("MDDO_SAVE_TTP_OUTPUT", "true").lower() == "true"
+# share generated conditional policies (if-condition-*/not-if-condition-*) which have same contents (cisco_ios_xr)
+DEDUPE_CONDITIONAL_POLICIES = os.environ.get("MDDO_DEDUPE_CONDITIONAL_POLICIES", "false").lower() == "true"
+# pass only BGP-relevant stanzas of configs to TTP
+FILTER_CONFIG = os.environ.get("MDDO_FILTER_CONFIG", "false").lower() == "true"
+# skip configs without BGP/loopback markers before parsing
+PRESCREEN_CONFIG = os.environ.get("MDDO_PRESCREEN_CONFIG", "false").lower() == "true"
+# kill parse of a device (in a worker process) running longer than this (sec, 0: no timeout)
+DEVICE_TIMEOUT = float(os.environ.get("MDDO_DEVICE_TIMEOUT", "0"))
+# parser of configs: ttp (templates), native (hand-written parser, falls back to ttp for OS types without it)
+PARSER_BACKEND = os.environ.get("MDDO_PARSER_BACKEND", "ttp")
+PARSER_BACKENDS = ["ttp", "native"]
+# output only policies reachable from bgp neighbors and sets referenced by them (others are listed in run summary)
+REFERENCED_ONLY = os.environ.get("MDDO_REFERENCED_ONLY", "false").lower() == "true"
+OS_TYPES = ["juniper", "cisco_ios_xr"]
+
+
+@dataclass
+class ParseOptions:  # pylint: disable=too-many-instance-attributes
+    jobs: int = PARSE_JOBS  # number of worker processes (0: use all cpus)
+    cache_dir: str = PARSE_CACHE_DIR  # parse cache directory (empty: disable parse cache)
+    save_ttp_output: bool = SAVE_TTP_OUTPUT  # save TTP parsed result (debug artifact)
+    dedupe_conditional_policies: bool = DEDUPE_CONDITIONAL_POLICIES  # share same conditional policies
+    filter_config: bool = FILTER_CONFIG  # pass only BGP-relevant stanzas of configs to TTP
+    prescreen: bool = PRESCREEN_CONFIG  # skip configs without BGP/loopback markers before parsing
+    output_format: str = OUTPUT_FORMAT  # format of output files (pretty, compact, gzip, ndjson)
+    trace_memory: bool = TRACE_MEMORY  # trace peak memory of each stage (run manifest)
+    device_timeout: float = DEVICE_TIMEOUT  # kill parse of a device running longer than this (sec, 0: no timeout)
+    parser_backend: str = PARSER_BACKEND  # parser of configs (ttp, native)
+    referenced_only: bool = REFERENCED_ONLY  # output only policies/sets reachable from bgp neighbors
+
+    def cache_variants(self) -> List[str]:
+        """Options which change policy model (parse cache key)"""
+        return [
+            f"dedupe_conditional_policies={self.dedupe_conditional_policies}",
+            f"filter_config={self.filter_config}",
+            f"parser_backend={self.parser_backend}",
+            f"referenced_only={self.referenced_only}",
+        ]
+
+
+# handlers are set by entry points (log_config.setup_logging)
+logger = getLogger("main")
+# per-rule messages of converters (TRACE level, sampled)
+_trace = TraceSampler(logger)
 
 
-logger = getLogger("main")
-logger.setLevel(DEBUG)
-formatter = Formatter("[{asctime} @{funcName}-{lineno} - {levelname}] {message}", style="{")
+# compiled TTP templates (parser object per OS type), reused for every config file in the process
+_ttp_parsers: Dict[str, ttp] = {}
+_ttp_parsers_lock = threading.Lock()
+
+
+def _reinit_ttp_parsers_after_fork() -> None:
+    # pylint: disable=global-statement
+    global _ttp_parsers_lock
+    if _ttp_parsers_lock.locked():
+        # a parser was in use by another thread of the parent process, its state is not reliable
+        _ttp_parsers.clear()
+    _ttp_parsers_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reinit_ttp_parsers_after_fork)
+
+
+def _get_ttp_parser(os_type: str) -> ttp:
+    """Get TTP parser object which has compiled template of the OS-type
+    (caller must hold _ttp_parsers_lock)
+    Args:
+        os_type: (str): OS type string (juniper, cisco_ios_xr)
+    Returns:
+        ttp: TTP parser object
+    """
+    if os_type not in _ttp_parsers:
+        template_file = _template_file(os_type)
+        logger.info(f"compile ttp template: {template_file}")
+        _ttp_parsers[os_type] = ttp(template=template_file)
+    return _ttp_parsers[os_type]
+
+
+def warm_up_parsers() -> None:
+    """Compile TTP templates of all OS types in this process (e.g. initializer of worker processes)"""
+    for os_type in OS_TYPES:
+        _ttp_parse("", os_type)
+
+
+def _bind_ttp_functions(parser: ttp) -> None:
+    """Bind TTP function modules to the parser
+    TTP function modules refer the _ttp_ dictionary of the ttp object which loaded them last.
+    Re-bind them before reusing a parser, otherwise macros of another template are used.
+    Args:
+        parser (ttp): TTP parser object
+    Returns:
+        None
+    """
+    # pylint: disable=protected-access
+    for functions in parser._ttp_.values():
+        if not isinstance(functions, dict):
+            continue
+        for function in functions.values():
+            module_globals = getattr(function, "__globals__", {})
+            if "_ttp_" in module_globals:
+                module_globals["_ttp_"] = parser._ttp_
 
-fh = FileHandler("parser.log")
-fh.setFormatter(formatter)
-fh.setLevel(DEBUG)
-logger.addHandler(fh)
 
-sh = StreamHandler(sys.stdout)
-sh.setFormatter(formatter)
-sh.setLevel(ERROR)
-logger.addHandler(sh)
+def _template_file(os_type: str) -> str:
+    return os.path.join(TTP_TEMPLATES_DIR, f"{os_type}.ttp")
 
 
 def _ttp_parse(text: str, os_type: str) -> List:
@@ -41,10 +151,42 @@ def _ttp_parse(text: str, os_type: str) -> List:
     Returns:
         str: TTP parsed result (json string)
     """
-    template_file = os.path.join(TTP_TEMPLATES_DIR, f"{os_type}.ttp")
-    parser = ttp(text, template_file)
-    parser.parse()
-    return parser.result()
+    with _ttp_parsers_lock:
+        parser = _get_ttp_parser(os_type)
+        _bind_ttp_functions(parser)
+        try:
+            parser.add_input(text)
+            parser.parse()
+            # results of template are cleared (in-place) for next input, keep them in another list
+            return [list(template_results) for template_results in parser.result()]
+        finally:
+            parser.clear_input()
+            parser.clear_result()
+
+
+# native parsers (same result structure as TTP templates) per OS type
+_native_parsers: Dict[str, Callable[[str], List]] = {"juniper": parse_junos_config, "cisco_ios_xr": parse_xr_config}
+
+
+def _parser_backend(os_type: str, backend: str) -> str:
+    """Parser backend used for the OS-type (ttp if the OS-type has no native parser)"""
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"unknown parser backend: {backend}")
+    return backend if os_type in _native_parsers else "ttp"
+
+
+def _parse_config(text: str, os_type: str, backend: str = "ttp") -> List:
+    """Parse a config file with the parser backend
+    Args:
+        text (str): Text data of config file (parse target contents)
+        os_type: (str): OS type string (juniper, cisco_ios_xr)
+        backend (str): Parser backend (ttp, native)
+    Returns:
+        List: Parsed result (TTP result structure)
+    """
+    if _parser_backend(os_type, backend) == "native":
+        return _native_parsers[os_type](text)
+    return _ttp_parse(text, os_type)
 
 
 def _file_basename(orig_file_name: str) -> str:
@@ -57,19 +199,22 @@ def _file_basename(orig_file_name: str) -> str:
     return file_name_wo_ext
 
 
-def _save_file(save_dir: str, file_name: str, data: List | Dict, use_pmenc: bool = False) -> None:
+def _save_file(
+    save_dir: str, file_name: str, data: List | Dict, use_pmenc: bool = False, output_format: str = "pretty"
+) -> str:
     os.makedirs(save_dir, exist_ok=True)
     file_name_wo_ext = _file_basename(file_name)
-    save_file = os.path.join(save_dir, f"{file_name_wo_ext}.json")
+    # write while encoding (without building whole JSON string in memory)
+    save_file = dump_json(
+        data, os.path.join(save_dir, file_name_wo_ext), output_format, encoder=PMEncoder if use_pmenc else None
+    )
     logger.info(f"Save file: {save_file}")
-    with open(save_file, "w", encoding="utf-8") as f:
-        if use_pmenc:
-            f.write(json.dumps(data, indent=2, cls=PMEncoder))
-        else:
-            f.write(json.dumps(data, indent=2))
+    return save_file
 
 
-def _save_parsed_result(network: str, snapshot: str, os_type: str, config_file: str, parser_result: List) -> None:
+def _save_parsed_result(
+    network: str, snapshot: str, os_type: str, config_file: str, parser_result: List, *, output_format: str = "pretty"
+) -> str:
     """Save parsed result
     Args:
         network (str): Network name
@@ -77,47 +222,316 @@ def _save_parsed_result(network: str, snapshot: str, os_type: str, config_file:
         os_type (str): OS type string (juniper, cisco_ios_xr)
         config_file (str): File path of a config file (parse target file)
         parser_result (List): TTP parsed result
+        output_format (str): Output format (pretty, compact, gzip, ndjson)
     Returns:
-        None
+        str: File path of the saved result
     """
     save_dir = os.path.join(TTP_OUTPUTS_DIR, network, snapshot, os_type)
-    _save_file(save_dir, config_file, parser_result)
+    return _save_file(save_dir, config_file, parser_result, output_format=output_format)
 
 
-def _save_policy_model_output(network: str, snapshot: str, ttp_result_file: str, model_output: Dict) -> None:
+def _save_policy_model_output(
+    network: str, snapshot: str, file_name: str, model_output: Dict, output_format: str = "pretty"
+) -> str:
     """Save policy model
     Args:
         network (str): Network name
         snapshot (str): Snapshot name
-        ttp_result_file (str): File name of TTP result
+        file_name (str): File name of config (or TTP result)
         model_output (Dict): Policy model data
+        output_format (str): Output format (pretty, compact, gzip, ndjson)
     Returns:
-        None
+        str: File path of the saved policy model
     """
     save_dir = os.path.join(TTP_BGP_POLICIES_DIR, network, snapshot)
-    _save_file(save_dir, ttp_result_file, model_output, use_pmenc=True)
-
-
-def _parse_files(network: str, snapshot: str, os_type: str) -> None:
-    """Parse config files according to OS-type
+    return _save_file(save_dir, file_name, model_output, use_pmenc=True, output_format=output_format)
+
+
+def _save_outputs(
+    network: str,
+    snapshot: str,
+    os_type: str,
+    config_file: str,
+    outputs: Tuple[List | None, Dict | None],
+    *,
+    options: ParseOptions,
+    recorder: StageRecorder,
+) -> None:
+    """Save TTP parsed result (if options.save_ttp_output) and policy model of a device
     Args:
         network (str): Network name
         snapshot (str): Snapshot name
-        os_type (str): OS type string (junos, xr)
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+        config_file (str): File path of a config file (parse target file)
+        outputs (Tuple[List|None, Dict|None]): TTP parsed result and policy model (None if invalid)
+        options (ParseOptions): Parse options
+        recorder (StageRecorder): Recorder of stages
     Returns:
         None
     """
+    parsed, policy_model = outputs
+    if options.save_ttp_output:
+        with recorder.stage("save_ttp_output") as stage:
+            save_file = _save_parsed_result(
+                network, snapshot, os_type, config_file, parsed, output_format=options.output_format
+            )
+            stage["bytes_out"] += os.path.getsize(save_file)
+    if policy_model is not None:
+        with recorder.stage("save_policy_model") as stage:
+            save_file = _save_policy_model_output(network, snapshot, config_file, policy_model, options.output_format)
+            stage["bytes_out"] += os.path.getsize(save_file)
+
+
+def _read_config(config_file: str, recorder: StageRecorder) -> str:
+    with recorder.stage("read") as stage, open(config_file, "r", encoding="utf-8") as f:
+        stage["bytes_in"] += os.fstat(f.fileno()).st_size
+        return f.read()
+
+
+def _filter_and_parse(config_txt: str, os_type: str, options: ParseOptions, recorder: StageRecorder) -> List:
+    if options.filter_config:
+        with recorder.stage("filter_config") as stage:
+            stage["bytes_in"] += len(config_txt)
+            config_txt = filter_config(config_txt, os_type)
+            stage["bytes_out"] += len(config_txt)
+    with recorder.stage(f"{_parser_backend(os_type, options.parser_backend)}_parse") as stage:
+        stage["bytes_in"] += len(config_txt)
+        return _parse_config(config_txt, os_type, options.parser_backend)
+
+
+def _parse_device(
+    network: str, snapshot: str, os_type: str, config_file: str, options: ParseOptions, *, recorder: StageRecorder
+) -> Dict:
+    """Parse a config file and convert it to policy model (unit of work for a worker process)
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+        config_file (str): File path of a config file (parse target file)
+        options (ParseOptions): Parse options
+        recorder (StageRecorder): Recorder of stages
+    Returns:
+        Dict: parse result of the device
+    """
+    result = {"os_type": os_type, "config_file": config_file, "status": "converted", "cache_hit": None}
+    if options.prescreen:
+        with recorder.stage("prescreen"):
+            missing_markers = prescreen_config(config_file, os_type)
+        if missing_markers:
+            logger.info(f"skip {config_file}: {', '.join(missing_markers)} not found")
+            result["status"] = "skipped"
+            result["reason"] = f"{', '.join(missing_markers)} not found"
+            return result
+
+    config_txt = _read_config(config_file, recorder)
+
+    cache = ParseCache(options.cache_dir) if options.cache_dir else None
+    if cache:
+        with recorder.stage("cache"):
+            cache_key = cache.key(config_txt, _template_file(os_type), os_type, *options.cache_variants())
+            cache_entry = cache.get(cache_key)
+        result["cache_hit"] = cache_entry is not None
+        if cache_entry:
+            logger.info(f"cache hit: {config_file}")
+            _save_outputs(
+                network,
+                snapshot,
+                os_type,
+                config_file,
+                (cache_entry["ttp_result"], cache_entry["policy_model"]),
+                options=options,
+                recorder=recorder,
+            )
+            if cache_entry["policy_model"] is None:
+                result["status"] = "invalid"
+            result["unreferenced"] = cache_entry.get("unreferenced")
+            return result
+
+    # parsed result is passed to converter directly (ttp_output file is only a debug artifact)
+    parsed = _filter_and_parse(config_txt, os_type, options, recorder)
+    with recorder.stage("convert"):
+        # whole config (not filtered) to find policies used by bgp
+        policy_model, result["unreferenced"] = _convert_parsed_result(
+            parsed, os_type, config_file, config_txt, options
+        )
+    _save_outputs(network, snapshot, os_type, config_file, (parsed, policy_model), options=options, recorder=recorder)
+    if policy_model is None:
+        result["status"] = "invalid"
+
+    if cache:
+        with recorder.stage("cache"):
+            cache.put(cache_key, parsed, policy_model, encoder=PMEncoder, unreferenced=result["unreferenced"])
+    return result
+
+
+def _parse_device_safely(network: str, snapshot: str, os_type: str, config_file: str, options: ParseOptions) -> Dict:
+    """Parse a device with timing, a failure of the device is recorded in the result instead of raised
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+        config_file (str): File path of a config file (parse target file)
+        options (ParseOptions): Parse options
+    Returns:
+        Dict: parse result of the device
+    """
+    start = time.perf_counter()
+    recorder = StageRecorder(options.trace_memory)
+    try:
+        result = _parse_device(network, snapshot, os_type, config_file, options, recorder=recorder)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.exception(f"failed to parse {config_file}")
+        return _failed_result(os_type, config_file, e, time.perf_counter() - start, recorder.to_dict())
+    result["device"] = _file_basename(config_file)
+    result["elapsed"] = round(time.perf_counter() - start, 6)
+    result["stages"] = recorder.to_dict()
+    return result
+
+
+def _failed_result(
+    os_type: str, config_file: str, error: Exception, elapsed: float, stages: Dict | None = None
+) -> Dict:
+    """Parse result of a failed device (raised an exception or timed out)
+    Args:
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+        config_file (str): File path of a config file
+        error (Exception): Cause of the failure
+        elapsed (float): Elapsed time until the failure (sec)
+        stages (Dict): Recorded stages until the failure
+    Returns:
+        Dict: parse result of the device
+    """
+    return {
+        "os_type": os_type,
+        "config_file": config_file,
+        "status": "failed",
+        "cache_hit": None,
+        "error": f"{type(error).__name__}: {error}",
+        "device": _file_basename(config_file),
+        "elapsed": round(elapsed, 6),
+        "stages": stages or {},
+    }
+
+
+def _find_config_files(network: str, snapshot: str, os_type: str) -> List[Tuple[str, str]]:
+    """Find config files to parse
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+    Returns:
+        List[Tuple[str, str]]: pairs of OS type and config file path
+    """
     config_dir = os.path.join(TTP_CONFIGS_DIR, network, snapshot, os_type)
     if not os.path.isdir(config_dir):
         logger.info(f"config dir:{config_dir} for os_type:{os_type} is not found")
-        return
+        return []
+
+    return [(os_type, config_file) for config_file in glob.glob(os.path.join(config_dir, "*"))]
+
 
-    config_files = glob.glob(os.path.join(config_dir, "*"))
-    for config_file in config_files:
-        with open(config_file, "r", encoding="utf-8") as f:
-            config_txt = f.read()
-            parsed = _ttp_parse(config_txt, os_type)
-        _save_parsed_result(network, snapshot, os_type, config_file, parsed)
+def _submit_device(executor: Executor, args: Tuple, options: ParseOptions) -> Future:
+    # a device running longer than device_timeout is killed with its worker process (KillablePool only)
+    if isinstance(executor, KillablePool):
+        return executor.submit_with_timeout(options.device_timeout or None, _parse_device_safely, *args)
+    return executor.submit(_parse_device_safely, *args)
+
+
+def _device_executor(executor: Executor | None, workers: int, options: ParseOptions) -> ContextManager[Executor]:
+    """Executor to parse devices of a call
+    Args:
+        executor (Executor): Long-lived worker pool given by the caller (not shut down after the call)
+        workers (int): Number of workers to start for the call (when executor is None)
+        options (ParseOptions): Parse options
+    Returns:
+        ContextManager[Executor]: Given executor, KillablePool (device_timeout) or ProcessPoolExecutor
+    """
+    if executor is not None:
+        if options.device_timeout > 0 and not isinstance(executor, KillablePool):
+            logger.warning(f"device timeout is not supported by {type(executor).__name__}")
+        logger.info("parse config files with the worker pool")
+        return nullcontext(executor)
+    logger.info(f"parse config files with {workers} workers")
+    return KillablePool(workers) if options.device_timeout > 0 else ProcessPoolExecutor(max_workers=workers)
+
+
+def _parse_devices(
+    network: str,
+    snapshot: str,
+    config_files: List[Tuple[str, str]],
+    options: ParseOptions,
+    progress: Callable[[Dict, int, int], None] | None = None,
+    *,
+    executor: Executor | None = None,
+) -> List[Dict]:
+    """Parse and convert config files, in parallel when options.jobs > 1 or executor is given
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        config_files (List[Tuple[str, str]]): pairs of OS type and config file path
+        options (ParseOptions): Parse options
+        progress (Callable): Callback called with (parse result, number of done devices, number of devices)
+            each time a device is finished
+        executor (Executor): Long-lived worker pool to use instead of options.jobs workers for this call
+    Returns:
+        List[Dict]: parse results of devices
+    """
+    # schedule largest files first: they dominate the total time when parsing in parallel
+    config_files = sorted(config_files, key=lambda t: os.path.getsize(t[1]), reverse=True)
+    workers = min(options.jobs if options.jobs > 0 else os.cpu_count() or 1, len(config_files))
+    results = []
+
+    def _done(result: Dict) -> None:
+        results.append(result)
+        if progress:
+            progress(result, len(results), len(config_files))
+
+    if executor is None and workers <= 1 and options.device_timeout <= 0:
+        for os_type, config_file in config_files:
+            _done(_parse_device_safely(network, snapshot, os_type, config_file, options))
+        return results
+
+    with _device_executor(executor, workers, options) as device_executor:
+        futures = {
+            _submit_device(device_executor, (network, snapshot, *device, options), options): device
+            for device in config_files
+        }
+        for future in as_completed(futures):
+            try:
+                _done(future.result())
+            except (WorkerTimeout, BrokenProcessPool) as e:
+                # a worker killed or died (e.g. OOM): KillablePool restarts it by the next task
+                logger.error(f"failed to parse {futures[future][1]}: {e}")
+                _done(_failed_result(*futures[future], e, getattr(e, "elapsed", 0.0)))
+    return results
+
+
+def _parse_files(network: str, snapshot: str, os_type: str, options: ParseOptions) -> None:
+    """Parse config files according to OS-type
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+        options (ParseOptions): Parse options
+    Returns:
+        None
+    """
+    _parse_devices(network, snapshot, _find_config_files(network, snapshot, os_type), options)
+
+
+def _cache_stats(cache: ParseCache, results: List[Dict]) -> Dict:
+    """Report parse cache usage of a run (and evict old entries)
+    Args:
+        cache (ParseCache): Parse cache
+        results (List[Dict]): parse results of devices
+    Returns:
+        Dict: cache stats
+    """
+    hits = sum(1 for r in results if r["cache_hit"])
+    misses = sum(1 for r in results if r["cache_hit"] is False)
+    stats = {"hits": hits, "misses": misses, "evicted": cache.evict()}
+    stats.update(cache.usage())
+    return stats
 
 
 def _convert_juniper_ttp_to_policy_model(ttp_output: dict) -> dict:
@@ -190,13 +604,13 @@ def _convert_juniper_ttp_to_policy_model(ttp_output: dict) -> dict:
                 elif "conditions" in rule:
                     conditions.extend(rule["conditions"])
                 else:
-                    logger.debug(f"# NO RULE MATCHED: {rule}")
+                    _trace("# NO RULE MATCHED: %s", rule)
 
             for i, condition in enumerate(conditions):
-                logger.debug(f"  - condition : {condition}")
+                _trace("  - condition : %s", condition)
                 if "route-filter" in condition.keys():
                     prefix, *match_type_elem = condition["route-filter"].split()
-                    logger.debug(f"    - match_type_elem length: {len(match_type_elem)}")
+                    _trace("    - match_type_elem length: %d", len(match_type_elem))
                     # default
                     length = {}
                     match_type = ""
@@ -237,7 +651,7 @@ def _convert_juniper_ttp_to_policy_model(ttp_output: dict) -> dict:
 
                     conditions[i] = {"community": communities}
 
-            for action in actions:
+            for i, action in enumerate(actions):
                 tmp_action = {}
                 if "as-path-prepend" in action.keys():
                     # logger.debug(f"as-path-prepend:::: " + str(action))
@@ -260,7 +674,8 @@ def _convert_juniper_ttp_to_policy_model(ttp_output: dict) -> dict:
                             }
                         }
                     )
-                action.update(tmp_action)
+                # NOTE: don't update action in ttp_output (parsed result may be saved or cached after conversion)
+                actions[i] = {**action, **tmp_action}
 
             statement_data = {
                 "name": name,
@@ -305,76 +720,225 @@ def valid_parsed_result(os_type: str, output_file: str, parsed_data: dict) -> bo
         logger.error(f"parse result:{output_file} ({os_type}) doesn't have bgp configs")
         return False
 
-    if not any(re.match(r"[Ll]o(opback)?\d", d["name"]) for d in parsed_data["interfaces"]):
-        logger.error(parsed_data["interfaces"])
+    if not any(re.match(r"[Ll]o(opback)?\d", d["name"]) for d in parsed_data.get("interfaces", [])):
+        logger.error(parsed_data.get("interfaces", []))
         logger.error(f"parse result:{output_file} ({os_type}) doesn't have loopback")
         return False
 
     return True
 
 
-def parse_juniper_bgp_policy(network: str, snapshot: str) -> None:
+def _convert_juniper_ttp_result(ttp_result: List, file_name: str) -> Dict | None:
+    """Convert TTP parsed result of juniper config to policy model
+    Args:
+        ttp_result (List): TTP parsed result
+        file_name (str): File name of the config (for logging)
+    Returns:
+        Dict|None: Policy model data (None if TTP result is invalid)
     """
-    Parse juniper configs and generate bgp-policy data
+    logger.info(f"converting: {file_name}")
+
+    if valid_parsed_result("juniper", file_name, ttp_result[0][0]) is False:
+        logger.error(f"skip parsed result:{file_name} because it is invalid")
+        return None
+
+    return _convert_juniper_ttp_to_policy_model(ttp_result)
+
+
+def _translate_cisco_ios_xr_ttp_result(
+    ttp_result: List, file_name: str, dedupe_conditional_policies: bool = False, root_policies: List[str] | None = None
+) -> XRTranslator | None:
+    """Translate TTP parsed result of cisco_ios_xr config
     Args:
-        network (str): Network name
-        snapshot (str): Snapshot name
+        ttp_result (List): TTP parsed result
+        file_name (str): File name of the config (for logging)
+        dedupe_conditional_policies (bool): Share generated conditional policies which have same contents
+        root_policies (List[str]|None): Translate only policies reachable from them (None: all policies)
     Returns:
-        None
+        XRTranslator|None: Translator which translated policies (None if TTP result is invalid)
     """
-    _parse_files(network, snapshot, "juniper")
-    junos_ttp_outputs_dir = os.path.join(TTP_OUTPUTS_DIR, network, snapshot, "juniper")
-    junos_ttp_outputs = glob.glob(os.path.join(junos_ttp_outputs_dir, "*"))
+    logger.info(f"converting {file_name}")
 
-    for ttp_output_file in junos_ttp_outputs:
-        logger.info(f"loading: {ttp_output_file}")
+    if valid_parsed_result("cisco_ios_xr", file_name, ttp_result[0][0]) is False:
+        logger.error(f"skip parsed result:{file_name} because it is invalid")
+        return None
 
-        with open(ttp_output_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    xr_translator = XRTranslator(
+        ttp_result, dedupe_conditional_policies=dedupe_conditional_policies, root_policies=root_policies
+    )
+    xr_translator.translate_policies()
+    if dedupe_conditional_policies:
+        logger.info(f"deduplicated conditional policies: {xr_translator.deduplicated_policies} in {file_name}")
+    return xr_translator
+
+
+def _xr_policy_model(xr_translator: XRTranslator) -> Dict:
+    return {
+        "node": xr_translator.node,
+        "prefix-set": xr_translator.prefix_set,
+        "as-path-set": xr_translator.aspath_set,
+        "community-set": xr_translator.community_set,
+        "policies": xr_translator.policies,
+        "bgp_neighbors": xr_translator.bgp_neighbors,
+    }
+
+
+def _convert_cisco_ios_xr_ttp_result(
+    ttp_result: List, file_name: str, dedupe_conditional_policies: bool = False
+) -> Dict | None:
+    """Convert TTP parsed result of cisco_ios_xr config to policy model
+    Args:
+        ttp_result (List): TTP parsed result
+        file_name (str): File name of the config (for logging)
+        dedupe_conditional_policies (bool): Share generated conditional policies which have same contents
+    Returns:
+        Dict|None: Policy model data (None if TTP result is invalid)
+    """
+    xr_translator = _translate_cisco_ios_xr_ttp_result(ttp_result, file_name, dedupe_conditional_policies)
+    return _xr_policy_model(xr_translator) if xr_translator else None
 
-        if valid_parsed_result("juniper", ttp_output_file, data[0][0]) is False:
-            logger.error(f"skip parsed result:{ttp_output_file} because it is invalid")
-            continue
 
-        ttp_output = data
-        policy_model = _convert_juniper_ttp_to_policy_model(ttp_output)
-        _save_policy_model_output(network, snapshot, ttp_output_file, policy_model)
+def _convert_parsed_result(
+    parsed: List, os_type: str, config_file: str, config_txt: str, options: ParseOptions
+) -> Tuple[Dict | None, Dict | None]:
+    """Convert parsed result of a config to policy model
+    Args:
+        parsed (List): Parsed result (TTP result structure)
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+        config_file (str): File path of the config
+        config_txt (str): Text data of the config (to find policies used by bgp, not filtered by filter_config)
+        options (ParseOptions): Parse options
+    Returns:
+        Tuple[Dict|None, Dict|None]: Policy model data (None if invalid) and names of unreferenced objects
+            (None unless options.referenced_only)
+    """
+    if os_type == "juniper":
+        policy_model = _convert_juniper_ttp_result(parsed, config_file)
+        if policy_model is None or not options.referenced_only:
+            return policy_model, None
+        return policy_model, prune_policy_model(policy_model, junos_bgp_policy_references(config_txt))
+
+    xr_translator = _translate_cisco_ios_xr_ttp_result(
+        parsed,
+        config_file,
+        options.dedupe_conditional_policies,
+        xr_bgp_policy_references(config_txt) if options.referenced_only else None,
+    )
+    if xr_translator is None:
+        return None, None
+    return _xr_policy_model(xr_translator), xr_translator.unreferenced if options.referenced_only else None
 
 
-def parse_cisco_ios_xr_bgp_policy(network: str, snapshot: str) -> None:
+def parse_juniper_bgp_policy(network: str, snapshot: str, options: ParseOptions | None = None) -> None:
     """
-    Parse cisco_ios_xr configs and generate bgp policy data
+    Parse juniper configs and generate bgp-policy data
     Args:
         network (str): Network name
         snapshot (str): Snapshot name
+        options (ParseOptions): Parse options
     Returns:
         None
     """
-    _parse_files(network, snapshot, "cisco_ios_xr")
-    xr_ttp_outputs_dir = os.path.join(TTP_OUTPUTS_DIR, network, snapshot, "cisco_ios_xr")
-    xr_ttp_outputs = glob.glob(os.path.join(xr_ttp_outputs_dir, "*"))
+    _parse_files(network, snapshot, "juniper", options or ParseOptions())
 
-    for xr_output_file in xr_ttp_outputs:
-        logger.info(f"loading {xr_output_file}")
 
-        with open(xr_output_file, "r", encoding="utf-8") as f:
-            ttp_parsed_config = json.load(f)
+def parse_cisco_ios_xr_bgp_policy(network: str, snapshot: str, options: ParseOptions | None = None) -> None:
+    """
+    Parse cisco_ios_xr configs and generate bgp policy data
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        options (ParseOptions): Parse options
+    Returns:
+        None
+    """
+    _parse_files(network, snapshot, "cisco_ios_xr", options or ParseOptions())
 
-        if valid_parsed_result("cisco_ios_xr", xr_output_file, ttp_parsed_config[0][0]) is False:
-            logger.error(f"skip parsed result:{xr_output_file} because it is invalid")
-            continue
 
-        xr_translator = XRTranslator(ttp_parsed_config)
-        xr_translator.translate_policies()
-        policy_model_output = {
-            "node": xr_translator.node,
-            "prefix-set": xr_translator.prefix_set,
-            "as-path-set": xr_translator.aspath_set,
-            "community-set": xr_translator.community_set,
-            "policies": xr_translator.policies,
-            "bgp_neighbors": xr_translator.bgp_neighbors,
-        }
-        _save_policy_model_output(network, snapshot, xr_output_file, policy_model_output)
+def _run_summary(results: List[Dict]) -> Dict:
+    """Summarize parse results of devices
+    Args:
+        results (List[Dict]): parse results of devices
+    Returns:
+        Dict: Summary of the run
+    """
+    summary = {
+        "devices": len(results),
+        "status": dict(Counter(r["status"] for r in results)),
+        "failed": [{"device": r["device"], "error": r["error"]} for r in results if r["status"] == "failed"],
+        "skipped": [{"device": r["device"], "reason": r["reason"]} for r in results if r["status"] == "skipped"],
+    }
+    unreferenced = {r["device"]: r["unreferenced"] for r in results if any((r.get("unreferenced") or {}).values())}
+    if unreferenced:
+        # objects not in output (referenced_only)
+        summary["unreferenced"] = unreferenced
+    return summary
+
+
+def _write_run_manifest(network: str, snapshot: str, options: ParseOptions, summary: Dict, results: List[Dict]) -> str:
+    """Write a run manifest (per-stage and per-device instrumentation) next to policy model output
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        options (ParseOptions): Parse options
+        summary (Dict): Summary of the run
+        results (List[Dict]): parse results of devices
+    Returns:
+        str: File path of the manifest
+    """
+    device_keys = ["device", "os_type", "config_file", "status", "cache_hit", "elapsed", "error", "reason", "stages"]
+    manifest = {
+        "network": network,
+        "snapshot": snapshot,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "options": asdict(options),
+        "summary": summary,
+        "devices": [{k: r[k] for k in device_keys if k in r} for r in results],
+    }
+    return write_run_manifest(network, snapshot, manifest, base_dir=TTP_BGP_POLICIES_DIR)
+
+
+def parse_bgp_policies(
+    network: str,
+    snapshot: str,
+    options: ParseOptions | None = None,
+    progress: Callable[[Dict, int, int], None] | None = None,
+    config_files: List[Tuple[str, str]] | None = None,
+    *,
+    recorder: StageRecorder | None = None,
+    executor: Executor | None = None,
+) -> Dict:
+    """
+    Parse configs of all OS types and generate bgp policy data
+    (devices of all OS types share one worker pool)
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        options (ParseOptions): Parse options
+        progress (Callable): Callback called with (parse result, number of done devices, number of devices)
+            each time a device is finished
+        config_files (List[Tuple[str, str]]): pairs of OS type and config file path to parse
+            (default: configs in TTP_CONFIGS_DIR)
+        recorder (StageRecorder): Recorder of stages before parse (e.g. collect configs) to add to run manifest
+        executor (Executor): Long-lived worker pool (e.g. worker_pool.WorkerPool) to parse devices
+            (default: start options.jobs workers for this run)
+    Returns:
+        Dict: Summary of the run (stages: total of stages of devices and the run)
+    """
+    options = options or ParseOptions()
+    recorder = recorder or StageRecorder(options.trace_memory)
+    if config_files is None:
+        config_files = [t for os_type in OS_TYPES for t in _find_config_files(network, snapshot, os_type)]
+    # devices trace their memory in their stages
+    with recorder.stage("parse", trace_memory=False):
+        results = _parse_devices(network, snapshot, config_files, options, progress, executor=executor)
+
+    summary = _run_summary(results)
+    if options.cache_dir:
+        summary["cache"] = _cache_stats(ParseCache(options.cache_dir), results)
+    summary["stages"] = {**recorder.to_dict(), **merge_stages(r["stages"] for r in results)}
+    summary["manifest"] = _write_run_manifest(network, snapshot, options, summary, results)
+    return summary
 
 
 if __name__ == "__main__":
@@ -388,8 +952,91 @@ if __name__ == "__main__":
         type=str,
         help="Specify a target snapshot name",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        default=PARSE_JOBS,
+        type=int,
+        help="Number of worker processes to parse config files (0: use all cpus)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=PARSE_CACHE_DIR,
+        type=str,
+        help="Specify a parse cache directory to skip unchanged configs (default: disabled)",
+    )
+    parser.add_argument(
+        "--save-ttp-output",
+        default=SAVE_TTP_OUTPUT,
+        action=argparse.BooleanOptionalAction,
+        help="Save TTP parsed result into ttp_output dir (debug artifact)",
+    )
+    parser.add_argument(
+        "--dedupe-conditional-policies",
+        default=DEDUPE_CONDITIONAL_POLICIES,
+        action=argparse.BooleanOptionalAction,
+        help="Share generated conditional policies which have same contents (cisco_ios_xr)",
+    )
+    parser.add_argument(
+        "--filter-config",
+        default=FILTER_CONFIG,
+        action=argparse.BooleanOptionalAction,
+        help="Pass only BGP-relevant stanzas of configs to TTP",
+    )
+    parser.add_argument(
+        "--prescreen",
+        default=PRESCREEN_CONFIG,
+        action=argparse.BooleanOptionalAction,
+        help="Skip configs without BGP/loopback before parsing",
+    )
+    parser.add_argument(
+        "--output-format",
+        default=OUTPUT_FORMAT,
+        choices=list(OUTPUT_FORMATS.keys()),
+        help="Format of output files",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        default=TRACE_MEMORY,
+        action=argparse.BooleanOptionalAction,
+        help="Trace peak memory of each stage in run manifest (slow)",
+    )
+    parser.add_argument(
+        "--device-timeout",
+        default=DEVICE_TIMEOUT,
+        type=float,
+        help="Kill parse of a device running longer than this (sec, 0: no timeout, parsed in worker processes)",
+    )
+    parser.add_argument(
+        "--parser-backend",
+        default=PARSER_BACKEND,
+        choices=PARSER_BACKENDS,
+        help="Parser of configs (native: hand-written parsers without TTP)",
+    )
+    parser.add_argument(
+        "--referenced-only",
+        default=REFERENCED_ONLY,
+        action=argparse.BooleanOptionalAction,
+        help="Output only policies reachable from bgp neighbors and sets referenced by them",
+    )
+    parser.add_argument("--log-level", default=LOG_LEVEL, choices=LOG_LEVELS, help="Log level (TRACE: per-rule logs)")
+    parser.add_argument("--log-file", default=LOG_FILE, type=str, help="Log file (default: stdout only)")
     args = parser.parse_args()
     # pylint: enable=duplicate-code
 
-    parse_juniper_bgp_policy(args.network, args.snapshot)
-    parse_cisco_ios_xr_bgp_policy(args.network, args.snapshot)
+    setup_logging(args.log_level, args.log_file)
+    parse_options = ParseOptions(
+        jobs=args.jobs,
+        cache_dir=args.cache_dir,
+        save_ttp_output=args.save_ttp_output,
+        dedupe_conditional_policies=args.dedupe_conditional_policies,
+        filter_config=args.filter_config,
+        prescreen=args.prescreen,
+        output_format=args.output_format,
+        trace_memory=args.trace_memory,
+        device_timeout=args.device_timeout,
+        parser_backend=args.parser_backend,
+        referenced_only=args.referenced_only,
+    )
+    run_summary = parse_bgp_policies(args.network, args.snapshot, parse_options)
+    print(json.dumps(run_summary, indent=2))
@@ -0,0 +1,167 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+from functools import lru_cache
+from typing import Dict, List
+
+SRC_DIR = os.path.dirname(os.path.realpath(__file__))
+PARSE_CACHE_DIR = os.environ.get("MDDO_PARSE_CACHE_DIR", "")  # empty: disable parse cache
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("MDDO_PARSE_CACHE_MAX_BYTES", str(1024**3)))
+
+
+@lru_cache(maxsize=None)
+def file_hash(file_path: str) -> str:
+    """Hash of a file (e.g. TTP template), calculated once per process
+    Args:
+        file_path (str): File path
+    Returns:
+        str: sha256 hex digest
+    """
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def translator_version() -> str:
+    """Version of parser/translator code: any change of the source files invalidates cache entries
+    Returns:
+        str: sha256 hex digest of the source files
+    """
+    digest = hashlib.sha256()
+    for source_file in sorted(glob.glob(os.path.join(SRC_DIR, "*.py"))):
+        digest.update(file_hash(source_file).encode())
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """On-disk cache of TTP parsed result and policy model, keyed by content hash
+    Entries are evicted in least-recently-used order (mtime is updated when hit)
+    when the total size exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = PARSE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(config_txt: str, template_file: str, *variants: str) -> str:
+        """Cache key of a config
+        Args:
+            config_txt (str): Text data of config file
+            template_file (str): TTP template file to parse the config
+            variants (str): Other parameters which change parsed result (e.g. OS type)
+        Returns:
+            str: cache key
+        """
+        digest = hashlib.sha256()
+        for item in [hashlib.sha256(config_txt.encode()).hexdigest(), file_hash(template_file), translator_version()]:
+            digest.update(item.encode())
+        for variant in variants:
+            digest.update(variant.encode())
+        return digest.hexdigest()
+
+    def _entry_file(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Dict | None:
+        """Get a cache entry
+        Args:
+            key (str): Cache key
+        Returns:
+            Dict|None: cache entry ({"ttp_result": ..., "policy_model": ...}) or None if not cached
+        """
+        entry_file = self._entry_file(key)
+        try:
+            with open(entry_file, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # mark as recently used
+            os.utime(entry_file)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(
+        self,
+        key: str,
+        ttp_result: List,
+        policy_model: Dict | None,
+        encoder: type = json.JSONEncoder,
+        unreferenced: Dict | None = None,
+    ) -> None:
+        """Save a cache entry
+        Args:
+            key (str): Cache key
+            ttp_result (List): TTP parsed result
+            policy_model (Dict|None): Policy model data (None if parsed result is invalid)
+            encoder (type): JSON encoder class for policy model
+            unreferenced (Dict|None): Names of objects which are not in policy model (referenced_only)
+        Returns:
+            None
+        """
+        entry_file = self._entry_file(key)
+        os.makedirs(os.path.dirname(entry_file), exist_ok=True)
+        # write and rename: other processes must not read a partially written entry
+        tmp_file = f"{entry_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            entry = {"ttp_result": ttp_result, "policy_model": policy_model}
+            if unreferenced is not None:
+                entry["unreferenced"] = unreferenced
+            json.dump(entry, f, cls=encoder)
+        os.replace(tmp_file, entry_file)
+
+    def _entries(self) -> List[os.DirEntry]:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [
+            entry
+            for sub_dir in os.scandir(self.cache_dir)
+            if sub_dir.is_dir()
+            for entry in os.scandir(sub_dir.path)
+            if entry.name.endswith(".json")
+        ]
+
+    def evict(self) -> int:
+        """Remove least-recently-used entries until total size is less than max_bytes
+        Returns:
+            int: Number of removed entries
+        """
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        total_bytes = sum(e.stat().st_size for e in entries)
+        evicted = 0
+        for entry in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= entry.stat().st_size
+            os.remove(entry.path)
+            evicted += 1
+        return evicted
+
+    def usage(self) -> Dict:
+        """Current usage of the cache
+        Returns:
+            Dict: number of entries and total size
+        """
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(e.stat().st_size for e in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show stats of parse cache")
+    parser.add_argument("--cache-dir", default=PARSE_CACHE_DIR, type=str, help="Specify a parse cache directory")
+    parser.add_argument("--evict", action="store_true", help="Evict entries exceeding max size")
+    args = parser.parse_args()
+    if not args.cache_dir:
+        print("Error: parse cache directory is not specified", file=sys.stderr)
+        sys.exit(1)
+
+    cache = ParseCache(args.cache_dir)
+    if args.evict:
+        print(f"evicted: {cache.evict()}")
+    print(json.dumps(cache.usage(), indent=2))
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from dataclasses import dataclass, field, asdict
+from logging import getLogger
+from typing import Callable, Dict, List
+
+# number of parse jobs running at the same time
+JOB_CONCURRENCY = int(os.environ.get("MDDO_JOB_CONCURRENCY", "1"))
+# number of finished jobs to keep their status
+JOB_HISTORY = int(os.environ.get("MDDO_JOB_HISTORY", "100"))
+
+logger = getLogger("main")
+
+
+class ParseJobConflict(Exception):
+    """A job for the same network/snapshot is already queued or running"""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"job:{job_id} for the snapshot is already queued or running")
+        self.job_id = job_id
+
+
+# the fields are the (flat) job status of /jobs/<job_id> API as is (asdict): grouping them changes the response
+@dataclass
+class ParseJob:  # pylint: disable=too-many-instance-attributes
+    network: str
+    snapshot: str
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    state: str = "queued"  # queued, running, succeeded, failed
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    devices_total: int = 0
+    devices_done: int = 0
+    devices: Dict[str, Dict] = field(default_factory=dict)
+    summary: Dict | None = None
+    error: str | None = None
+
+    def is_active(self) -> bool:
+        return self.state in ["queued", "running"]
+
+    def update_progress(self, result: Dict, done: int, total: int) -> None:
+        self.devices_total = total
+        self.devices_done = done
+        self.devices[result["device"]] = {
+            k: result[k] for k in ["os_type", "status", "cache_hit", "elapsed", "error", "reason"] if k in result
+        }
+
+    def elapsed(self) -> float | None:
+        if self.started_at is None:
+            return None
+        return round((self.finished_at or time.time()) - self.started_at, 6)
+
+
+class ParseJobManager:
+    """Run parse jobs in background threads and keep their status"""
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, history: int = JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="parse-job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, ParseJob] = {}
+        self._futures: Dict[str, Future] = {}
+        self.history = history
+
+    def submit(
+        self, network: str, snapshot: str, work: Callable[[Callable[[Dict, int, int], None]], Dict]
+    ) -> ParseJob:
+        """Submit a parse job
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+            work (Callable): Function to run, it is called with progress callback and returns summary
+        Returns:
+            ParseJob: submitted job
+        Raises:
+            ParseJobConflict: a job for the same network/snapshot is queued or running
+        """
+        with self._lock:
+            job = self._add_job(network, snapshot)
+            self._futures[job.job_id] = self._executor.submit(self._run, job, work)
+        logger.info(f"submit parse job:{job.job_id} ({network}/{snapshot})")
+        return job
+
+    def run(self, network: str, snapshot: str, work: Callable[[Callable[[Dict, int, int], None]], Dict]) -> Dict:
+        """Run a parse job in the calling thread (synchronous request, not queued)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+            work (Callable): Function to run, it is called with progress callback and returns summary
+        Returns:
+            Dict: summary returned by work
+        Raises:
+            ParseJobConflict: a job for the same network/snapshot is queued or running
+            Exception: raised by work
+        """
+        with self._lock:
+            job = self._add_job(network, snapshot)
+        logger.info(f"run parse job:{job.job_id} ({network}/{snapshot})")
+        self._run(job, work, raise_error=True)
+        return job.summary
+
+    def _add_job(self, network: str, snapshot: str) -> ParseJob:
+        # call with lock: a snapshot has only one active job (its configs are cleaned up and staged by the job)
+        for job in self._jobs.values():
+            if job.network == network and job.snapshot == snapshot and job.is_active():
+                raise ParseJobConflict(job.job_id)
+        job = ParseJob(network=network, snapshot=snapshot)
+        self._jobs[job.job_id] = job
+        return job
+
+    def _progress_callback(self, job: ParseJob) -> Callable[[Dict, int, int], None]:
+        def _progress(result: Dict, done: int, total: int) -> None:
+            with self._lock:
+                job.update_progress(result, done, total)
+
+        return _progress
+
+    def _run(
+        self, job: ParseJob, work: Callable[[Callable[[Dict, int, int], None]], Dict], raise_error: bool = False
+    ) -> None:
+        with self._lock:
+            job.state = "running"
+            job.started_at = time.time()
+        try:
+            summary = work(self._progress_callback(job))
+            with self._lock:
+                job.summary = summary
+                job.state = "succeeded"
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.exception(f"parse job:{job.job_id} failed")
+            with self._lock:
+                job.error = f"{type(e).__name__}: {e}"
+                job.state = "failed"
+            if raise_error:
+                raise
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+                self._forget_old_jobs()
+        logger.info(f"parse job:{job.job_id} {job.state} in {job.elapsed()} sec")
+
+    def _forget_old_jobs(self) -> None:
+        finished_ids = [job_id for job_id, job in self._jobs.items() if not job.is_active()]
+        for job_id in finished_ids[: max(len(finished_ids) - self.history, 0)]:
+            del self._jobs[job_id]
+            # jobs run by run() have no future
+            self._futures.pop(job_id, None)
+
+    def get(self, job_id: str) -> Dict | None:
+        """Get status of a job
+        Args:
+            job_id (str): Job ID
+        Returns:
+            Dict|None: status of the job (None if not found)
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            status = asdict(job)
+            status["elapsed"] = job.elapsed()
+        return status
+
+    def list_jobs(self) -> List[Dict]:
+        """List status of jobs (without device details)
+        Returns:
+            List[Dict]: status of jobs
+        """
+        with self._lock:
+            return [
+                {
+                    "job_id": job.job_id,
+                    "network": job.network,
+                    "snapshot": job.snapshot,
+                    "state": job.state,
+                    "devices_total": job.devices_total,
+                    "devices_done": job.devices_done,
+                    "elapsed": job.elapsed(),
+                }
+                for job in self._jobs.values()
+            ]
+
+    def wait(self, job_id: str, timeout: float | None = None) -> bool:
+        """Wait a job to finish
+        Args:
+            job_id (str): Job ID
+            timeout (float): Timeout (sec)
+        Returns:
+            bool: True if the job is finished
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is None:
+            return False
+        done, _ = wait_futures([future], timeout=timeout)
+        return len(done) > 0
+
+    def shutdown(self, wait_jobs: bool = True) -> None:
+        self._executor.shutdown(wait=wait_jobs, cancel_futures=not wait_jobs)
@@ -0,0 +1,100 @@
+from collections import deque
+from typing import Any, Dict, Iterable, List, Set
+
+# sets in policy model: key -> key of the set name
+SET_KEYS = {"prefix-set": "name", "as-path-set": "group-name", "community-set": "name"}
+
+
+def _as_dict(obj: Any) -> Any:
+    # policy model objects of XRTranslator (PolicyModel, Statement, ...) or dict
+    return obj.to_dict() if hasattr(obj, "to_dict") else obj
+
+
+def reference_names(obj: Any) -> Set[str]:
+    """Names which can be referenced in an object (words in its strings, e.g. conditions and actions of a policy)
+    A name in any string is a reference: it may find too many references but never misses one.
+    Args:
+        obj (Any): Policy (or its part) in parsed result or policy model
+    Returns:
+        Set[str]: Words in strings of the object (and names without parameters: "name(1)" -> "name")
+    """
+    names = set()
+    stack = [_as_dict(obj)]
+    while stack:
+        item = _as_dict(stack.pop())
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif isinstance(item, str):
+            for word in item.split():
+                word = word.strip("[](),'\"")
+                names.add(word)
+                names.add(word.split("(")[0])
+    return names
+
+
+def _base_name(name: str) -> str:
+    # name of a policy without parameters (cisco_ios_xr: route-policy name($param))
+    return name.split("(")[0]
+
+
+def reachable_policies(policies: Dict[str, Any], roots: Iterable[str]) -> Set[str]:
+    """Policies reachable from roots through references between policies (apply, policy conditions)
+    Args:
+        policies (Dict[str, Any]): Policy name -> policy
+        roots (Iterable[str]): Names of policies used by BGP neighbors
+    Returns:
+        Set[str]: Names of reachable policies
+    """
+    names = {_base_name(name): name for name in policies}
+    reachable = set()
+    queue = deque(names[_base_name(root)] for root in roots if _base_name(root) in names)
+    while queue:
+        name = queue.popleft()
+        if name in reachable:
+            continue
+        reachable.add(name)
+        queue.extend(names[n] for n in reference_names(policies[name]) if n in names and names[n] not in reachable)
+    return reachable
+
+
+def prune_sets(policy_model: Dict, policies: Iterable[Any]) -> Dict[str, List[str]]:
+    """Remove sets which are not referenced by the policies from policy model (in place)
+    Args:
+        policy_model (Dict): Policy model (prefix-set, as-path-set, community-set)
+        policies (Iterable[Any]): Policies in the output
+    Returns:
+        Dict[str, List[str]]: Names of removed sets for each kind of set
+    """
+    names = set()
+    for policy in policies:
+        names |= reference_names(policy)
+
+    def _referenced(item: Dict, name_key: str) -> bool:
+        # as-path-set (juniper): as-path in the group can be referenced by its name
+        members = item.get("as-path", [])
+        return item[name_key] in names or (isinstance(members, list) and any(m.get("name") in names for m in members))
+
+    unreferenced = {}
+    for key, name_key in SET_KEYS.items():
+        sets = policy_model.get(key, [])
+        unreferenced[key] = [s[name_key] for s in sets if not _referenced(s, name_key)]
+        sets[:] = [s for s in sets if _referenced(s, name_key)]
+    return unreferenced
+
+
+def prune_policy_model(policy_model: Dict, roots: Iterable[str]) -> Dict[str, List[str]]:
+    """Remove policies which are not reachable from roots and sets which are not referenced by them (in place)
+    Args:
+        policy_model (Dict): Policy model (policies, prefix-set, as-path-set, community-set)
+        roots (Iterable[str]): Names of policies used by BGP neighbors
+    Returns:
+        Dict[str, List[str]]: Names of removed policies and sets (unreferenced objects)
+    """
+    policies = policy_model["policies"]
+    reachable = reachable_policies({p["name"]: p for p in policies}, roots)
+    unreferenced = {"policies": [p["name"] for p in policies if p["name"] not in reachable]}
+    policies[:] = [p for p in policies if p["name"] in reachable]
+    unreferenced.update(prune_sets(policy_model, policies))
+    return unreferenced
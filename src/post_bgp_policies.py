@@ -1,20 +1,41 @@
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
 import argparse
 import glob
+import gzip
+import hashlib
 import json
 import os
 import re
+import sys
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from json_io import load_json
+from instrumentation import StageRecorder, update_run_manifest
 
 BGP_POLICIES_DIR = os.environ.get("MDDO_BGP_POLICIES_DIR", "./policy_model_output")
 MODEL_CONDUCTOR_HOST = os.environ.get("MODEL_CONDUCTOR_HOST", "model-conductor:9292")
+# single: post all node patches at once, batch: post size-bounded (gzip compressed) batches of node patches
+POST_MODE = os.environ.get("MDDO_POST_MODE", "single")
+POST_MODES = ["single", "batch"]
+POST_TIMEOUT = int(os.environ.get("MDDO_POST_TIMEOUT", "180"))
+POST_BATCH_BYTES = int(os.environ.get("MDDO_POST_BATCH_BYTES", str(4 * 1024**2)))  # before compression
+POST_GZIP = os.environ.get("MDDO_POST_GZIP", "true").lower() == "true"
+POST_CONCURRENCY = int(os.environ.get("MDDO_POST_CONCURRENCY", "4"))
+POST_RETRIES = int(os.environ.get("MDDO_POST_RETRIES", "3"))
+POST_BACKOFF = float(os.environ.get("MDDO_POST_BACKOFF", "0.5"))  # sec, doubled for each retry
+# post only node patches changed from the last post (see post_bgp_policy_delta)
+POST_DELTA = os.environ.get("MDDO_POST_DELTA", "false").lower() == "true"
 
 
-def _read_bgp_policy_data(network: str, snapshot: str) -> List:
+def _read_bgp_policy_data(network: str, snapshot: str, counters: Dict | None = None) -> List:
     """Read bgp-policy data from files
     Args:
         network (str): Network name
         snapshot (str): Snapshot name
+        counters (Dict): Stage counters to add bytes read (bytes_in)
     Returns:
         List: all bgp policies
     """
@@ -22,8 +43,10 @@ def _read_bgp_policy_data(network: str, snapshot: str) -> List:
     bgp_policy_files = glob.glob(os.path.join(bgp_policy_dir, "*"))
     bgp_policies = []
     for bgp_policy_file in bgp_policy_files:
-        with open(bgp_policy_file, "r", encoding="utf-8") as f:
-            bgp_policies.append(json.load(f))
+        # files are written in any output format (pretty/compact JSON, gzip, ndjson)
+        bgp_policies.append(load_json(bgp_policy_file))
+        if counters is not None:
+            counters["bytes_in"] += os.path.getsize(bgp_policy_file)
     return bgp_policies
 
 
@@ -87,21 +110,232 @@ def _pack_policies(bgp_policies: List) -> Dict:
     return packed_data
 
 
-def post_bgp_policy(network: str, snapshot: str) -> requests.Response:
-    """Post node-attribute patches to merge topology data
+def _split_batches(node_patches: List[Dict], max_bytes: int) -> List[bytes]:
+    """Split node-attribute patches into payloads (packed data) less than max_bytes
+    Args:
+        node_patches (List[Dict]): Node-attribute patches
+        max_bytes (int): Max size of a payload (a node larger than it is sent as a payload)
+    Returns:
+        List[bytes]: Payloads
+    """
+    payloads = []
+    batch = []
+    batch_bytes = 0
+    for node_patch in node_patches:
+        encoded = json.dumps(node_patch).encode()
+        if batch and batch_bytes + len(encoded) > max_bytes:
+            payloads.append(b'{"node": [' + b", ".join(batch) + b"]}")
+            batch, batch_bytes = [], 0
+        batch.append(encoded)
+        batch_bytes += len(encoded) + 2
+    payloads.append(b'{"node": [' + b", ".join(batch) + b"]}")
+    return payloads
+
+
+def _create_session(concurrency: int, retries: int, backoff: float) -> requests.Session:
+    """Create a session which has connection pool for concurrent posts and retries posts
+    (posting same node-attribute patches again is harmless)
+    Args:
+        concurrency (int): Number of concurrent posts (size of connection pool)
+        retries (int): Number of retries for connection error and 429/5xx response
+        backoff (float): Backoff factor of retries (sec)
+    Returns:
+        requests.Session
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,  # retry POST too
+        raise_on_status=False,  # return last response
+    )
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry))
+    return session
+
+
+def post_bgp_policy_batches(
+    network: str,
+    snapshot: str,
+    *,
+    max_bytes: int = POST_BATCH_BYTES,
+    compress: bool = POST_GZIP,
+    concurrency: int = POST_CONCURRENCY,
+    retries: int = POST_RETRIES,
+    backoff: float = POST_BACKOFF,
+    node_patches: Optional[List[Dict]] = None,
+) -> List[requests.Response]:
+    """Post node-attribute patches in batches to merge topology data
     Args:
         network (str): Network name
         snapshot (str): Snapshot name
+        max_bytes (int): Max size of a batch (before compression)
+        compress (bool): Compress batches with gzip (Content-Encoding: gzip)
+        concurrency (int): Number of concurrent posts
+        retries (int): Number of retries of a post
+        backoff (float): Backoff factor of retries (sec)
+        node_patches (Optional[List[Dict]]): Node-attribute patches to post (default: all patches of the snapshot)
     Returns:
-        requests.Response
+        List[requests.Response]: responses of batches
     """
-    bgp_policies = _read_bgp_policy_data(network, snapshot)
-    packed_policy = _pack_policies(bgp_policies)
+    if node_patches is None:
+        node_patches = _pack_policies(_read_bgp_policy_data(network, snapshot))["node"]
+    payloads = _split_batches(node_patches, max_bytes)
 
-    url = f"http://{MODEL_CONDUCTOR_HOST}/conduct/{network}/{snapshot}/topology/bgp_proc/policies"
-    payload = json.dumps(packed_policy)
+    url = _policies_url(network, snapshot)
     headers = {"Content-Type": "application/json"}
-    return requests.post(url=url, data=payload, headers=headers, timeout=180)
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    with _create_session(concurrency, retries, backoff) as session:
+
+        def _post(payload: bytes) -> requests.Response:
+            data = gzip.compress(payload, compresslevel=6) if compress else payload
+            return session.post(url=url, data=data, headers=headers, timeout=POST_TIMEOUT)
+
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+            return list(executor.map(_post, payloads))
+
+
+def _policies_url(network: str, snapshot: str) -> str:
+    return f"http://{MODEL_CONDUCTOR_HOST}/conduct/{network}/{snapshot}/topology/bgp_proc/policies"
+
+
+def _posted_manifest_path(network: str, snapshot: str) -> str:
+    # next to the snapshot directory (files in the directory are read as bgp policies)
+    return os.path.join(BGP_POLICIES_DIR, network, f"{snapshot}.posted.json")
+
+
+def _hash_node_patch(node_patch: Dict) -> str:
+    return hashlib.sha256(json.dumps(node_patch, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def _read_posted_manifest(network: str, snapshot: str) -> Dict[str, str]:
+    """Read hashes of node patches posted last time
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+    Returns:
+        Dict[str, str]: node-id -> hash of node patch (empty if posted to another model-conductor)
+    """
+    try:
+        with open(_posted_manifest_path(network, snapshot), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("url") != _policies_url(network, snapshot):
+        return {}
+    return manifest.get("nodes", {})
+
+
+def _write_posted_manifest(network: str, snapshot: str, node_hashes: Dict[str, str]) -> None:
+    manifest_path = _posted_manifest_path(network, snapshot)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"url": _policies_url(network, snapshot), "nodes": node_hashes}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _read_node_patches(network: str, snapshot: str, recorder: StageRecorder) -> List[Dict]:
+    with recorder.stage("post_read") as stage:
+        bgp_policies = _read_bgp_policy_data(network, snapshot, stage)
+    with recorder.stage("post_pack"):
+        return _pack_policies(bgp_policies)["node"]
+
+
+def _post_node_patches(
+    network: str, snapshot: str, node_patches: List[Dict], mode: str, recorder: StageRecorder
+) -> requests.Response:
+    """Post node-attribute patches
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        node_patches (List[Dict]): Node-attribute patches
+        mode (str): single (post all patches at once) or batch (see post_bgp_policy_batches)
+        recorder (StageRecorder): Recorder of stages (post_send stage)
+    Returns:
+        requests.Response: (batch mode) response of the first failed batch, or the last batch if all succeeded
+    """
+    with recorder.stage("post_send") as stage:
+        if mode == "batch":
+            responses = post_bgp_policy_batches(network, snapshot, node_patches=node_patches)
+            # bodies of the (last tried) requests, compressed if gzip
+            stage["bytes_out"] += sum(len(r.request.body or b"") for r in responses)
+            return next((r for r in responses if not r.ok), responses[-1])
+
+        payload = json.dumps({"node": node_patches}).encode()
+        stage["bytes_out"] += len(payload)
+        headers = {"Content-Type": "application/json"}
+        return requests.post(url=_policies_url(network, snapshot), data=payload, headers=headers, timeout=POST_TIMEOUT)
+
+
+def _update_run_manifest(network: str, snapshot: str, post_result: Dict, recorder: StageRecorder) -> None:
+    post_result = {**post_result, "finished_at": datetime.now(timezone.utc).isoformat(), "stages": recorder.to_dict()}
+    update_run_manifest(network, snapshot, "post", post_result, base_dir=BGP_POLICIES_DIR)
+
+
+def post_bgp_policy(
+    network: str, snapshot: str, mode: str = POST_MODE, recorder: StageRecorder | None = None
+) -> requests.Response:
+    """Post node-attribute patches to merge topology data
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        mode (str): single (post all patches at once) or batch (see post_bgp_policy_batches)
+        recorder (StageRecorder): Recorder of stages (saved in "post" of run manifest)
+    Returns:
+        requests.Response: (batch mode) response of the first failed batch, or the last batch if all succeeded
+    """
+    recorder = recorder or StageRecorder()
+    node_patches = _read_node_patches(network, snapshot, recorder)
+    response = _post_node_patches(network, snapshot, node_patches, mode, recorder)
+    if response.ok:
+        # base of next delta post
+        _write_posted_manifest(network, snapshot, {p["node-id"]: _hash_node_patch(p) for p in node_patches})
+    _update_run_manifest(network, snapshot, {"mode": mode, "delta": False, "status": response.status_code}, recorder)
+    return response
+
+
+def post_bgp_policy_delta(
+    network: str, snapshot: str, mode: str = POST_MODE, recorder: StageRecorder | None = None
+) -> Dict:
+    """Post only node-attribute patches added or changed since the last successful post
+    NOTE: model-conductor keeps posted patches in its topology data. If the topology data is regenerated,
+    post all patches again with post_bgp_policy (it also resets the manifest).
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        mode (str): single (post all patches at once) or batch (see post_bgp_policy_batches)
+        recorder (StageRecorder): Recorder of stages (saved in "post" of run manifest)
+    Returns:
+        Dict: status (None if nothing is posted), node-ids of posted, unchanged and removed nodes
+    """
+    recorder = recorder or StageRecorder()
+    node_patches = _read_node_patches(network, snapshot, recorder)
+    with recorder.stage("post_diff"):
+        node_hashes = {p["node-id"]: _hash_node_patch(p) for p in node_patches}
+        posted_hashes = _read_posted_manifest(network, snapshot)
+        changed_patches = [p for p in node_patches if posted_hashes.get(p["node-id"]) != node_hashes[p["node-id"]]]
+    result = {
+        "status": None,
+        "posted": [p["node-id"] for p in changed_patches],
+        "unchanged": sorted(set(node_hashes) - {p["node-id"] for p in changed_patches}),
+        # not in the snapshot anymore: nothing to post (patches can not remove attributes), forget them
+        "removed": sorted(set(posted_hashes) - set(node_hashes)),
+    }
+    posted = True
+    if changed_patches:
+        response = _post_node_patches(network, snapshot, changed_patches, mode, recorder)
+        result["status"] = response.status_code
+        posted = response.ok
+    if posted and (changed_patches or result["removed"]):
+        _write_posted_manifest(network, snapshot, node_hashes)
+    counts = {k: len(result[k]) for k in ["posted", "unchanged", "removed"]}
+    _update_run_manifest(
+        network, snapshot, {"mode": mode, "delta": True, "status": result["status"], **counts}, recorder
+    )
+    return result
 
 
 if __name__ == "__main__":
@@ -115,10 +349,28 @@ if __name__ == "__main__":
         type=str,
         help="Specify a target snapshot name",
     )
+    parser.add_argument(
+        "--mode",
+        default=POST_MODE,
+        choices=POST_MODES,
+        help="Post all node patches at once (single) or in size-bounded batches (batch)",
+    )
+    parser.add_argument(
+        "--delta",
+        default=POST_DELTA,
+        action=argparse.BooleanOptionalAction,
+        help="Post only node patches added or changed since the last post",
+    )
     args = parser.parse_args()
     # pylint: enable=duplicate-code
 
     print("Post policy data")
-    response = post_bgp_policy(args.network, args.snapshot)
+    if args.delta:
+        delta_result = post_bgp_policy_delta(args.network, args.snapshot, args.mode)
+        print(f"- status: {delta_result['status'] or 'nothing to post'}")
+        for key in ["posted", "unchanged", "removed"]:
+            print(f"- {key} ({len(delta_result[key])}): {', '.join(delta_result[key])}")
+        sys.exit(0)
+    response = post_bgp_policy(args.network, args.snapshot, args.mode)
     print(f"- status: {response.status_code}")
     # print(f"- status: {response.text}")
@@ -0,0 +1,39 @@
+import multiprocessing
+import os
+from logging import getLogger
+import parse_bgp_policy as parse_bp
+from killable_pool import KillablePool
+from log_config import setup_logging
+
+# number of long-lived worker processes of the API server (0: disabled, workers are started for each request)
+WORKER_POOL_SIZE = int(os.environ.get("MDDO_WORKER_POOL_SIZE", "0"))
+# replace a worker after it parsed N devices to cap memory growth (0: never)
+WORKER_MAX_TASKS = int(os.environ.get("MDDO_WORKER_MAX_TASKS", "100"))
+
+logger = getLogger("main")
+
+
+def _init_worker() -> None:
+    setup_logging()
+    parse_bp.warm_up_parsers()
+
+
+class WorkerPool(KillablePool):
+    """Long-lived pool of worker processes which have compiled TTP templates
+    Workers are spawned (not forked from the multi-threaded server), warmed up by the initializer
+    and replaced after max_tasks_per_child tasks, when killed by timeout of a task or when they died.
+    """
+
+    def __init__(self, workers: int = WORKER_POOL_SIZE, max_tasks_per_child: int = WORKER_MAX_TASKS):
+        super().__init__(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            max_tasks_per_child=max_tasks_per_child or None,
+        )
+        self.max_tasks_per_child = max_tasks_per_child or None
+
+    def start(self) -> "WorkerPool":
+        super().start()
+        logger.info(f"started {self.workers} workers (max tasks per worker: {self.max_tasks_per_child})")
+        return self
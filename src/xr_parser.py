@@ -0,0 +1,305 @@
+import argparse
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+# end markers of top-level statements which are not closed by indentation
+END_MARKERS = {
+    "prefix-set": "end-set",
+    "as-path-set": "end-set",
+    "community-set": "end-set",
+    "route-policy": "end-policy",
+}
+IF_KEYWORDS = ["if", "elseif", "else"]
+# statements which end a block of route-policy (if/elseif/else)
+BLOCK_ENDS = ["elseif", "else", "endif", "end-policy"]
+
+
+@dataclass(slots=True)
+class Line:
+    """A line of an indented config block and lines indented under it"""
+
+    words: List[str]
+    children: List["Line"] = field(default_factory=list)
+
+
+def _body(lines: List[str], pos: int, end_marker: str | None) -> Tuple[List[str], int]:
+    # lines of a top-level statement: until its end marker, or indented lines (closed by "!")
+    body = []
+    while pos < len(lines):
+        line = lines[pos]
+        if end_marker:
+            pos += 1
+            if line.strip() == end_marker:
+                break
+        elif not line or line[0].isspace():
+            pos += 1
+        else:
+            break
+        body.append(line)
+    return body, pos
+
+
+def _statements(lines: List[str]) -> List[List[str]]:
+    # words of lines except blank lines and comments
+    statements = []
+    for line in lines:
+        words = line.split()
+        if words and words[0][0] not in "!#":
+            statements.append(words)
+    return statements
+
+
+def _indented_tree(lines: List[str]) -> List[Line]:
+    root: List[Line] = []
+    stack: List[Tuple[int, List[Line]]] = [(-1, root)]
+    for line in lines:
+        words = line.split()
+        if not words or words[0][0] in "!#":
+            continue
+        indent = len(line) - len(line.lstrip())
+        while stack[-1][0] >= indent:
+            stack.pop()
+        node = Line(words)
+        stack[-1][1].append(node)
+        stack.append((indent, node.children))
+    return root
+
+
+def _interface(words: List[str], body: List[str]) -> Dict:
+    interface = {"name": words[1]}
+    for line in _indented_tree(body):
+        # first primary address
+        if len(line.words) == 4 and line.words[:2] == ["ipv4", "address"]:
+            interface.setdefault("ipv4", {"address": line.words[2], "mask": line.words[3]})
+    return interface
+
+
+def _prefix_set(words: List[str], body: List[str]) -> Dict:
+    prefix_set = {"name": words[1]}
+    for statement in _statements(body):
+        # <prefix> [ge|le|eq <length>...][,]
+        prefix = {"prefix": statement[0].rstrip(",")}
+        condition = " ".join(statement[1:]).rstrip(",")
+        if condition:
+            prefix["condition"] = condition
+        prefix_set.setdefault("prefixes", []).append(prefix)
+    return prefix_set
+
+
+def _aspath_set(words: List[str], body: List[str]) -> Dict:
+    aspath_set = {"name": words[1]}
+    for statement in _statements(body):
+        if statement[0] == "ios-regex" and len(statement) > 1:
+            condition = {"pattern": " ".join(statement[1:]).rstrip(",").strip("'")}
+        elif statement[0] == "length" and len(statement) == 3:
+            condition = {"condition": statement[1], "length": statement[2].rstrip(",")}
+        else:
+            continue
+        aspath_set.setdefault("conditions", []).append(condition)
+    return aspath_set
+
+
+def _community_set(words: List[str], body: List[str]) -> Dict:
+    communities = []
+    for statement in _statements(body):
+        if statement[0] == "ios-regex" and len(statement) > 1:
+            communities.append({"community": " ".join(statement[1:]).rstrip(",").strip("'")})
+        elif len(statement) == 1:
+            communities.append({"community": statement[0].rstrip(",")})
+    return {"name": words[1], "communities": communities}
+
+
+def _split_by_conditions(condition: str) -> Dict:
+    # same as split_by_conditions macro of template/cisco_ios_xr.ttp
+    words = condition.split()
+    if "and" in words:
+        return {"op": "and", "matches": [m.strip() for m in condition.split(" and ")]}
+    if "or" in words:
+        return {"op": "or", "matches": [m.strip() for m in condition.split(" or ")]}
+    return {"op": "state", "matches": [condition.strip()]}
+
+
+def _rpl_action(words: List[str]) -> Dict | None:
+    if words[0] in ["set", "delete", "prepend"] and len(words) > 2:
+        return {"action": words[0], "attr": words[1], "value": " ".join(words[2:])}
+    if words[0] == "apply" and len(words) > 1:
+        return {"action": "apply", "value": " ".join(words[1:])}
+    if words[0] in ["pass", "drop", "done"] and len(words) == 1:
+        return {"action": words[0]}
+    return None
+
+
+def _rpl_block(statements: List[List[str]], pos: int) -> Tuple[List[Dict], int]:
+    """Parse statements of a route-policy block until elseif/else/endif/end-policy
+    Args:
+        statements (List[List[str]]): Words of statements of the route-policy
+        pos (int): Position to start
+    Returns:
+        Tuple[List[Dict], int]: Rules of the block and position of the statement which ended the block
+    """
+    rules = []
+    while pos < len(statements) and statements[pos][0] not in BLOCK_ENDS:
+        if statements[pos][0] == "if":
+            pos = _rpl_if(statements, pos, rules)
+            continue
+        rule = _rpl_action(statements[pos])
+        if rule:
+            rules.append(rule)
+        pos += 1
+    return rules, pos
+
+
+def _rpl_if(statements: List[List[str]], pos: int, rules: List[Dict]) -> int:
+    # if/elseif/else...endif: add a rule for each branch (same as TTP) and return position after endif
+    while pos < len(statements) and statements[pos][0] in IF_KEYWORDS:
+        words = statements[pos]
+        branch = {"if": words[0]}
+        if words[0] != "else":
+            branch["condition"] = _split_by_conditions(" ".join(words[1:-1] if words[-1] == "then" else words[1:]))
+        branch["rules"], pos = _rpl_block(statements, pos + 1)
+        rules.append(branch)
+        if words[0] == "else":
+            break
+    if pos < len(statements) and statements[pos][0] == "endif":
+        pos += 1
+    return pos
+
+
+def _rpl_statements(body: List[str]) -> List[List[str]]:
+    # join conditions of if/elseif written in multiple lines (until "then")
+    statements = []
+    continued = False
+    for words in _statements(body):
+        if continued:
+            statements[-1].extend(words)
+        else:
+            statements.append(words)
+        continued = statements[-1][0] in ["if", "elseif"] and statements[-1][-1] != "then"
+    return statements
+
+
+def _route_policy(words: List[str], body: List[str]) -> Dict:
+    rules, _ = _rpl_block(_rpl_statements(body), 0)
+    return {"name": words[1], "rules": rules}
+
+
+def _af_configs(lines: List[Line]) -> Dict:
+    configs = {}
+    for line in lines:
+        if len(line.words) == 3 and line.words[0] == "route-policy" and line.words[2] in ["in", "out"]:
+            configs.setdefault("route-policy", {})[line.words[2]] = line.words[1]
+        elif len(line.words) == 1:
+            configs.setdefault("attrs", []).append({"value": line.words[0]})
+    return configs
+
+
+def _bgp_neighbor(line: Line) -> Dict:
+    neighbor = {"remote-ip": line.words[1], "address-families": []}
+    for child in line.children:
+        keyword = child.words[0]
+        if keyword in ["remote-as", "update-source"] and len(child.words) == 2:
+            neighbor[keyword] = child.words[1]
+        elif keyword == "description" and len(child.words) > 1:
+            neighbor["description"] = " ".join(child.words[1:]).strip('"')
+        elif keyword == "address-family" and len(child.words) == 3:
+            neighbor["address-families"].append(
+                {"afi": child.words[1], "safi": child.words[2], "configs": _af_configs(child.children)}
+            )
+    return neighbor
+
+
+def _router_bgp(words: List[str], body: List[str]) -> Dict:
+    bgp = {"asn": words[2], "neighbors": []}
+    confederation = []
+    for line in _indented_tree(body):
+        if line.words[:2] == ["bgp", "router-id"] and len(line.words) == 3:
+            bgp["router-id"] = {"router-id": line.words[2]}
+        elif line.words[:2] == ["bgp", "confederation"] and len(line.words) == 4:
+            confederation.append({"attr": line.words[2], "value": line.words[3]})
+        elif line.words[0] == "address-family" and len(line.words) == 3:
+            configs = _af_configs(line.children)
+            bgp[f"af_{line.words[1]}_{line.words[2]}"] = {"configs": configs} if configs else {}
+        elif line.words[0] == "neighbor" and len(line.words) == 2:
+            # neighbors in default vrf (neighbor-groups and vrfs are not used in policy model)
+            bgp["neighbors"].append(_bgp_neighbor(line))
+    if confederation:
+        # a dict if matched once (as TTP group)
+        bgp["confederation"] = confederation if len(confederation) > 1 else confederation[0]
+    return bgp
+
+
+# top-level statements which have data of the policy model: keyword -> (key of result, parser)
+_TOP_LEVEL_PARSERS = {
+    "interface": ("interfaces", _interface),
+    "prefix-set": ("prefix-sets", _prefix_set),
+    "as-path-set": ("as-path-sets", _aspath_set),
+    "community-set": ("community-sets", _community_set),
+    "route-policy": ("policies", _route_policy),
+}
+
+
+def parse_xr_config(text: str) -> List:
+    """Parse BGP policy data of an IOS-XR config without TTP (recursive descent parser of route-policy)
+    Result has the same structure as TTP with template/cisco_ios_xr.ttp (XRTranslator input) except:
+    - keys XRTranslator reads without check are always set (TTP omits a key whose group matched nothing):
+      bgp.neighbors ([] without neighbors), policies ([] without route-policies if router bgp exists),
+      rules of an empty route-policy or if block, communities of an empty community-set, address-families of
+      a neighbor and configs of an address-family (an empty address-family of router bgp is {} as TTP)
+    - comment lines (! and #) are ignored, trailing commas and repeated spaces of values are removed
+    - nested if blocks are not limited to 3 levels
+    - no "vars" key (template variables)
+    Args:
+        text (str): Config text
+    Returns:
+        List: Parsed result (XRTranslator input)
+    """
+    lines = text.splitlines()
+    data = {}
+    pos = 0
+    while pos < len(lines):
+        words = lines[pos].split()
+        if not words or lines[pos][0].isspace():
+            pos += 1
+            continue
+        body, pos = _body(lines, pos + 1, END_MARKERS.get(words[0]))
+        if words[0] in _TOP_LEVEL_PARSERS and len(words) == 2:
+            key, parser = _TOP_LEVEL_PARSERS[words[0]]
+            data.setdefault(key, []).append(parser(words, body))
+        elif words[:2] == ["router", "bgp"] and len(words) == 3:
+            data["bgp"] = _router_bgp(words, body)
+    if "bgp" in data:
+        data.setdefault("policies", [])
+    return [[data]]
+
+
+def bgp_policy_references(text: str) -> List[str]:
+    """Names of route-policies used in router bgp (neighbors, neighbor-groups, af-groups, session-groups, vrfs,
+    redistribute, ...)
+    Args:
+        text (str): Config text
+    Returns:
+        List[str]: Policy names (in order of appearance, without duplicates)
+    """
+    names = {}
+    lines = text.splitlines()
+    pos = 0
+    while pos < len(lines):
+        words = lines[pos].split()
+        if words[:2] != ["router", "bgp"] or lines[pos][0].isspace():
+            pos += 1
+            continue
+        body, pos = _body(lines, pos + 1, None)
+        for statement in _statements(body):
+            # route-policy <name> [in|out]
+            names.update((name, None) for keyword, name in zip(statement, statement[1:]) if keyword == "route-policy")
+    return list(names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse BGP policy data of an IOS-XR config (native parser)")
+    parser.add_argument("config_file", type=str, help="Config file")
+    args = parser.parse_args()
+
+    with open(args.config_file, "r", encoding="utf-8") as f:
+        print(json.dumps(parse_xr_config(f.read()), indent=2))
@@ -4,6 +4,8 @@ from logging import getLogger
 from dataclasses import dataclass, field, asdict, is_dataclass
 from typing import Union, Self
 from enum import Enum
+from log_config import TraceSampler, setup_logging
+from policy_references import prune_sets, reachable_policies
 
 
 class PolicyPrefix(Enum):
@@ -13,17 +15,24 @@ class PolicyPrefix(Enum):
 
 class PMEncoder(json.JSONEncoder):
     def default(self, o):
+        # model classes: shallow dict, nested objects are encoded when the encoder walks them
+        # (asdict deep-copies all nested lists and dicts before encoding)
+        if hasattr(o, "to_dict"):
+            return o.to_dict()
         if is_dataclass(o):
             return asdict(o)
         return json.JSONEncoder.default(self, o)
 
 
-@dataclass
+@dataclass(slots=True)
 class Statement:
     name: str = ""
     conditions: list[dict] = field(default_factory=list)
     actions: list[dict] = field(default_factory=list)
 
+    def to_dict(self) -> dict:
+        return {"name": self.name, "conditions": self.conditions, "actions": self.actions}
+
     def is_empty(self) -> bool:
         return len(self.actions) == 0
 
@@ -32,12 +41,15 @@ class Statement:
         return Statement(name="", conditions=[], actions=[])
 
 
-@dataclass
+@dataclass(slots=True)
 class PolicyModel:
     name: str = ""
     statements: list[Statement] = field(default_factory=list)
     default: dict = field(default_factory=dict)
 
+    def to_dict(self) -> dict:
+        return {"name": self.name, "statements": self.statements, "default": self.default}
+
     def set_default_accept(self):
         self.default = {"actions": [{"target": "accept"}]}
 
@@ -63,7 +75,7 @@ class PolicyModel:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class AddressFamily:
     afi: str
     safi: str
@@ -73,23 +85,61 @@ class AddressFamily:
     route_policy_in: str = ""
     route_policy_out: str = ""
 
+    def to_dict(self) -> dict:
+        return {
+            "afi": self.afi,
+            "safi": self.safi,
+            "send_community_ebgp": self.send_community_ebgp,
+            "next_hop_self": self.next_hop_self,
+            "remove_private_as": self.remove_private_as,
+            "route_policy_in": self.route_policy_in,
+            "route_policy_out": self.route_policy_out,
+        }
+
 
-@dataclass
+@dataclass(slots=True)
 class BGPNeighbor:
     remote_as: int
     remote_ip: str
     address_families: list[AddressFamily] = field(default_factory=list)
 
+    def to_dict(self) -> dict:
+        return {"remote_as": self.remote_as, "remote_ip": self.remote_ip, "address_families": self.address_families}
+
 
 class XRTranslator:
-    def __init__(self, ttp_parsed_data: dict):
+    def __init__(
+        self,
+        ttp_parsed_data: dict,
+        dedupe_conditional_policies: bool = False,
+        root_policies: list[str] | None = None,
+    ):
         self.logger = getLogger("main")
+        # per-rule/per-object messages (TRACE level, sampled)
+        self._trace = TraceSampler(self.logger)
         self.node = ""
         self.community_set = []
         self.aspath_set = []
         self.prefix_set = []
+        # indexes of sets to look up them by name (built in translate_prefix_set/translate_community_set)
+        self._prefix_set_index: dict[str, dict] = {}  # name -> (first) prefix-set
+        self._prefix_set_exact_only: dict[str, bool | None] = {}  # name -> contains only exact match-type
+        self._community_set_index: dict[str, list[dict]] = {}  # name -> community-sets
         self.bgp_neighbors: list[BGPNeighbor] = []
+        # NOTE: add policies with _add_policy() to keep the name index
         self.policies: list[PolicyModel] = []
+        self._policy_index: dict[str, int] = {}  # policy name -> index of the (first) policy in self.policies
+        self._duplicated_policy_names: set[str] = set()
+        # memo of translate_match (match string -> conditions)
+        self._match_cache: dict[str, list | None] = {}
+        # share generated conditional policies which have same contents (opt-in)
+        self.dedupe_conditional_policies = dedupe_conditional_policies
+        self._conditional_policy_index: dict[str, PolicyModel] = {}  # contents -> canonical policy
+        self.deduplicated_policies = 0
+        # policies used by bgp (router bgp in config text): translate only policies reachable from them
+        # and output only sets referenced by them (None: all)
+        self.root_policies = root_policies
+        self.unreferenced: dict[str, list[str]] = {}  # kind of object (policies, prefix-set, ...) -> names
 
         self.ttp_parsed_data = ttp_parsed_data[0][0]
 
@@ -110,18 +160,48 @@ class XRTranslator:
                     actions=[{"local-preference": "100"}, {"next-hop": "self"}],
                 )
             )
-            self.policies.append(ibgp_export)
+            self._add_policy(ibgp_export)
         else:
             self.logger.info("ibgp-export policy found.")
 
+    def _add_policy(self, policy: PolicyModel) -> None:
+        if policy.name in self._policy_index:
+            self._duplicated_policy_names.add(policy.name)
+        else:
+            self._policy_index[policy.name] = len(self.policies)
+        self.policies.append(policy)
+
+    def _add_conditional_policy(self, policy: PolicyModel, opposite_policy: PolicyModel | None = None) -> PolicyModel:
+        """Add a generated conditional policy (and its opposite policy)
+        Args:
+            policy (PolicyModel): if-condition policy
+            opposite_policy (PolicyModel): not-if-condition policy of the if-condition policy (if exists)
+        Returns:
+            PolicyModel: policy to refer; the policy which has same contents and is added before if deduplicated
+        """
+        if self.dedupe_conditional_policies:
+            # not-if-condition policy only refers the if-condition policy, so contents of the if-condition is the key
+            contents = repr((policy.statements, policy.default, opposite_policy is None))
+            canonical_policy = self._conditional_policy_index.get(contents)
+            if canonical_policy is not None:
+                self.logger.info("conditional policy %s is same as %s", policy.name, canonical_policy.name)
+                self.deduplicated_policies += 1
+                return canonical_policy
+            self._conditional_policy_index[contents] = policy
+
+        self._add_policy(policy)
+        if opposite_policy is not None:
+            self._add_policy(opposite_policy)
+        return policy
+
     def get_policy_by_name(self, name: str) -> Union[PolicyModel, None]:
-        result = [p for p in self.policies if p.name == name]
-        if len(result) == 0:
-            self.logger.info(f"No policy objects found for {name}.")
+        index = self._policy_index.get(name)
+        if index is None:
+            self.logger.info("No policy objects found for %s.", name)
             return None
-        if len(result) > 1:
-            self.logger.info(f"multiple policy objects found for {name}.")
-        return result[0]
+        if name in self._duplicated_policy_names:
+            self.logger.info("multiple policy objects found for %s.", name)
+        return self.policies[index]
 
     def get_opposite_policy(self, policy: PolicyModel) -> Union[PolicyModel, None]:
         maps = {
@@ -139,35 +219,33 @@ class XRTranslator:
                 maps[PolicyPrefix.NOT_IF_CONDITION].value,
             )
         else:
-            self.logger.info("Could not find opposite policy for {name}.")
+            self.logger.info("Could not find opposite policy for %s.", policy.name)
             opposite_policy_name = None
 
         if opposite_policy_name:
-            self.logger.info(f"opposite policy for '{policy}' is '{opposite_policy_name}'")
+            self._trace("opposite policy for '%s' is '%s'", policy, opposite_policy_name)
             opposite_policy = self.get_policy_by_name(opposite_policy_name)
             return opposite_policy
 
-        self.logger.info(f"opposite policy for '{policy}' not found")
+        self._trace("opposite policy for '%s' not found", policy)
         return None
 
     def update_policy(self, policy: PolicyModel):
-        name = policy.name
-        target_policy = self.get_policy_by_name(name)
-        target_index = self.policies.index(target_policy)
+        target_index = self._policy_index[policy.name]
         self.policies[target_index] = policy
 
     def translate_bgp_neighbors(self) -> None:
         for ttp_neighbor in self.ttp_parsed_data["bgp"]["neighbors"]:
-            self.logger.info(f"translate bgp neighbor: {ttp_neighbor}")
+            self._trace("translate bgp neighbor: %s", ttp_neighbor)
             if "remote-as" not in ttp_neighbor or "remote-ip" not in ttp_neighbor:
-                self.logger.error(f"not found remote-as/ip info in {ttp_neighbor} (use neighbor-group?)")
+                self.logger.error("not found remote-as/ip info in %s (use neighbor-group?)", ttp_neighbor)
                 continue
             neighbor = BGPNeighbor(remote_as=ttp_neighbor["remote-as"], remote_ip=ttp_neighbor["remote-ip"])
             for ttp_af in ttp_neighbor["address-families"]:
                 af = self.translate_af(ttp_af)
                 neighbor.address_families.append(af)
 
-            self.logger.info(f"append neighbor; {neighbor}")
+            self._trace("append neighbor; %s", neighbor)
             self.bgp_neighbors.append(neighbor)
 
     def translate_af(self, ttp_af: [dict]) -> AddressFamily:
@@ -186,7 +264,7 @@ class XRTranslator:
                 elif attr["value"] == "next-hop-self":
                     af.next_hop_self = True
                     if "route-policy" not in ttp_af["configs"]:
-                        self.logger.info(f"auto generate ibgp-export: {str(ttp_af)}")
+                        self.logger.info("auto generate ibgp-export: %s", ttp_af)
                         af.route_policy_out = "ibgp-export"
                 elif attr["value"] == "remove-private-AS":
                     af.remove_private_as = True
@@ -208,19 +286,23 @@ class XRTranslator:
             self.logger.info("ipv4 address not found.")
             return
 
-        self.logger.info(f"-- node: {loopback0['ipv4']['address']}")
+        self.logger.info("-- node: %s", loopback0["ipv4"]["address"])
         self.node = loopback0["ipv4"]["address"]
 
     def translate_community_set(self) -> None:
         self.logger.info("- community-set")
         if "community-sets" in self.ttp_parsed_data.keys():
             for community_obj in self.ttp_parsed_data["community-sets"]:
-                self.logger.info(f"-- community: {community_obj}")
+                self._trace("-- community: %s", community_obj)
                 community_data = {
                     "name": community_obj["name"],
                     "communities": community_obj["communities"],
                 }
-                self.community_set.append(community_data)
+                self._add_community_set(community_data)
+
+    def _add_community_set(self, community_data: dict) -> None:
+        self._community_set_index.setdefault(community_data["name"], []).append(community_data)
+        self.community_set.append(community_data)
 
     def translate_aspath_set(self) -> None:
         if "as-path-sets" not in self.ttp_parsed_data.keys():
@@ -228,7 +310,7 @@ class XRTranslator:
             return
         self.logger.info("- as-path-set")
         for aspath_obj in self.ttp_parsed_data["as-path-sets"]:
-            self.logger.info(f"-- as-path-set: {aspath_obj}")
+            self._trace("-- as-path-set: %s", aspath_obj)
 
             aspath_data = {
                 "group-name": aspath_obj["name"],
@@ -275,11 +357,11 @@ class XRTranslator:
         self.logger.info("- prefix-set")
         if "prefix-sets" in self.ttp_parsed_data.keys():
             for item in self.ttp_parsed_data["prefix-sets"]:
-                self.logger.info(f"-- prefix-set: {item}")
+                self._trace("-- prefix-set: %s", item)
                 prefixes = []
 
                 if "prefixes" not in item:
-                    self.logger.info(f"prefixes not found in {item}")
+                    self.logger.info("prefixes not found in %s", item)
                     continue
 
                 for prefix_obj in item["prefixes"]:
@@ -315,15 +397,15 @@ class XRTranslator:
                         }
                     )
 
-                self.prefix_set.append(
-                    {
-                        "name": item["name"],
-                        "prefixes": prefixes,
-                    }
-                )
+                prefix_set_data = {
+                    "name": item["name"],
+                    "prefixes": prefixes,
+                }
+                self._prefix_set_index.setdefault(item["name"], prefix_set_data)
+                self.prefix_set.append(prefix_set_data)
 
     def translate_rule(self, rule: dict) -> dict:
-        self.logger.info(f"translate rule: {rule}")
+        self._trace("translate rule: %s", rule)
         action = {}
         if rule["action"] == "set":
             attr = rule["attr"]
@@ -376,36 +458,42 @@ class XRTranslator:
 
         """
         route_filter_list = []
-        for item in self.prefix_set:
-            if item["name"] == prefix_list_name:
-                for prefix_item in item["prefixes"]:
-                    self.logger.info(
-                        f"- convert prefix-list:{prefix_list_name} into route-filter {prefix_item['prefix']}"
-                    )
-                    route_filter_list.append({"route-filter": prefix_item})
-                return route_filter_list
-        self.logger.info(f"{prefix_list_name} is not match in prefix-list_data")
+        item = self._prefix_set_index.get(prefix_list_name)
+        if item is None:
+            self.logger.info("%s is not match in prefix-list_data", prefix_list_name)
+            return route_filter_list
+        for prefix_item in item["prefixes"]:
+            self._trace("- convert prefix-list:%s into route-filter %s", prefix_list_name, prefix_item["prefix"])
+            route_filter_list.append({"route-filter": prefix_item})
         return route_filter_list
 
-    def check_prefix_list_only_exact_matchtype(self, prefix_list_name: str) -> bool:
+    def check_prefix_list_only_exact_matchtype(self, prefix_list_name: str) -> bool | None:
         """Check prefix-list contain match-type only exact
         Args:
             prefix_list_name (str): prefix_list name of Conversion target
         Returns:
-            Bool: True if prefix-list contain only exact match-type, False if not
+            Bool: True if prefix-list contain only exact match-type, False if not (None if prefix-list is not found)
         """
-
-        for item in self.prefix_set:
-            if item["name"] == prefix_list_name:
-                for prefix_item in item["prefixes"]:
-                    if prefix_item["match-type"] == "exact":
-                        continue
-                    else:
-                        self.logger.info(f"{prefix_list_name} contain not exact match-type")
-                        return False
-                return True
+        if prefix_list_name not in self._prefix_set_exact_only:
+            item = self._prefix_set_index.get(prefix_list_name)
+            exact_only = None
+            if item is not None:
+                exact_only = all(prefix_item["match-type"] == "exact" for prefix_item in item["prefixes"])
+                if not exact_only:
+                    self.logger.info("%s contain not exact match-type", prefix_list_name)
+            self._prefix_set_exact_only[prefix_list_name] = exact_only
+        return self._prefix_set_exact_only[prefix_list_name]
 
     def translate_match(self, match: str) -> list | None:
+        # as-path length condition generates an as-path-set for each match (not memoized)
+        if match.split()[0] == "as-path" and "length" in match:
+            return self._translate_match(match)
+        if match not in self._match_cache:
+            self._match_cache[match] = self._translate_match(match)
+        conditions = self._match_cache[match]
+        return None if conditions is None else list(conditions)
+
+    def _translate_match(self, match: str) -> list | None:
         condition = []
         # destination in prefix-list
         if match.split()[0] == "destination":
@@ -451,25 +539,24 @@ class XRTranslator:
         if if_condition["op"] in ["and", "state"]:
             statement = Statement(name="10")
             matches = if_condition["matches"]
+            community_condition = []
             for match in matches:
                 conditions = self.translate_match(match)
+                if "community" in match and conditions:
+                    community_condition.append(conditions[0])
                 if conditions:
                     statement.conditions.extend(conditions)
                 else:
-                    self.logger.info(f"{match} could not be translated.")
+                    self.logger.info("%s could not be translated.", match)
                     statement.conditions.extend([{"_message": {"TRANSLATION_FAILED": match}}])
             statement.actions.append({"target": "accept"})
             if if_condition["op"] == "and":
-                community_condition = []
-                for match in if_condition["matches"]:
-                    if "community" in match:
-                        community_condition.append(self.translate_match(match)[0])
-                        self.logger.info(self.translate_match(match)[0])
+                self._trace("community conditions: %s", community_condition)
                 if len(community_condition) > 1:
                     new_community_set_name = self.create_community_set_in_and_condition(community_condition)
                     statement.conditions = [item for item in statement.conditions if "community" not in item]
                     statement.conditions.append({"community": [new_community_set_name]})
-                    self.logger.info(f"update condition community: {new_community_set_name}")
+                    self._trace("update condition community: %s", new_community_set_name)
             if_policy = PolicyModel(
                 name=f"{PolicyPrefix.IF_CONDITION.value}{basename}",
                 statements=[statement],
@@ -485,7 +572,7 @@ class XRTranslator:
                 if conditions:
                     statement.conditions.extend(conditions)
                 else:
-                    self.logger.info(f"{match} could not be translated.")
+                    self.logger.info("%s could not be translated.", match)
                     statement.conditions.extend([{"_message": {"TRANSLATION_FAILED": match}}])
                 statement.actions.append({"target": "accept"})
                 statement_list.append(statement)
@@ -511,25 +598,34 @@ class XRTranslator:
         new_community_set_name = []
         new_community_set_communities = []
         for item in communities:
-            for i in self.community_set:
-                if "community" in item:
-                    if i["name"] == item["community"][0]:
-                        new_community_set_name.append(item["community"][0])
-                        new_community_set_communities.extend(i["communities"])
-                # if i["name"] == item["community"][0]:
-                #   new_community_set_name.append(item["community"][0])
-                #   new_community_set_communities.extend(i["communities"])
-        self.community_set.append(
-            {
-                "name": "-and-".join(new_community_set_name),
-                "communities": new_community_set_communities,
-            }
-        )
-        self.logger.info(f"create new_community-set: {self.community_set[-1]['name']}")
-        return self.community_set[-1]["name"]
+            if "community" not in item:
+                continue
+            for community_set in self._community_set_index.get(item["community"][0], []):
+                new_community_set_name.append(item["community"][0])
+                new_community_set_communities.extend(community_set["communities"])
+        new_community_set = {
+            "name": "-and-".join(new_community_set_name),
+            "communities": new_community_set_communities,
+        }
+        if self.dedupe_conditional_policies and new_community_set in self._community_set_index.get(
+            new_community_set["name"], []
+        ):
+            # same community-set is created by another and-condition
+            self._trace("share community-set: %s", new_community_set["name"])
+            return new_community_set["name"]
+        self._add_community_set(new_community_set)
+        self._trace("create new_community-set: %s", new_community_set["name"])
+        return new_community_set["name"]
 
     def translate_policies(self):
-        for policy in self.ttp_parsed_data["policies"]:
+        ttp_policies = self.ttp_parsed_data["policies"]
+        if self.root_policies is not None:
+            reachable = reachable_policies({p["name"]: p for p in ttp_policies}, self.root_policies)
+            self.unreferenced["policies"] = [p["name"] for p in ttp_policies if p["name"] not in reachable]
+            self.logger.info("skip %d unreferenced policies", len(self.unreferenced["policies"]))
+            ttp_policies = [p for p in ttp_policies if p["name"] in reachable]
+
+        for policy in ttp_policies:
             self.translate_policy(ttp_policy=policy)
 
         # neighborのコンフィグ配下に記述される設定への対応
@@ -539,21 +635,25 @@ class XRTranslator:
                 if af.next_hop_self:
                     if af.route_policy_out:
                         if "ibgp-export" in str(af.route_policy_out):
-                            self.logger.info("auto generate af data:" + str(af))
-                            self.logger.info("execute auto_gen_ibgp_export:" + str(self.auto_gen_ibgp_export()))
+                            self.logger.info("auto generate af data: %s", af)
+                            self.logger.info("execute auto_gen_ibgp_export: %s", self.auto_gen_ibgp_export())
                         export_policy = self.get_policy_by_name(af.route_policy_out)
 
                         # すでにnext-hop-selfが反映されたポリシーには追加しない
                         if export_policy and not export_policy.has_next_hop_self_in_head():
                             export_policy.insert_next_hop_self_in_head()
                     else:
-                        self.logger.info(f"no export policy found: {af}")
+                        self.logger.info("no export policy found: %s", af)
+
+        if self.root_policies is not None:
+            sets = {"prefix-set": self.prefix_set, "as-path-set": self.aspath_set, "community-set": self.community_set}
+            self.unreferenced.update(prune_sets(sets, self.policies))
 
     def translate_policy(
         self, ttp_policy: dict, parent_conditional_policy: PolicyModel = None
     ) -> Union[list[Statement], None]:
 
-        self.logger.info(f"translating policy: {ttp_policy}")
+        self._trace("translating policy: %s", ttp_policy)
         policy = PolicyModel(default={"actions": []})
         policy.name = ttp_policy["name"]
 
@@ -563,7 +663,7 @@ class XRTranslator:
         statement = Statement.generate_empty_statement()
 
         for rule in ttp_policy["rules"]:
-            self.logger.info(f"start: {rule}")
+            self._trace("start: %s", rule)
             count += 10
             policy_basename = f"{policy.name}-{count}"
 
@@ -581,7 +681,7 @@ class XRTranslator:
                     statement = Statement(name=policy_basename, conditions=conditions, actions=[action])
 
             elif rule["if"] == "if":
-                self.logger.info(f"'if' rule found in {policy.name}: {rule}")
+                self._trace("'if' rule found in %s: %s", policy.name, rule)
 
                 past_conditional_policies = []
 
@@ -599,7 +699,7 @@ class XRTranslator:
                     )
 
                 if_policy.set_default_reject()
-                self.policies.extend([if_policy, not_if_policy])
+                if_policy = self._add_conditional_policy(if_policy, not_if_policy)
                 past_conditional_policies.append(if_policy)
 
                 base_conditions = [{"policy": if_policy.name}]
@@ -612,13 +712,13 @@ class XRTranslator:
                 statement = Statement(name=f"{policy_basename}", conditions=base_conditions, actions=[])
 
                 # ---------- then句の組み立て開始(if) ----------
-                self.logger.info(rule)
+                self._trace("%s", rule)
                 child_count = 10
 
                 for inner_rule in rule["rules"]:
                     if "if" in inner_rule.keys():
 
-                        self.logger.info(f"translate nested if/elseif: {inner_rule}")
+                        self._trace("translate nested if/elseif: %s", inner_rule)
 
                         if not statement.is_empty():
                             policy.statements.append(statement)
@@ -629,19 +729,19 @@ class XRTranslator:
                             "name": f"{policy_basename}-{child_count}",
                             "rules": [inner_rule],
                         }
-                        self.logger.info(f"dummy policy: {_dummy_ttp_policy}")
+                        self._trace("dummy policy: %s", _dummy_ttp_policy)
                         child_statements = self.translate_policy(
                             ttp_policy=_dummy_ttp_policy,
                             parent_conditional_policy=if_policy,
                         )
-                        self.logger.info(f"inner rule: {child_statements}")
+                        self._trace("inner rule: %s", child_statements)
                         policy.statements.extend(child_statements)
                     else:
                         inner_action = self.translate_rule(inner_rule)
                         if inner_action:
                             statement.actions.append(inner_action)
                         else:
-                            self.logger.info(f"{inner_rule} could not be translated.")
+                            self.logger.info("%s could not be translated.", inner_rule)
                     child_count += 10
 
                 # ---------- then句の組み立て終わり(if) ----------
@@ -652,7 +752,7 @@ class XRTranslator:
                 statement = Statement.generate_empty_statement()
 
             elif rule["if"] == "elseif":
-                self.logger.info(f"'elseif' rule found in {policy.name}: {rule}")
+                self._trace("'elseif' rule found in %s: %s", policy.name, rule)
 
                 # ---------- from句の組み立て開始(elseif) ----------
                 # if文の条件判定を行うためのポリシーを作成
@@ -672,11 +772,11 @@ class XRTranslator:
                     )
 
                 if_policy.set_default_reject()
-                self.policies.extend([if_policy, not_if_policy])
+                if_policy = self._add_conditional_policy(if_policy, not_if_policy)
                 base_conditions = [{"policy": if_policy.name}]
                 past_conditional_policies.append(if_policy)
 
-                self.logger.info(rule)
+                self._trace("%s", rule)
                 child_count = 10
 
                 # ---------- from句の組み立て終わり(elseif) ----------
@@ -691,7 +791,7 @@ class XRTranslator:
 
                 for inner_rule in rule["rules"]:
                     if "if" in inner_rule.keys():
-                        self.logger.info(f"translate nested if/elseif: {inner_rule}")
+                        self._trace("translate nested if/elseif: %s", inner_rule)
 
                         if not statement.is_empty():
                             policy.statements.append(statement)
@@ -702,19 +802,19 @@ class XRTranslator:
                             "name": f"{policy_basename}-{child_count}",
                             "rules": [inner_rule],
                         }
-                        self.logger.info(f"dummy policy: {_dummy_ttp_policy}")
+                        self._trace("dummy policy: %s", _dummy_ttp_policy)
                         child_statements = self.translate_policy(
                             ttp_policy=_dummy_ttp_policy,
                             parent_conditional_policy=if_policy,
                         )
-                        self.logger.info(f"inner rule: {child_statements}")
+                        self._trace("inner rule: %s", child_statements)
                         policy.statements.extend(child_statements)
                     else:
                         inner_action = self.translate_rule(inner_rule)
                         if inner_action:
                             statement.actions.append(inner_action)
                         else:
-                            self.logger.info(f"{inner_rule} could not be translated.")
+                            self.logger.info("%s could not be translated.", inner_rule)
 
                     child_count += 10
 
@@ -724,14 +824,13 @@ class XRTranslator:
                 statement = Statement.generate_empty_statement()
 
             elif rule["if"] == "else":
-                self.logger.info(f"'else' rule found in {policy.name}: {rule}")
+                self._trace("'else' rule found in %s: %s", policy.name, rule)
 
                 # ---------- from句の組み立て開始(else) ----------
                 else_policy = PolicyModel(
                     name=f"{PolicyPrefix.IF_CONDITION.value}{policy_basename}-else",
                 )
                 else_policy.set_default_accept()
-                base_conditions = [{"policy": else_policy.name}]
 
                 # elseなので前にあるif/elseif節の条件に合致するものはrejectする
                 for i, past_policy in enumerate(past_conditional_policies):
@@ -739,7 +838,8 @@ class XRTranslator:
                         policy=past_policy, statement_name=f"past-policy-{i}"
                     )
 
-                self.policies.append(else_policy)
+                else_policy = self._add_conditional_policy(else_policy)
+                base_conditions = [{"policy": else_policy.name}]
 
                 # ---------- from句の組み立て終わり(else) ----------
 
@@ -756,7 +856,7 @@ class XRTranslator:
                     if inner_action:
                         statement.actions.append(inner_action)
                     else:
-                        self.logger.info(f"{inner_rule} could not be translated.")
+                        self.logger.info("%s could not be translated.", inner_rule)
                     child_count += 10
 
                 if statement.actions:
@@ -765,7 +865,7 @@ class XRTranslator:
                 statement = Statement.generate_empty_statement()
 
             else:
-                self.logger.info(f"rule not translated: {rule}")
+                self.logger.info("rule not translated: %s", rule)
 
         if not statement.is_empty():
             policy.statements.append(statement)
@@ -774,8 +874,8 @@ class XRTranslator:
         if parent_conditional_policy:
             return policy.statements
 
-        self.logger.info(f"appending policy: {policy}")
-        self.policies.append(policy)
+        self._trace("appending policy: %s", policy)
+        self._add_policy(policy)
         return None
 
 
@@ -798,4 +898,5 @@ if __name__ == "__main__":
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(policy_model_output, fp=f, indent=2, cls=PMEncoder)
 
+    setup_logging()
     main(argv[1], argv[2])
@@ -0,0 +1,217 @@
+import argparse
+import random
+import sys
+from dataclasses import dataclass
+from typing import List
+
+# max nesting depth of if/elseif/else in TTP template (src/template/cisco_ios_xr.ttp)
+MAX_IF_DEPTH = 3
+
+
+@dataclass
+class ConfigSpec:
+    """Size of a generated config"""
+
+    prefix_lists: int = 20
+    policies: int = 20
+    terms: int = 4  # terms (juniper) or if-blocks (cisco_ios_xr) in a policy
+    depth: int = 2  # nesting depth of if/elseif/else (cisco_ios_xr)
+    communities: int = 20
+    neighbors: int = 8
+    seed: int = 0
+
+
+def _loopback(seed: int) -> str:
+    return f"192.168.{(seed + 1) // 256 % 256}.{(seed + 1) % 256}"
+
+
+def _prefixes(rng: random.Random, count: int) -> List[str]:
+    return [f"10.{rng.randrange(256)}.{rng.randrange(256)}.0/{rng.choice([16, 20, 24])}" for _ in range(count)]
+
+
+def _juniper_term(rng: random.Random, spec: ConfigSpec, term: int, chain: str | None) -> List[str]:
+    conditions = []
+    if chain:
+        conditions.append(f"policy {chain}")
+    else:
+        if spec.prefix_lists:
+            conditions.append(f"prefix-list pl-{rng.randrange(spec.prefix_lists)}")
+        if spec.communities:
+            conditions.append(f"community com-{rng.randrange(spec.communities)}")
+    lines = [f"        term {term} {{"]
+    if len(conditions) == 1:
+        lines.append(f"            from {conditions[0]};")
+    elif conditions:
+        lines.extend(["            from {", *[f"                {c};" for c in conditions], "            }"])
+    actions = [f"local-preference {rng.choice([100, 200, 300])}", f"metric {rng.randrange(1000)}"]
+    if spec.communities:
+        actions.append(f"community add com-{rng.randrange(spec.communities)}")
+    actions.append(rng.choice(["accept", "reject"]))
+    lines.extend(["            then {", *[f"                {a};" for a in actions], "            }", "        }"])
+    return lines
+
+
+def generate_juniper_config(spec: ConfigSpec) -> str:
+    """Generate a Junos config (curly-brace format)
+    Args:
+        spec (ConfigSpec): Size of the config
+    Returns:
+        str: Config text
+    """
+    rng = random.Random(spec.seed)
+    loopback = _loopback(spec.seed)
+    lines = [
+        "interfaces {",
+        "    lo0 {",
+        "        unit 0 {",
+        "            family inet {",
+        f"                address {loopback}/32;",
+        "            }",
+        "        }",
+        "    }",
+        "}",
+        "routing-options {",
+        "    autonomous-system 65000;",
+        "}",
+        "protocols {",
+        "    bgp {",
+        "        group EXTERNAL {",
+        "            type external;",
+    ]
+    for i in range(spec.neighbors):
+        lines.extend(
+            [
+                f"            neighbor 172.16.{i // 256 % 256}.{i % 256} {{",
+                f"                import pol-{rng.randrange(max(spec.policies, 1))};",
+                f"                export pol-{rng.randrange(max(spec.policies, 1))};",
+                f"                peer-as {65001 + i};",
+                "            }",
+            ]
+        )
+    lines.extend(["        }", "    }", "}", "policy-options {"])
+
+    for i in range(spec.prefix_lists):
+        lines.append(f"    prefix-list pl-{i} {{")
+        lines.extend(f"        {prefix};" for prefix in _prefixes(rng, rng.randint(1, 4)))
+        lines.append("    }")
+    for i in range(spec.policies):
+        lines.append(f"    policy-statement pol-{i} {{")
+        for j in range(spec.terms):
+            # first term refers to a following policy (policy chain)
+            chain = f"pol-{rng.randrange(i + 1, spec.policies)}" if j == 0 and i + 1 < spec.policies else None
+            lines.extend(_juniper_term(rng, spec, (j + 1) * 10, chain))
+        lines.extend(["        then reject;", "    }"])
+    for i in range(spec.communities):
+        lines.append(f"    community com-{i} members {65000 + i % 100}:{i};")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _cisco_ios_xr_condition(rng: random.Random, spec: ConfigSpec) -> str:
+    conditions = []
+    if spec.prefix_lists:
+        conditions.append(f"destination in pl-{rng.randrange(spec.prefix_lists)}")
+    if spec.communities:
+        conditions.append(f"community matches-any com-{rng.randrange(spec.communities)}")
+    conditions.append(f"as-path in asp-{rng.randrange(4)}")
+    rng.shuffle(conditions)
+    return f" {rng.choice(['and', 'or'])} ".join(conditions[: rng.randint(1, 2)])
+
+
+def _cisco_ios_xr_actions(rng: random.Random, spec: ConfigSpec, indent: str) -> List[str]:
+    actions = [f"set local-preference {rng.choice([100, 200, 300])}", f"set med {rng.randrange(1000)}"]
+    if spec.communities:
+        actions.append(f"set community com-{rng.randrange(spec.communities)}")
+    actions.append(rng.choice(["pass", "drop", "done"]))
+    return [f"{indent}{a}" for a in actions]
+
+
+def _cisco_ios_xr_if_block(rng: random.Random, spec: ConfigSpec, depth: int, indent: str) -> List[str]:
+    lines = []
+    for keyword in ["if", "elseif", "else"]:
+        if keyword == "else":
+            # TTP template: no nested if in else
+            lines.append(f"{indent}else")
+        else:
+            lines.append(f"{indent}{keyword} {_cisco_ios_xr_condition(rng, spec)} then")
+        if depth > 1 and keyword != "else":
+            lines.extend(_cisco_ios_xr_if_block(rng, spec, depth - 1, indent + "  "))
+        lines.extend(_cisco_ios_xr_actions(rng, spec, indent + "  "))
+    lines.append(f"{indent}endif")
+    return lines
+
+
+def generate_cisco_ios_xr_config(spec: ConfigSpec) -> str:
+    """Generate an IOS-XR config
+    Args:
+        spec (ConfigSpec): Size of the config
+    Returns:
+        str: Config text
+    """
+    if not 1 <= spec.depth <= MAX_IF_DEPTH:
+        raise ValueError(f"depth must be 1-{MAX_IF_DEPTH}: {spec.depth}")
+    rng = random.Random(spec.seed)
+    loopback = _loopback(spec.seed)
+    lines = [f"hostname xr-{spec.seed}", "interface Loopback0", f" ipv4 address {loopback} 255.255.255.255", "!"]
+
+    for i in range(spec.prefix_lists):
+        prefixes = _prefixes(rng, rng.randint(1, 4))
+        lines.append(f"prefix-set pl-{i}")
+        lines.extend(f"  {prefix}," for prefix in prefixes[:-1])
+        lines.extend([f"  {prefixes[-1]} le 24", "end-set", "!"])
+    for i in range(4):
+        lines.extend([f"as-path-set asp-{i}", f"  ios-regex '^({65001 + i}_)+$'", "end-set", "!"])
+    for i in range(spec.communities):
+        lines.extend([f"community-set com-{i}", f"  {65000 + i % 100}:{i}", "end-set", "!"])
+    for i in range(spec.policies):
+        lines.append(f"route-policy rp-{i}")
+        for _ in range(spec.terms):
+            lines.extend(_cisco_ios_xr_if_block(rng, spec, spec.depth, "  "))
+        lines.extend(["  drop", "end-policy", "!"])
+
+    lines.extend(["router bgp 65000", f" bgp router-id {loopback}", " address-family ipv4 unicast", " !"])
+    for i in range(spec.neighbors):
+        lines.extend(
+            [
+                f" neighbor 172.16.{i // 256 % 256}.{i % 256}",
+                f"  remote-as {65001 + i}",
+                "  address-family ipv4 unicast",
+                f"   route-policy rp-{rng.randrange(max(spec.policies, 1))} in",
+                f"   route-policy rp-{rng.randrange(max(spec.policies, 1))} out",
+                "   next-hop-self",
+                "  !",
+                " !",
+            ]
+        )
+    lines.extend(["!", "end"])
+    return "\n".join(lines) + "\n"
+
+
+GENERATORS = {"juniper": generate_juniper_config, "cisco_ios_xr": generate_cisco_ios_xr_config}
+
+
+def generate_config(os_type: str, spec: ConfigSpec) -> str:
+    """Generate a config deterministically (same spec generates same config)
+    Args:
+        os_type (str): OS type string (juniper, cisco_ios_xr)
+        spec (ConfigSpec): Size of the config
+    Returns:
+        str: Config text
+    """
+    return GENERATORS[os_type](spec)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic config")
+    parser.add_argument("--os-type", "-o", required=True, choices=list(GENERATORS), help="OS type")
+    parser.add_argument("--prefix-lists", default=ConfigSpec.prefix_lists, type=int, help="Number of prefix-lists")
+    parser.add_argument("--policies", default=ConfigSpec.policies, type=int, help="Number of policies")
+    parser.add_argument("--terms", default=ConfigSpec.terms, type=int, help="Number of terms/if-blocks in a policy")
+    parser.add_argument("--depth", default=ConfigSpec.depth, type=int, help="Nesting depth of if (cisco_ios_xr)")
+    parser.add_argument("--communities", default=ConfigSpec.communities, type=int, help="Number of communities")
+    parser.add_argument("--neighbors", default=ConfigSpec.neighbors, type=int, help="Number of BGP neighbors")
+    parser.add_argument("--seed", default=ConfigSpec.seed, type=int, help="Random seed (and loopback address)")
+    args = parser.parse_args()
+
+    config_spec = ConfigSpec(**{k: v for k, v in vars(args).items() if k != "os_type"})
+    sys.stdout.write(generate_config(args.os_type, config_spec))
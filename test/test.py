@@ -1,10 +1,45 @@
+# pylint: disable=too-many-lines
 import os
+import glob
+import gzip
 import json
+import logging
+import math
+import shutil
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, fields
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
 from ttp import ttp
+
+# generator of configs (shared with benchmark suite)
+from config_generator import ConfigSpec, generate_config  # pylint: disable=import-error
+
 # see pytest.ini, pythonpath (added ../src dir to pythonpath)
 # pylint: disable=import-error
-from xr_translator import XRTranslator, PMEncoder
+from xr_translator import XRTranslator, PMEncoder, PolicyModel, Statement, AddressFamily, BGPNeighbor
+import parse_bgp_policy
+from parse_cache import ParseCache
+from parse_jobs import ParseJobManager, ParseJobConflict
+from config_filter import filter_config, prescreen_config
+from json_io import dump_json, load_json
+from instrumentation import StageRecorder, merge_stages, read_run_manifest
+from metrics import MetricsRegistry
+from log_config import TRACE, TraceSampler, setup_logging
+from worker_pool import WorkerPool
+from killable_pool import KillablePool, WorkerDied, WorkerTimeout
+from junos_parser import bgp_policy_references, parse_junos_config
+from xr_parser import bgp_policy_references as xr_bgp_policy_references, parse_xr_config
+from policy_references import prune_policy_model, reachable_policies, reference_names
+import metrics
+import post_bgp_policies
+import collect_configs
 from parse_bgp_policy import _convert_juniper_ttp_to_policy_model, valid_parsed_result
+
 # pylint: enable=import-error
 
 FILE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -14,7 +49,6 @@ TEMPLATE_DIR = os.path.join(FILE_DIR, os.pardir, "src", "template")
 EXPECTS_DIR = os.path.join(FILE_DIR, "expects")
 
 
-
 def _ttp_parse(file, template) -> list:
     parser = ttp(file, template)
     parser.parse()
@@ -116,3 +150,1214 @@ def test_cisco_ios_xr_unuse_bgp_ttp():
     valid_result = valid_parsed_result("cisco_ios_xr", output_file, ttp_result[0][0])
 
     assert valid_result is False
+
+
+def _setup_snapshot(work_dir, monkeypatch, unuse_bgp: bool = True) -> None:
+    """Stage test input configs as network:test, snapshot:original_asis under work_dir
+    (configs without bgp too if unuse_bgp)"""
+    monkeypatch.setattr(parse_bgp_policy, "TTP_CONFIGS_DIR", os.path.join(work_dir, "configs"))
+    monkeypatch.setattr(parse_bgp_policy, "TTP_OUTPUTS_DIR", os.path.join(work_dir, "ttp_output"))
+    monkeypatch.setattr(parse_bgp_policy, "TTP_BGP_POLICIES_DIR", os.path.join(work_dir, "policy_model_output"))
+    for os_type in ["juniper", "cisco_ios_xr"]:
+        config_dir = os.path.join(work_dir, "configs", "test", "original_asis", os_type)
+        os.makedirs(config_dir)
+        for file_name in [f"{os_type}.conf", f"{os_type}_unuse_bgp.conf"][: 2 if unuse_bgp else 1]:
+            shutil.copy(os.path.join(INPUT_DIR, file_name), config_dir)
+
+
+def _read_outputs(work_dir) -> dict:
+    outputs = {}
+    for output_dir in ["ttp_output", "policy_model_output"]:
+        for root, _, files in os.walk(os.path.join(work_dir, output_dir)):
+            # run manifest has timings of the run
+            for file_name in [f for f in files if not f.endswith(".manifest.json")]:
+                file_path = os.path.join(root, file_name)
+                with open(file_path, "rb") as f:
+                    outputs[os.path.relpath(file_path, work_dir)] = f.read()
+    return outputs
+
+
+def test_parse_bgp_policies_parallel(tmp_path, monkeypatch):
+    _setup_snapshot(tmp_path / "serial", monkeypatch)
+    parse_bgp_policy.parse_bgp_policies("test", "original_asis", parse_bgp_policy.ParseOptions(jobs=1))
+    serial_outputs = _read_outputs(tmp_path / "serial")
+
+    _setup_snapshot(tmp_path / "parallel", monkeypatch)
+    parse_bgp_policy.parse_bgp_policies("test", "original_asis", parse_bgp_policy.ParseOptions(jobs=2))
+    parallel_outputs = _read_outputs(tmp_path / "parallel")
+
+    assert sorted(serial_outputs.keys()) == [
+        os.path.join("policy_model_output", "test", "original_asis", "cisco_ios_xr.json"),
+        os.path.join("policy_model_output", "test", "original_asis", "juniper.json"),
+        os.path.join("ttp_output", "test", "original_asis", "cisco_ios_xr", "cisco_ios_xr.json"),
+        os.path.join("ttp_output", "test", "original_asis", "cisco_ios_xr", "cisco_ios_xr_unuse_bgp.json"),
+        os.path.join("ttp_output", "test", "original_asis", "juniper", "juniper.json"),
+        os.path.join("ttp_output", "test", "original_asis", "juniper", "juniper_unuse_bgp.json"),
+    ]
+    assert serial_outputs == parallel_outputs
+
+
+def test_ttp_parse_with_cached_template():
+    expects = {}
+    inputs = {}
+    for os_type in ["juniper", "cisco_ios_xr"]:
+        with open(os.path.join(EXPECTS_DIR, os_type, "ttp.json"), "r", encoding="utf-8") as f:
+            expects[os_type] = json.load(f)
+        with open(os.path.join(INPUT_DIR, f"{os_type}.conf"), "r", encoding="utf-8") as f:
+            inputs[os_type] = f.read()
+
+    # parse alternately: templates compiled once must not interfere each other (macros)
+    for _ in range(2):
+        for os_type in ["juniper", "cisco_ios_xr"]:
+            assert parse_bgp_policy._ttp_parse(inputs[os_type], os_type) == expects[os_type]
+
+
+@pytest.mark.parametrize(
+    "os_type,file_name",
+    [
+        ("juniper", "juniper.conf"),
+        ("juniper", "juniper_unuse_bgp.conf"),
+        ("cisco_ios_xr", "cisco_ios_xr.conf"),
+        ("cisco_ios_xr", "cisco_ios_xr_unuse_bgp.conf"),
+    ],
+)
+def test_filter_config(os_type, file_name):
+    with open(os.path.join(INPUT_DIR, file_name), "r", encoding="utf-8") as f:
+        config_txt = f.read()
+    filtered = filter_config(config_txt, os_type)
+    assert len(filtered) < len(config_txt)
+
+    expect = parse_bgp_policy._ttp_parse(config_txt, os_type)
+    if os_type == "cisco_ios_xr":
+        # only loopback interfaces are kept
+        expect[0][0]["interfaces"] = [i for i in expect[0][0]["interfaces"] if i["name"].startswith("Loopback")]
+    assert parse_bgp_policy._ttp_parse(filtered, os_type) == expect
+
+    # unknown format is passed as-is
+    set_style_config = "set protocols bgp group ibgp type internal\n"
+    assert filter_config(set_style_config, "juniper") == set_style_config
+
+
+@pytest.mark.parametrize("chunk_size", [16, 1024**2])
+def test_prescreen_config(tmp_path, chunk_size):
+    for os_type in ["juniper", "cisco_ios_xr"]:
+        assert prescreen_config(os.path.join(INPUT_DIR, f"{os_type}.conf"), os_type, chunk_size) == []
+        assert prescreen_config(os.path.join(INPUT_DIR, f"{os_type}_unuse_bgp.conf"), os_type, chunk_size) == ["bgp"]
+    l2_switch_config = tmp_path / "l2sw.conf"
+    l2_switch_config.write_text("hostname l2sw\ninterface GigabitEthernet0/0/0/0\n shutdown\n!\nend")
+    assert prescreen_config(str(l2_switch_config), "cisco_ios_xr", chunk_size) == ["bgp", "loopback"]
+
+
+def test_parse_bgp_policies_prescreen(tmp_path, monkeypatch):
+    _setup_snapshot(tmp_path / "prescreen", monkeypatch)
+    summary = parse_bgp_policy.parse_bgp_policies(
+        "test", "original_asis", parse_bgp_policy.ParseOptions(prescreen=True)
+    )
+    assert summary["status"] == {"converted": 2, "skipped": 2}
+    assert sorted(summary["skipped"], key=lambda s: s["device"]) == [
+        {"device": "cisco_ios_xr_unuse_bgp", "reason": "bgp not found"},
+        {"device": "juniper_unuse_bgp", "reason": "bgp not found"},
+    ]
+    prescreen_outputs = _read_outputs(tmp_path / "prescreen")
+
+    # prescreen skips only devices which are invalid after parse (disabled by default)
+    _setup_snapshot(tmp_path / "no_prescreen", monkeypatch)
+    summary = parse_bgp_policy.parse_bgp_policies("test", "original_asis", parse_bgp_policy.ParseOptions())
+    assert summary["status"] == {"converted": 2, "invalid": 2}
+    assert {k: v for k, v in _read_outputs(tmp_path / "no_prescreen").items() if "unuse_bgp" not in k} == (
+        prescreen_outputs
+    )
+
+
+def test_parse_bgp_policies_filter_config(tmp_path, monkeypatch):
+    _setup_snapshot(tmp_path / "full", monkeypatch)
+    parse_bgp_policy.parse_bgp_policies("test", "original_asis", parse_bgp_policy.ParseOptions(save_ttp_output=False))
+    expect_outputs = _read_outputs(tmp_path / "full")
+
+    _setup_snapshot(tmp_path / "filtered", monkeypatch)
+    parse_bgp_policy.parse_bgp_policies(
+        "test", "original_asis", parse_bgp_policy.ParseOptions(save_ttp_output=False, filter_config=True)
+    )
+    assert _read_outputs(tmp_path / "filtered") == expect_outputs
+
+
+def test_parse_bgp_policies_cache(tmp_path, monkeypatch):
+    _setup_snapshot(tmp_path / "no_cache", monkeypatch)
+    parse_bgp_policy.parse_bgp_policies("test", "original_asis", parse_bgp_policy.ParseOptions(cache_dir=""))
+    expect_outputs = _read_outputs(tmp_path / "no_cache")
+
+    cache_dir = str(tmp_path / "cache")
+    _setup_snapshot(tmp_path / "cache_miss", monkeypatch)
+    summary = parse_bgp_policy.parse_bgp_policies(
+        "test", "original_asis", parse_bgp_policy.ParseOptions(cache_dir=cache_dir)
+    )
+    assert summary["cache"]["hits"] == 0 and summary["cache"]["misses"] == 4 and summary["cache"]["entries"] == 4
+    assert _read_outputs(tmp_path / "cache_miss") == expect_outputs
+
+    def _ttp_parse_must_not_be_called(text, os_type):
+        raise AssertionError("TTP must be skipped when cache hit")
+
+    monkeypatch.setattr(parse_bgp_policy, "_ttp_parse", _ttp_parse_must_not_be_called)
+    _setup_snapshot(tmp_path / "cache_hit", monkeypatch)
+    summary = parse_bgp_policy.parse_bgp_policies(
+        "test", "original_asis", parse_bgp_policy.ParseOptions(cache_dir=cache_dir)
+    )
+    assert summary["cache"]["hits"] == 4 and summary["cache"]["misses"] == 0
+    assert _read_outputs(tmp_path / "cache_hit") == expect_outputs
+
+
+def test_parse_cache_lru_eviction(tmp_path):
+    cache = ParseCache(str(tmp_path), max_bytes=0)
+    template_file = os.path.join(TEMPLATE_DIR, "juniper.ttp")
+    keys = [cache.key(f"config-{i}", template_file, "juniper") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, [[{"config": i}]], None)
+        os.utime(cache._entry_file(key), (time.time() - 100 + i, time.time() - 100 + i))
+    # key[0] is most recently used
+    assert cache.get(keys[0]) == {"ttp_result": [[{"config": 0}]], "policy_model": None}
+
+    cache.max_bytes = os.path.getsize(cache._entry_file(keys[0])) * 2
+    assert cache.evict() == 1
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.usage()["entries"] == 2
+
+
+def test_parse_bgp_policies_in_memory(tmp_path, monkeypatch):
+    _setup_snapshot(tmp_path, monkeypatch)
+    parse_bgp_policy.parse_bgp_policies("test", "original_asis", parse_bgp_policy.ParseOptions(save_ttp_output=True))
+    outputs = _read_outputs(tmp_path)
+
+    # policy model converted from ttp_output file (disk round-trip) is same as converted in memory
+    for os_type in ["juniper", "cisco_ios_xr"]:
+        ttp_output_file = os.path.join(tmp_path, "ttp_output", "test", "original_asis", os_type, f"{os_type}.json")
+        with open(ttp_output_file, "r", encoding="utf-8") as f:
+            ttp_output = json.load(f)
+        if os_type == "juniper":
+            policy_model = parse_bgp_policy._convert_juniper_ttp_result(ttp_output, ttp_output_file)
+        else:
+            policy_model = parse_bgp_policy._convert_cisco_ios_xr_ttp_result(ttp_output, ttp_output_file)
+        round_trip_file = parse_bgp_policy._save_file(str(tmp_path / "round_trip"), os_type, policy_model, True)
+        with open(round_trip_file, "rb") as f:
+            assert outputs[os.path.join("policy_model_output", "test", "original_asis", f"{os_type}.json")] == f.read()
+
+    # ttp_output is optional
+    _setup_snapshot(tmp_path / "wo_ttp_output", monkeypatch)
+    parse_bgp_policy.parse_bgp_policies("test", "original_asis", parse_bgp_policy.ParseOptions(save_ttp_output=False))
+    outputs_wo_ttp_output = _read_outputs(tmp_path / "wo_ttp_output")
+    assert outputs_wo_ttp_output == {k: v for k, v in outputs.items() if k.startswith("policy_model_output")}
+
+
+def test_parse_job_manager():
+    job_manager = ParseJobManager(concurrency=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def _work(progress):
+        started.set()
+        release.wait(10)
+        progress(
+            {"device": "r1", "os_type": "juniper", "status": "converted", "cache_hit": None, "elapsed": 0.1}, 1, 2
+        )
+        progress({"device": "r2", "os_type": "juniper", "status": "failed", "elapsed": 0.2, "error": "E: x"}, 2, 2)
+        return {"devices": 2}
+
+    job = job_manager.submit("test", "original_asis", _work)
+    assert started.wait(10)
+    assert job_manager.get(job.job_id)["state"] == "running"
+    # a job for same snapshot is rejected while running (sync jobs too)
+    with pytest.raises(ParseJobConflict):
+        job_manager.submit("test", "original_asis", _work)
+    with pytest.raises(ParseJobConflict):
+        job_manager.run("test", "original_asis", _work)
+
+    release.set()
+    assert job_manager.wait(job.job_id, timeout=10)
+    status = job_manager.get(job.job_id)
+    assert status["state"] == "succeeded"
+    assert status["devices_total"] == 2 and status["devices_done"] == 2
+    assert status["devices"]["r2"] == {"os_type": "juniper", "status": "failed", "elapsed": 0.2, "error": "E: x"}
+    assert status["summary"] == {"devices": 2}
+
+    def _failed_work(_progress):
+        raise ValueError("broken")
+
+    failed_job = job_manager.submit("test", "original_asis", _failed_work)
+    assert job_manager.wait(failed_job.job_id, timeout=10)
+    assert job_manager.get(failed_job.job_id)["error"] == "ValueError: broken"
+    assert [j["state"] for j in job_manager.list_jobs()] == ["succeeded", "failed"]
+    assert job_manager.get("unknown") is None
+
+    # sync jobs run in the calling thread: summary is returned and errors are raised
+    assert job_manager.run("test", "original_asis", _work) == {"devices": 2}
+    with pytest.raises(ValueError):
+        job_manager.run("test", "original_asis", _failed_work)
+    assert [j["state"] for j in job_manager.list_jobs()] == ["succeeded", "failed", "succeeded", "failed"]
+    job_manager.history = 1
+    job_manager.run("test", "original_asis", _work)
+    assert len(job_manager.list_jobs()) == 1
+    job_manager.shutdown()
+
+
+def test_sync_parse_conflicts_with_job(monkeypatch):
+    import app  # pylint: disable=import-outside-toplevel,import-error
+
+    monkeypatch.setattr(app, "job_manager", ParseJobManager(concurrency=1))
+    release = threading.Event()
+    job = app.job_manager.submit("test", "original_asis", lambda _progress: release.wait(10))
+    # a sync request must not clean up configs staged by the running job
+    monkeypatch.setattr(app.cc, "cleanup_snapshot_dir", lambda *_: pytest.fail("cleaned up by sync request"))
+    response = app.app.test_client().post("/bgp_policy/test/original_asis/parsed_result", json={})
+    assert response.status_code == 409 and response.get_json()["job_id"] == job.job_id
+    release.set()
+    assert app.job_manager.wait(job.job_id, timeout=10)
+    app.job_manager.shutdown()
+
+
+def test_worker_pool_started_by_request(monkeypatch):
+    import app  # pylint: disable=import-outside-toplevel,import-error
+
+    started, shutdowns = [], []
+    pool = SimpleNamespace(start=lambda: started.append(1), shutdown=lambda **_: None)
+    monkeypatch.setattr(app, "worker_pool", pool)
+    monkeypatch.setattr(app, "_worker_pool_started", threading.Event())
+    monkeypatch.setattr(app.atexit, "register", lambda fn, **kwargs: shutdowns.append((fn, kwargs)))
+    # served without __main__ (e.g. by gunicorn): the first request starts the pool once
+    client = app.app.test_client()
+    for _ in range(3):
+        assert client.get("/metrics").status_code == 200
+    assert started == [1] and shutdowns == [(pool.shutdown, {"cancel_futures": True})]
+
+
+@pytest.mark.parametrize(
+    "url,req",
+    [
+        ("parsed_result", {"referenced_only": "false"}),
+        ("parsed_result", {"async": 1}),
+        ("parsed_result", {"jobs": "2"}),
+        ("parsed_result", {"jobs": 1.5}),
+        ("parsed_result", {"jobs": True}),
+        ("parsed_result", {"device_timeout": "ten"}),
+        ("topology", {"delta": "false"}),
+        ("topology", {"trace_memory": None}),
+    ],
+)
+def test_invalid_request_options(url, req, monkeypatch):
+    import app  # pylint: disable=import-outside-toplevel,import-error
+
+    # rejected before touching any snapshot
+    monkeypatch.setattr(app, "_parse_snapshot", lambda *_, **__: pytest.fail("parsed"))
+    monkeypatch.setattr(app.post_bp, "post_bgp_policy", lambda *_: pytest.fail("posted"))
+    response = app.app.test_client().post(f"/bgp_policy/test/original_asis/{url}", json=req)
+    assert response.status_code == 400 and list(req)[0] in response.get_json()["error"]
+
+
+def test_xr_translator_policy_index():
+    with open(os.path.join(EXPECTS_DIR, "cisco_ios_xr", "ttp.json"), "r", encoding="utf-8") as f:
+        xr_translator = XRTranslator(json.load(f))
+    first, second = PolicyModel(name="dup"), PolicyModel(name="dup", default={"actions": [{"target": "accept"}]})
+    xr_translator._add_policy(PolicyModel(name="other"))
+    xr_translator._add_policy(first)
+    xr_translator._add_policy(second)
+    assert xr_translator.get_policy_by_name("dup") is first
+    assert xr_translator.get_policy_by_name("not-found") is None
+
+    updated = PolicyModel(name="dup", default={"actions": [{"target": "reject"}]})
+    xr_translator.update_policy(updated)
+    assert [p.name for p in xr_translator.policies] == ["other", "dup", "dup"]
+    assert xr_translator.policies[1] is updated and xr_translator.policies[2] is second
+
+
+def test_xr_translator_set_index():
+    ttp_parsed_data = {
+        "interfaces": [{"name": "Loopback0", "ipv4": {"address": "192.168.255.1", "mask": "255.255.255.255"}}],
+        "prefix-sets": [
+            {"name": "exact", "prefixes": [{"prefix": "10.0.0.0/24"}]},
+            {"name": "ge", "prefixes": [{"prefix": "10.0.0.0/24"}, {"prefix": "10.1.0.0/16", "condition": "ge 24"}]},
+        ],
+        "community-sets": [
+            {"name": "c1", "communities": [{"community": "65000:1"}]},
+            {"name": "c2", "communities": [{"community": "65000:2"}]},
+        ],
+        "policies": [
+            {
+                "name": "rp",
+                "rules": [
+                    {
+                        "if": "if",
+                        "condition": {
+                            "op": "and",
+                            "matches": ["community matches-any c1", "community matches-any c2", "destination in ge"],
+                        },
+                        "rules": [{"action": "done"}],
+                    }
+                ],
+            }
+        ],
+        "bgp": {"asn": "65000", "neighbors": []},
+    }
+    xr_translator = XRTranslator([[ttp_parsed_data]])
+    assert xr_translator.check_prefix_list_only_exact_matchtype("exact") is True
+    assert xr_translator.check_prefix_list_only_exact_matchtype("ge") is False
+    assert xr_translator.check_prefix_list_only_exact_matchtype("not-found") is None
+    assert xr_translator.convert_prefix_list_into_route_filter("not-found") == []
+    assert xr_translator.translate_match("destination in exact") == [{"prefix-list": "exact"}]
+
+    xr_translator.translate_policies()
+    assert xr_translator.community_set[-1] == {
+        "name": "c1-and-c2",
+        "communities": [{"community": "65000:1"}, {"community": "65000:2"}],
+    }
+    if_policy = xr_translator.get_policy_by_name("if-condition-rp-10")
+    assert if_policy.statements[0].conditions == [
+        {"route-filter": {"prefix": "10.0.0.0/24", "match-type": "exact", "length": {"min": "24", "max": "24"}}},
+        {
+            "route-filter": {
+                "prefix": "10.1.0.0/16",
+                "match-type": "prefix-length-range",
+                "length": {"min": "24", "max": "32"},
+            }
+        },
+        {"community": ["c1-and-c2"]},
+    ]
+
+
+def test_xr_translator_dedupe_and_community_sets():
+    rules = [
+        {
+            "if": "if",
+            "condition": {"op": "and", "matches": ["community matches-any c1", "community matches-any c2"]},
+            "rules": [{"action": "done"}],
+        }
+    ]
+    ttp_parsed_data = {
+        "interfaces": [],
+        "community-sets": [
+            {"name": "c1", "communities": [{"community": "65000:1"}]},
+            {"name": "c2", "communities": [{"community": "65000:2"}]},
+        ],
+        "policies": [{"name": "rp-a", "rules": rules}, {"name": "rp-b", "rules": rules}],
+        "bgp": {"asn": "65000", "neighbors": []},
+    }
+    for dedupe, and_sets in [(False, 2), (True, 1)]:
+        xr_translator = XRTranslator([[ttp_parsed_data]], dedupe_conditional_policies=dedupe)
+        xr_translator.translate_policies()
+        assert [c["name"] for c in xr_translator.community_set] == ["c1", "c2"] + ["c1-and-c2"] * and_sets
+        assert xr_translator.get_policy_by_name("if-condition-rp-a-10").statements[0].conditions == [
+            {"community": ["c1-and-c2"]}
+        ]
+
+
+def test_xr_translator_dedupe_conditional_policies():
+    rules = [
+        {
+            "if": "if",
+            "condition": {"op": "state", "matches": ["destination in pfx"]},
+            "rules": [
+                {
+                    "if": "if",
+                    "condition": {"op": "state", "matches": ["community matches-any c1"]},
+                    "rules": [{"action": "set", "attr": "local-preference", "value": "200"}],
+                },
+                {"action": "done"},
+            ],
+        },
+        {"if": "else", "rules": [{"action": "drop"}]},
+    ]
+    ttp_parsed_data = {
+        "interfaces": [],
+        "prefix-sets": [{"name": "pfx", "prefixes": [{"prefix": "10.0.0.0/24"}]}],
+        "community-sets": [{"name": "c1", "communities": [{"community": "65000:1"}]}],
+        "policies": [{"name": "rp-a", "rules": rules}, {"name": "rp-b", "rules": rules}],
+        "bgp": {"asn": "65000", "neighbors": []},
+    }
+    xr_translator = XRTranslator([[ttp_parsed_data]])
+    xr_translator.translate_policies()
+    deduped_translator = XRTranslator([[ttp_parsed_data]], dedupe_conditional_policies=True)
+    deduped_translator.translate_policies()
+
+    # if/not-if pairs of the outer and the nested if, and the else policy of rp-b are shared with rp-a
+    assert deduped_translator.deduplicated_policies == 3
+    assert len(xr_translator.policies) - len(deduped_translator.policies) == 5
+    assert not [p for p in deduped_translator.policies if p.name.startswith("if-condition-rp-b")]
+    rp_b = deduped_translator.get_policy_by_name("rp-b")
+    assert [s.conditions for s in rp_b.statements] == [
+        [{"policy": "if-condition-rp-a-10-10-10"}],
+        [{"policy": "if-condition-rp-a-10"}],
+        [{"policy": "if-condition-rp-a-20-else"}],
+    ]
+    # all policy references are resolved
+    policy_names = {p.name for p in deduped_translator.policies}
+    for policy in deduped_translator.policies:
+        for statement in policy.statements:
+            assert all(c["policy"] in policy_names for c in statement.conditions if "policy" in c)
+    # other than the references, rp-b is translated as same as without dedupe
+    assert [s.actions for s in rp_b.statements] == [
+        s.actions for s in xr_translator.get_policy_by_name("rp-b").statements
+    ]
+
+
+def test_policy_model_to_dict():
+    statement = Statement(name="10", conditions=[{"policy": "p"}], actions=[{"target": "accept"}])
+    neighbor = BGPNeighbor(
+        remote_as=65001,
+        remote_ip="172.16.0.1",
+        address_families=[AddressFamily(afi="ipv4", safi="unicast", next_hop_self=True, route_policy_out="p")],
+    )
+    models = [statement, PolicyModel(name="p", statements=[statement], default={"actions": []}), neighbor]
+    for model in models + neighbor.address_families:
+        # slotted (no __dict__) and to_dict has all fields
+        assert not hasattr(model, "__dict__")
+        assert list(model.to_dict().keys()) == [f.name for f in fields(model)]
+    # same output as asdict
+    assert json.dumps(models, indent=2, cls=PMEncoder) == json.dumps([asdict(m) for m in models], indent=2)
+
+
+@pytest.mark.parametrize("output_format", ["pretty", "compact", "gzip", "ndjson"])
+def test_output_format(tmp_path, monkeypatch, output_format):
+    _setup_snapshot(tmp_path / "expect", monkeypatch)
+    parse_bgp_policy.parse_bgp_policies("test", "original_asis", parse_bgp_policy.ParseOptions())
+    monkeypatch.setattr(post_bgp_policies, "BGP_POLICIES_DIR", str(tmp_path / "expect" / "policy_model_output"))
+    expect = sorted(post_bgp_policies._read_bgp_policy_data("test", "original_asis"), key=lambda p: p["node"])
+
+    _setup_snapshot(tmp_path / output_format, monkeypatch)
+    parse_bgp_policy.parse_bgp_policies(
+        "test", "original_asis", parse_bgp_policy.ParseOptions(output_format=output_format)
+    )
+    monkeypatch.setattr(post_bgp_policies, "BGP_POLICIES_DIR", str(tmp_path / output_format / "policy_model_output"))
+    assert sorted(post_bgp_policies._read_bgp_policy_data("test", "original_asis"), key=lambda p: p["node"]) == expect
+    ttp_output_files = {
+        os_type: os.path.join(tmp_path, output_format, "ttp_output", "test", "original_asis", os_type, os_type)
+        for os_type in ["juniper", "cisco_ios_xr"]
+    }
+    for os_type, file_path_wo_ext in ttp_output_files.items():
+        with open(os.path.join(EXPECTS_DIR, os_type, "ttp.json"), "r", encoding="utf-8") as f:
+            ttp_expect = json.load(f)
+        saved_files = [f for f in os.listdir(os.path.dirname(file_path_wo_ext)) if f.startswith(f"{os_type}.")]
+        assert len(saved_files) == 1
+        assert load_json(os.path.join(os.path.dirname(file_path_wo_ext), saved_files[0])) == ttp_expect
+
+
+def test_dump_json_replaces_other_format(tmp_path):
+    data = {"node": "lo", "policies": [], "prefix-set": [{"name": "p"}, {"name": "q"}], "empty": {}}
+    dump_json(data, str(tmp_path / "r1"), "pretty")
+    assert dump_json(data, str(tmp_path / "r1"), "ndjson") == str(tmp_path / "r1.ndjson")
+    assert os.listdir(tmp_path) == ["r1.ndjson"]
+    assert load_json(str(tmp_path / "r1.ndjson")) == data
+    for data in [[], {}, [[{"a": 1}], []]]:
+        for output_format in ["compact", "gzip", "ndjson"]:
+            assert load_json(dump_json(data, str(tmp_path / "r2"), output_format)) == data
+
+
+def test_config_index(tmp_path):
+    for file_name in ["r1-backup.cfg", "r1.cfg", "R10.cfg", "a+b.(c).cfg", "sw1"]:
+        (tmp_path / file_name).write_text("")
+    index = collect_configs.ConfigIndex(str(tmp_path))
+    assert index.find("r1") == "r1.cfg"  # same stem is preferred to other files starting with the name
+    assert index.find("r10") == "R10.cfg"  # case-insensitive
+    assert index.find("r1-b") == "r1-backup.cfg"  # prefix
+    assert index.find("a+b.(c)") == "a+b.(c).cfg"  # regex metacharacters are not special
+    assert index.find("a+") == "a+b.(c).cfg"
+    assert index.find("sw1") == "sw1"
+    assert index.find("r2") is None and index.find("zz") is None
+    assert collect_configs.detect_src_file_name(str(tmp_path), "R1-BACKUP") == "r1-backup.cfg"
+
+
+@pytest.mark.parametrize("staging_mode", ["copy", "hardlink", "symlink", "none"])
+def test_copy_configs(tmp_path, monkeypatch, staging_mode):
+    src_dir = tmp_path / "src" / "test" / "original_asis" / "configs"
+    src_dir.mkdir(parents=True)
+    for os_type in ["juniper", "cisco_ios_xr"]:
+        shutil.copy(os.path.join(INPUT_DIR, f"{os_type}.conf"), src_dir / f"{os_type}-node.conf")
+    monkeypatch.setattr(collect_configs, "CONFIGS_DIR", str(tmp_path / "src"))
+    monkeypatch.setattr(collect_configs, "TTP_CONFIGS_DIR", str(tmp_path / "configs"))
+    node_props = [
+        {"Node": "juniper-node", "Configuration_Format": "JUNIPER"},
+        {"Node": "cisco_ios_xr-node", "Configuration_Format": "CISCO_IOS_XR"},
+        {"Node": "not-found", "Configuration_Format": "JUNIPER"},
+        {"Node": "l2sw", "Configuration_Format": "CISCO_IOS"},
+    ]
+    config_files = collect_configs.copy_configs("test", "original_asis", node_props, staging_mode)
+
+    if staging_mode == "none":
+        # parse source configs in place
+        expect_files = [str(src_dir / f"{os_type}-node.conf") for os_type in ["juniper", "cisco_ios_xr"]]
+        assert not (tmp_path / "configs").exists()
+    else:
+        staged_dir = tmp_path / "configs" / "test" / "original_asis"
+        expect_files = [str(staged_dir / os_type / f"{os_type}-node.conf") for os_type in ["juniper", "cisco_ios_xr"]]
+    assert config_files == list(zip(["juniper", "cisco_ios_xr"], expect_files))
+    for _, config_file in config_files:
+        assert os.path.islink(config_file) == (staging_mode == "symlink")
+        src_file = src_dir / os.path.basename(config_file)
+        assert os.path.samefile(config_file, src_file) == (staging_mode in ["hardlink", "symlink", "none"])
+        with open(config_file, "rb") as f:
+            assert f.read() == src_file.read_bytes()
+    # staging again (without cleanup) replaces staged files
+    assert collect_configs.copy_configs("test", "original_asis", node_props, staging_mode) == config_files
+
+
+@pytest.fixture
+def model_conductor():
+    """Local stand-in of model-conductor: records posted bodies, fails requests while fail_count > 0"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    server.posts = []
+    server.fail_count = 0
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):  # pylint: disable=invalid-name
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            with lock:
+                failed = server.fail_count > 0
+                server.fail_count -= 1
+                if not failed:
+                    if self.headers.get("Content-Encoding") == "gzip":
+                        body = gzip.decompress(body)
+                    server.posts.append({"path": self.path, "headers": dict(self.headers), "body": body})
+            self.send_response(503 if failed else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            pass
+
+    server.RequestHandlerClass = Handler
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_post_bgp_policy_batches(tmp_path, monkeypatch, model_conductor):
+    policy_dir = tmp_path / "test" / "original_asis"
+    policy_dir.mkdir(parents=True)
+    for i in range(20):
+        policy = {"node": f"192.168.0.{i}", "policies": [], "prefix-set": [], "as-path-set": [], "community-set": []}
+        dump_json(policy, str(policy_dir / f"r{i:02d}"))
+    monkeypatch.setattr(post_bgp_policies, "BGP_POLICIES_DIR", str(tmp_path))
+    monkeypatch.setattr(post_bgp_policies, "MODEL_CONDUCTOR_HOST", f"127.0.0.1:{model_conductor.server_port}")
+
+    response = post_bgp_policies.post_bgp_policy("test", "original_asis", mode="single")
+    assert response.status_code == 200
+    single_post = model_conductor.posts.pop()
+    expect_nodes = json.loads(single_post["body"])["node"]
+
+    # failed posts are retried
+    model_conductor.fail_count = 2
+    responses = post_bgp_policies.post_bgp_policy_batches(
+        "test", "original_asis", max_bytes=1000, concurrency=2, retries=3, backoff=0
+    )
+    assert len(responses) > 1 and all(r.status_code == 200 for r in responses)
+    posts = model_conductor.posts
+    assert len(posts) == len(responses)
+    assert all(p["path"] == single_post["path"] and p["headers"]["Content-Encoding"] == "gzip" for p in posts)
+    assert all(len(p["body"]) <= 1000 for p in posts)
+    batched_nodes = [node for p in posts for node in json.loads(p["body"])["node"]]
+    assert sorted(batched_nodes, key=lambda n: n["node-id"]) == sorted(expect_nodes, key=lambda n: n["node-id"])
+
+    # a batch without compression is same as single post
+    model_conductor.posts.clear()
+    responses = post_bgp_policies.post_bgp_policy_batches("test", "original_asis", max_bytes=10**6, compress=False)
+    assert len(responses) == 1 and model_conductor.posts[0]["body"] == single_post["body"]
+
+    # failure after retries is returned
+    model_conductor.fail_count = 100
+    response = post_bgp_policies.post_bgp_policy("test", "original_asis", mode="batch")
+    assert response.status_code == 503
+
+
+def test_post_bgp_policy_delta(tmp_path, monkeypatch, model_conductor):
+    policy_dir = tmp_path / "test" / "original_asis"
+    policy_dir.mkdir(parents=True)
+    policies = {
+        f"r{i}": {"node": f"192.168.0.{i}", "policies": [], "prefix-set": [], "as-path-set": [], "community-set": []}
+        for i in range(5)
+    }
+    for name, policy in policies.items():
+        dump_json(policy, str(policy_dir / name))
+    monkeypatch.setattr(post_bgp_policies, "BGP_POLICIES_DIR", str(tmp_path))
+    monkeypatch.setattr(post_bgp_policies, "MODEL_CONDUCTOR_HOST", f"127.0.0.1:{model_conductor.server_port}")
+
+    # first delta post (without manifest): all nodes
+    result = post_bgp_policies.post_bgp_policy_delta("test", "original_asis", mode="single")
+    assert result["status"] == 200 and len(result["posted"]) == 5 and not result["unchanged"]
+    assert (tmp_path / "test" / "original_asis.posted.json").exists()
+
+    # nothing changed: nothing is posted
+    model_conductor.posts.clear()
+    result = post_bgp_policies.post_bgp_policy_delta("test", "original_asis", mode="single")
+    assert result["status"] is None and not result["posted"] and len(result["unchanged"]) == 5
+    assert not model_conductor.posts
+
+    # a node changed and a node removed
+    policies["r1"]["prefix-set"] = [{"name": "ps-1", "prefixes": [{"prefix": "10.0.0.0/8"}]}]
+    dump_json(policies["r1"], str(policy_dir / "r1"))
+    os.remove(policy_dir / "r4.json")
+    for mode in ["single", "batch"]:
+        model_conductor.fail_count = 1 if mode == "single" else 0
+        result = post_bgp_policies.post_bgp_policy_delta("test", "original_asis", mode=mode)
+        assert result["posted"] == ["192.168.0.1"] and result["removed"] == ["192.168.0.4"]
+        assert result["unchanged"] == ["192.168.0.0", "192.168.0.2", "192.168.0.3"]
+        # failed post is posted again next time
+        assert result["status"] == (503 if mode == "single" else 200)
+    expect = {"node": [post_bgp_policies._convert_policy(policies["r1"])]}
+    assert json.loads(model_conductor.posts[-1]["body"]) == expect
+
+    result = post_bgp_policies.post_bgp_policy_delta("test", "original_asis", mode="single")
+    assert result["status"] is None and not result["removed"] and len(result["unchanged"]) == 4
+
+    # full post resets the manifest, another model-conductor has no manifest
+    policies["r2"]["as-path-set"] = [{"name": "aspath-2", "as-path": {"pattern": "_65001$"}}]
+    dump_json(policies["r2"], str(policy_dir / "r2"))
+    assert post_bgp_policies.post_bgp_policy("test", "original_asis", mode="single").status_code == 200
+    assert post_bgp_policies.post_bgp_policy_delta("test", "original_asis")["status"] is None
+    monkeypatch.setattr(post_bgp_policies, "MODEL_CONDUCTOR_HOST", f"localhost:{model_conductor.server_port}")
+    assert len(post_bgp_policies.post_bgp_policy_delta("test", "original_asis")["posted"]) == 4
+
+
+def test_stage_recorder():
+    recorder = StageRecorder(trace_memory=True)
+    for _ in range(2):
+        with recorder.stage("alloc") as stage:
+            data = bytearray(4 * 1024**2)
+            stage["bytes_out"] += len(data)
+            del data
+    with recorder.stage("sleep", trace_memory=False):
+        time.sleep(0.01)
+    stages = recorder.to_dict()
+    assert stages["alloc"]["count"] == 2 and stages["alloc"]["bytes_out"] == 8 * 1024**2
+    assert stages["alloc"]["peak_memory"] >= 4 * 1024**2
+    assert stages["sleep"]["cpu_time"] < 0.01 <= stages["sleep"]["wall_time"]
+    assert stages["sleep"]["peak_memory"] is None
+
+    merged = merge_stages([stages, {"alloc": {**stages["alloc"], "peak_memory": 1}}])
+    assert merged["alloc"]["count"] == 4 and merged["alloc"]["peak_memory"] == stages["alloc"]["peak_memory"]
+    assert merged["sleep"] == stages["sleep"]
+
+
+def test_stage_recorder_nested_and_concurrent():
+    recorder = StageRecorder(trace_memory=True)
+    with recorder.stage("outer"):
+        data = bytearray(8 * 1024**2)
+        del data
+        # inner stage must not reset peak of the outer stage
+        with recorder.stage("inner"):
+            data = bytearray(2 * 1024**2)
+            del data
+    stages = recorder.to_dict()
+    assert stages["outer"]["peak_memory"] >= 8 * 1024**2
+    assert 1024**2 <= stages["inner"]["peak_memory"] < 8 * 1024**2
+    assert not tracemalloc.is_tracing()
+
+    # stages in other threads (concurrent jobs) must not stop tracing of each other
+    recorders = [StageRecorder(trace_memory=True) for _ in range(4)]
+    barrier = threading.Barrier(len(recorders))
+
+    def _alloc(thread_recorder):
+        with thread_recorder.stage("alloc"):
+            barrier.wait(10)
+            data = bytearray(2 * 1024**2)
+            del data
+            barrier.wait(10)
+
+    threads = [threading.Thread(target=_alloc, args=(r,)) for r in recorders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(r.to_dict()["alloc"]["peak_memory"] >= 1024**2 for r in recorders)
+    assert not tracemalloc.is_tracing()
+
+
+def test_run_manifest(tmp_path, monkeypatch, model_conductor):
+    _setup_snapshot(tmp_path, monkeypatch)
+    monkeypatch.setattr(post_bgp_policies, "BGP_POLICIES_DIR", str(tmp_path / "policy_model_output"))
+    monkeypatch.setattr(post_bgp_policies, "MODEL_CONDUCTOR_HOST", f"127.0.0.1:{model_conductor.server_port}")
+    summary = parse_bgp_policy.parse_bgp_policies(
+        "test", "original_asis", parse_bgp_policy.ParseOptions(prescreen=True)
+    )
+
+    stages = summary["stages"]
+    assert stages["parse"]["count"] == 1 and stages["prescreen"]["count"] == 4
+    assert stages["read"]["count"] == stages["ttp_parse"]["count"] == stages["convert"]["count"] == 2
+    config_bytes = sum(os.path.getsize(os.path.join(INPUT_DIR, f"{t}.conf")) for t in ["juniper", "cisco_ios_xr"])
+    assert stages["read"]["bytes_in"] == stages["ttp_parse"]["bytes_in"] == config_bytes
+    model_files = glob.glob(str(tmp_path / "policy_model_output" / "test" / "original_asis" / "*"))
+    assert stages["save_policy_model"]["bytes_out"] == sum(os.path.getsize(f) for f in model_files)
+
+    manifest = read_run_manifest("test", "original_asis", str(tmp_path / "policy_model_output"))
+    assert summary["manifest"] == str(tmp_path / "policy_model_output" / "test" / "original_asis.manifest.json")
+    summary_wo_path = {k: v for k, v in summary.items() if k != "manifest"}
+    assert manifest["summary"] == summary_wo_path and manifest["options"]["jobs"] == 1
+    devices = {d["device"]: d for d in manifest["devices"]}
+    assert "ttp_parse" not in devices["juniper_unuse_bgp"]["stages"] and "ttp_parse" in devices["juniper"]["stages"]
+
+    # post adds its stages into the manifest
+    recorder = StageRecorder()
+    assert post_bgp_policies.post_bgp_policy("test", "original_asis", mode="single", recorder=recorder).ok
+    manifest = read_run_manifest("test", "original_asis", str(tmp_path / "policy_model_output"))
+    assert manifest["summary"] == summary_wo_path and manifest["post"]["stages"] == recorder.to_dict()
+    assert manifest["post"]["stages"]["post_read"]["bytes_in"] == stages["save_policy_model"]["bytes_out"]
+    assert manifest["post"]["stages"]["post_send"]["bytes_out"] == len(model_conductor.posts[0]["body"])
+
+
+def test_metrics_registry():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", "Test counter", ["os_type"])
+    histogram = registry.histogram("test_seconds", "Test histogram", ["os_type"], [0.1, 1])
+    counter.inc(os_type="juniper")
+    counter.inc(2, os_type="juniper")
+    for value in [0.05, 0.5, 5]:
+        histogram.observe(value, os_type='cisco"xr')
+    with pytest.raises(ValueError):
+        counter.inc(-1, os_type="juniper")
+    with pytest.raises(ValueError):
+        counter.inc(status="ok")
+    with pytest.raises(ValueError):
+        registry.counter("test_total", "Duplicated")
+
+    assert registry.render() == "".join(
+        f"{line}\n"
+        for line in [
+            "# HELP test_total Test counter",
+            "# TYPE test_total counter",
+            'test_total{os_type="juniper"} 3',
+            "# HELP test_seconds Test histogram",
+            "# TYPE test_seconds histogram",
+            'test_seconds_bucket{os_type="cisco\\"xr",le="0.1"} 1',
+            'test_seconds_bucket{os_type="cisco\\"xr",le="1"} 2',
+            'test_seconds_bucket{os_type="cisco\\"xr",le="+Inf"} 3',
+            'test_seconds_sum{os_type="cisco\\"xr"} 5.55',
+            'test_seconds_count{os_type="cisco\\"xr"} 3',
+        ]
+    )
+
+    # bounds are inclusive, +Inf bucket is added once, NaN is rejected
+    histogram = registry.histogram("test_bounds_seconds", "Test bounds", buckets=[1, math.inf])
+    for value in [1, math.inf]:
+        histogram.observe(value)
+    with pytest.raises(ValueError):
+        histogram.observe(math.nan)
+    assert histogram.buckets == [1, math.inf] and histogram.count() == 2
+    assert 'test_bounds_seconds_bucket{le="1"} 1\ntest_bounds_seconds_bucket{le="+Inf"} 2\n' in registry.render()
+
+
+def test_metrics_endpoint(tmp_path, monkeypatch):
+    from app import app  # pylint: disable=import-outside-toplevel,import-error
+
+    # default dirs of the tools are relative to the current directory
+    monkeypatch.chdir(tmp_path)
+    # source configs: CONFIGS_DIR is same as TTP_CONFIGS_DIR (cleaned up before parse) by default
+    monkeypatch.setattr(collect_configs, "CONFIGS_DIR", str(tmp_path / "src"))
+    src_dir = tmp_path / "src" / "test" / "original_asis" / "configs"
+    src_dir.mkdir(parents=True)
+    queries_dir = tmp_path / "queries" / "test" / "original_asis"
+    queries_dir.mkdir(parents=True)
+    nodes = {"juniper": "JUNIPER", "juniper_unuse_bgp": "JUNIPER", "cisco_ios_xr": "CISCO_IOS_XR"}
+    for node in nodes:
+        shutil.copy(os.path.join(INPUT_DIR, f"{node}.conf"), src_dir)
+    (queries_dir / "node_props.csv").write_text(
+        "Node,Configuration_Format\n" + "".join(f"{node},{os_type}\n" for node, os_type in nodes.items())
+    )
+    devices = metrics.PARSED_DEVICES.value(os_type="juniper", status="converted")
+    ttp_parses = metrics.CONFIG_PARSE_DURATION.count(os_type="cisco_ios_xr", backend="ttp")
+    policy_model_bytes = metrics.OUTPUT_BYTES.value(output="policy_model")
+
+    client = app.test_client()
+    response = client.post(
+        "/bgp_policy/test/original_asis/parsed_result", json={"staging_mode": "none", "prescreen": True}
+    )
+    assert response.status_code == 200
+    assert metrics.PARSED_DEVICES.value(os_type="juniper", status="converted") == devices + 1
+    assert metrics.PARSED_DEVICES.value(os_type="juniper", status="skipped") >= 1
+    assert metrics.CONFIG_PARSE_DURATION.count(os_type="cisco_ios_xr", backend="ttp") == ttp_parses + 1
+    assert metrics.OUTPUT_BYTES.value(output="policy_model") == policy_model_bytes + sum(
+        os.path.getsize(f) for f in glob.glob(str(tmp_path / "policy_model_output" / "test" / "original_asis" / "*"))
+    )
+
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.content_type == metrics.CONTENT_TYPE
+    body = response.get_data(as_text=True)
+    assert "# TYPE mddo_http_request_duration_seconds histogram" in body
+    endpoint = 'endpoint="/bgp_policy/<network>/<snapshot>/parsed_result"'
+    assert f'mddo_http_request_duration_seconds_count{{method="POST",{endpoint},status="200"}}' in body
+
+
+def test_trace_sampler(tmp_path):
+    logger = logging.getLogger("test_trace_sampler")
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger.addHandler(handler)
+    trace = TraceSampler(logger, sample=3)
+
+    class _Costly:
+        def __str__(self):
+            raise AssertionError("formatted even if TRACE is disabled")
+
+    logger.setLevel(logging.DEBUG)
+    for _ in range(5):
+        trace("rule: %s", _Costly())
+    assert not records
+    logger.setLevel(TRACE)
+    for i in range(7):
+        trace("rule: %s", i)
+    assert [r.getMessage() for r in records] == ["rule: 0", "rule: 3", "rule: 6"]
+    assert records[0].levelname == "TRACE" and records[0].funcName == "test_trace_sampler"
+    logger.removeHandler(handler)
+
+    # no log file unless specified
+    main_logger = logging.getLogger("main")
+    handlers, level, propagate = main_logger.handlers[:], main_logger.level, main_logger.propagate
+    try:
+        setup_logging("INFO", str(tmp_path / "parser.log"))
+        setup_logging("INFO", str(tmp_path / "parser.log"))
+        assert len(main_logger.handlers) == 2 and main_logger.level == logging.INFO
+        main_logger.info("logged")
+        assert "logged" in (tmp_path / "parser.log").read_text()
+        setup_logging("WARNING")
+        assert [type(h) for h in main_logger.handlers] == [logging.StreamHandler]
+        with pytest.raises(ValueError):
+            setup_logging("VERBOSE")
+    finally:
+        for h in main_logger.handlers:
+            main_logger.removeHandler(h)
+        for h in handlers:
+            main_logger.addHandler(h)
+        main_logger.setLevel(level)
+        main_logger.propagate = propagate
+
+
+def test_worker_pool(tmp_path, monkeypatch):
+    _setup_snapshot(tmp_path / "serial", monkeypatch)
+    parse_bgp_policy.parse_bgp_policies("test", "original_asis", parse_bgp_policy.ParseOptions(jobs=1))
+    serial_outputs = _read_outputs(tmp_path / "serial")
+
+    _setup_snapshot(tmp_path / "pool", monkeypatch)
+    # spawned workers use default output dirs (relative to the current directory)
+    monkeypatch.chdir(tmp_path / "pool")
+    pool = WorkerPool(2, max_tasks_per_child=2).start()
+    try:
+        for _ in range(2):
+            summary = parse_bgp_policy.parse_bgp_policies(
+                "test", "original_asis", parse_bgp_policy.ParseOptions(jobs=1), executor=pool
+            )
+            assert summary["devices"] == 4 and _read_outputs(tmp_path / "pool") == serial_outputs
+        # workers are replaced after 2 tasks
+        pids = [pool.submit(os.getpid).result() for _ in range(6)]
+        assert len(set(pids)) >= 3 and os.getpid() not in pids
+    finally:
+        pool.shutdown()
+
+
+def test_killable_pool():
+    with KillablePool(2) as pool:
+        pid = pool.submit(os.getpid).result()
+        future = pool.submit_with_timeout(0.5, time.sleep, 30)
+        assert pool.submit_with_timeout(10, os.getpid).result() != os.getpid()
+        with pytest.raises(WorkerTimeout) as e:
+            future.result(timeout=10)
+        assert 0.5 <= e.value.elapsed < 10
+        with pytest.raises(ValueError):
+            pool.submit(int, "not a number").result()
+        # a killed worker is replaced by the next task
+        pids = {pool.submit(os.getpid).result() for _ in range(4)}
+        assert pid in pids and len(pids) == 2
+        with pytest.raises(WorkerDied) as e:
+            pool.submit(os._exit, 3).result(timeout=10)
+        assert e.value.exitcode == 3 and isinstance(e.value, BrokenProcessPool)
+        # so is a died worker
+        assert pool.submit(os.getpid).result() != os.getpid()
+
+
+def test_parse_bgp_policies_device_timeout(tmp_path, monkeypatch):
+    _setup_snapshot(tmp_path, monkeypatch)
+    ttp_parse = parse_bgp_policy._ttp_parse
+
+    def _slow_ttp_parse(text, os_type):
+        if os_type == "juniper":
+            time.sleep(30)
+        return ttp_parse(text, os_type)
+
+    # forked workers use the patched function
+    monkeypatch.setattr(parse_bgp_policy, "_ttp_parse", _slow_ttp_parse)
+    start = time.perf_counter()
+    options = parse_bgp_policy.ParseOptions(jobs=1, device_timeout=1, prescreen=True)
+    summary = parse_bgp_policy.parse_bgp_policies("test", "original_asis", options)
+
+    assert time.perf_counter() - start < 20
+    assert summary["status"] == {"skipped": 2, "failed": 1, "converted": 1}
+    assert summary["failed"] == [
+        {"device": "juniper", "error": "WorkerTimeout: timed out after 1 sec (worker killed)"}
+    ]
+    manifest = read_run_manifest("test", "original_asis", str(tmp_path / "policy_model_output"))
+    devices = {d["device"]: d for d in manifest["devices"]}
+    assert devices["juniper"]["elapsed"] >= 1 and devices["cisco_ios_xr"]["status"] == "converted"
+
+
+def test_parse_bgp_policies_worker_died(tmp_path, monkeypatch):
+    _setup_snapshot(tmp_path, monkeypatch)
+    ttp_parse = parse_bgp_policy._ttp_parse
+
+    def _dying_ttp_parse(text, os_type):
+        if os_type == "juniper":
+            os._exit(1)
+        return ttp_parse(text, os_type)
+
+    # forked workers use the patched function
+    monkeypatch.setattr(parse_bgp_policy, "_ttp_parse", _dying_ttp_parse)
+    options = parse_bgp_policy.ParseOptions(jobs=1, device_timeout=30, prescreen=True)
+    summary = parse_bgp_policy.parse_bgp_policies("test", "original_asis", options)
+
+    assert summary["status"] == {"skipped": 2, "failed": 1, "converted": 1}
+    assert summary["failed"] == [
+        {"device": "juniper", "error": "WorkerDied: worker process exited while running a task (exit code: 1)"}
+    ]
+    manifest = read_run_manifest("test", "original_asis", str(tmp_path / "policy_model_output"))
+    devices = {d["device"]: d for d in manifest["devices"]}
+    assert devices["juniper"]["elapsed"] > 0 and devices["cisco_ios_xr"]["status"] == "converted"
+
+
+# generated configs for differential tests of native parsers (TTP returns a dict for a group matched once
+# unless the group is a list)
+GENERATED_SPECS = {
+    "generated": ConfigSpec(prefix_lists=50, policies=20, terms=3, depth=3, communities=50, neighbors=16, seed=1),
+    "generated-0-items": ConfigSpec(prefix_lists=0, policies=0, communities=0, neighbors=0),
+    "generated-1-item": ConfigSpec(prefix_lists=1, policies=1, terms=1, depth=1, communities=1, neighbors=1),
+    "generated-1-policy-0-neighbors": ConfigSpec(prefix_lists=3, policies=1, depth=3, communities=3, neighbors=0),
+    "generated-0-policies-1-neighbor": ConfigSpec(prefix_lists=1, policies=0, communities=1, neighbors=1),
+}
+
+
+@pytest.mark.parametrize(
+    "file_name", ["juniper.conf", "juniper_unuse_bgp.conf", "juniper_edge_cases.conf", "empty", *GENERATED_SPECS]
+)
+def test_junos_parser_same_as_ttp(file_name):
+    if file_name == "empty":
+        config_txt = "system {\n    host-name empty;\n}\n"
+    elif file_name in GENERATED_SPECS:
+        config_txt = generate_config("juniper", GENERATED_SPECS[file_name])
+    else:
+        with open(os.path.join(INPUT_DIR, file_name), "r", encoding="utf-8") as f:
+            config_txt = f.read()
+    # differential test: native parser must return same structure as TTP template
+    expect = parse_bgp_policy._ttp_parse(config_txt, "juniper")
+    assert parse_junos_config(config_txt) == expect
+    if file_name == "generated-1-item":
+        # a single policy is a list too (converted as a policy, not as keys of a dict)
+        assert [p["name"] for p in _convert_juniper_ttp_to_policy_model(expect)["policies"]] == ["pol-0"]
+
+
+@pytest.mark.parametrize("file_name", ["cisco_ios_xr.conf", "cisco_ios_xr_unuse_bgp.conf", "empty", *GENERATED_SPECS])
+def test_xr_parser_same_as_ttp(file_name):
+    if file_name == "empty":
+        config_txt = "hostname empty\n"
+    elif file_name in GENERATED_SPECS:
+        config_txt = generate_config("cisco_ios_xr", GENERATED_SPECS[file_name])
+    else:
+        with open(os.path.join(INPUT_DIR, file_name), "r", encoding="utf-8") as f:
+            config_txt = f.read()
+    expect = parse_bgp_policy._ttp_parse(config_txt, "cisco_ios_xr")
+    # differences from TTP (see parse_xr_config): template variables, keys always set
+    expect[0][0].pop("vars", None)
+    if "bgp" in expect[0][0]:
+        expect[0][0]["bgp"].setdefault("neighbors", [])
+        expect[0][0].setdefault("policies", [])
+    assert parse_xr_config(config_txt) == expect
+
+
+def test_xr_parser_edge_cases():
+    with open(os.path.join(INPUT_DIR, "cisco_ios_xr_edge_cases.conf"), "r", encoding="utf-8") as f:
+        parsed_data = parse_xr_config(f.read())
+    data = parsed_data[0][0]
+    # comments and trailing commas are not parsed as set entries
+    assert data["prefix-sets"][1]["prefixes"][0] == {"prefix": "10.0.0.0/8", "condition": "ge 16 le 24"}
+    assert data["as-path-sets"][0]["conditions"] == [{"pattern": "^65000_"}, {"condition": "ge", "length": "10"}]
+    assert [c["community"] for c in data["community-sets"][0]["communities"]] == ["65000:1", "65000:.*", "65001:.*"]
+    # empty blocks have keys read by XRTranslator
+    policy = data["policies"][2]
+    assert policy["rules"][0] == {
+        "if": "if",
+        "condition": {"op": "state", "matches": ["destination in pl1"]},
+        "rules": [],
+    }
+    assert policy["rules"][-2] == {"action": "set", "attr": "med", "value": "100"}
+    assert data["bgp"]["neighbors"][0]["address-families"][1] == {"afi": "ipv6", "safi": "unicast", "configs": {}}
+    # neighbors in neighbor-groups/vrfs are not used
+    assert [n["remote-ip"] for n in data["bgp"]["neighbors"]] == ["10.0.0.2", "10.0.0.3", "10.0.0.4"]
+    assert parse_bgp_policy._convert_cisco_ios_xr_ttp_result(parsed_data, "edge_cases")["node"] == "192.168.255.9"
+
+
+def test_parse_bgp_policies_native_backend(tmp_path, monkeypatch):
+    _setup_snapshot(tmp_path, monkeypatch, unuse_bgp=False)
+
+    outputs = {}
+    for backend in ["ttp", "native"]:
+        options = parse_bgp_policy.ParseOptions(cache_dir="", parser_backend=backend)
+        summary = parse_bgp_policy.parse_bgp_policies("test", "original_asis", options)
+        assert summary["status"] == {"converted": 2}
+        outputs[backend] = {
+            os.path.basename(f): load_json(f)
+            for f in glob.glob(os.path.join(tmp_path, "policy_model_output", "test", "*", "*"))
+        }
+        if backend == "native":
+            assert summary["stages"]["native_parse"]["count"] == 2 and "ttp_parse" not in summary["stages"]
+    assert outputs["ttp"] == outputs["native"]
+    assert parse_bgp_policy.ParseOptions(parser_backend="native").cache_variants() != (
+        parse_bgp_policy.ParseOptions(parser_backend="ttp").cache_variants()
+    )
+    with pytest.raises(ValueError):
+        parse_bgp_policy._parse_config("", "juniper", "unknown")
+
+
+def test_policy_references():
+    assert {"pset", "param-policy"} <= reference_names(
+        {"rules": [{"condition": "destination in pset"}, {"action": "apply", "value": "param-policy(100)"}]}
+    )
+    policies = {
+        "root": {"rules": ["apply child"]},
+        "child(p)": {"rules": ["apply grandchild"]},
+        "grandchild": {"rules": []},
+        "unused": {"rules": ["apply root"]},
+    }
+    assert reachable_policies(policies, ["root", "missing"]) == {"root", "child(p)", "grandchild"}
+
+    policy_model = {
+        "policies": [
+            {"name": "root", "conditions": [{"prefix-list": "pset"}, {"as-path-group": "as-path-in-group"}]},
+            {"name": "unused", "conditions": [{"community": "cset"}]},
+        ],
+        "prefix-set": [{"name": "pset"}, {"name": "unused-pset"}],
+        "as-path-set": [{"group-name": "group", "as-path": [{"name": "as-path-in-group", "pattern": ".*"}]}],
+        "community-set": [{"name": "cset"}],
+    }
+    assert prune_policy_model(policy_model, ["root"]) == {
+        "policies": ["unused"],
+        "prefix-set": ["unused-pset"],
+        "as-path-set": [],
+        "community-set": ["cset"],
+    }
+    assert [p["name"] for p in policy_model["policies"]] == ["root"]
+    assert [s["name"] for s in policy_model["prefix-set"]] == ["pset"]
+    assert policy_model["community-set"] == []
+
+
+def test_bgp_policy_references():
+    with open(os.path.join(INPUT_DIR, "juniper.conf"), "r", encoding="utf-8") as f:
+        assert bgp_policy_references(f.read()) == [
+            "ibgp-export",
+            "as65520-peer-in1-tyo-ipv4",
+            "as65550-peer-in1-tyo-ipv4",
+            "as65550-peer-out1-tyo-ipv4",
+        ]
+    config = """
+routing-instances {
+    vrf1 {
+        protocols {
+            bgp {
+                group g1 {
+                    neighbor 10.0.0.1 {
+                        import [ in1 in2 ];
+                    }
+                    inactive: export out1;
+                }
+                group g2 {
+                    export out2;
+                }
+            }
+        }
+    }
+}
+"""
+    # in order of the config
+    assert bgp_policy_references(config) == ["in1", "in2", "out2"]
+
+
+def test_xr_bgp_policy_references():
+    with open(os.path.join(INPUT_DIR, "cisco_ios_xr_edge_cases.conf"), "r", encoding="utf-8") as f:
+        config = f.read()
+    # neighbor-group, neighbor and vrf neighbor
+    assert xr_bgp_policy_references(config) == ["p1"]
+    config = config.replace(
+        "route-policy p1 in\n  !\n !\n neighbor 10.0.0.2", "route-policy grp-only in\n  !\n !\n neighbor 10.0.0.2"
+    )
+    config = config.replace("route-policy p1 out", "route-policy vrf-only(10) out")
+    assert xr_bgp_policy_references(config) == ["grp-only", "p1", "vrf-only(10)"]
+
+
+def test_xr_translator_root_policies():
+    with open(os.path.join(INPUT_DIR, "cisco_ios_xr.conf"), "r", encoding="utf-8") as f:
+        config = f.read()
+    parsed = parse_xr_config(config)
+    translator = XRTranslator(parsed)
+    translator.translate_policies()
+    pruned = XRTranslator(parsed, root_policies=xr_bgp_policy_references(config))
+    pruned.translate_policies()
+    assert pruned.unreferenced["policies"] == ["POI-East_in"]
+    assert "poi" in pruned.unreferenced["community-set"]
+    # policies used by neighbors (and policies/sets they reference) are not changed
+    policy_names = [p.name for p in pruned.policies]
+    assert policy_names == [p.name for p in translator.policies if p.name != "POI-East_in"]
+    assert pruned.bgp_neighbors == translator.bgp_neighbors
+    assert [s["name"] for s in pruned.prefix_set] == [
+        s["name"] for s in translator.prefix_set if s["name"] not in pruned.unreferenced["prefix-set"]
+    ]
+
+
+def _add_group_and_vrf_policies(work_dir) -> None:
+    """Add policies used only by a routing-instance (juniper) and a neighbor-group/vrf neighbor (cisco_ios_xr)"""
+    config_dir = os.path.join(work_dir, "configs", "test", "original_asis")
+    juniper_config = os.path.join(config_dir, "juniper", "juniper.conf")
+    with open(juniper_config, "r", encoding="utf-8") as f:
+        config = f.read()
+    config = config.replace(
+        "policy-options {\n", "policy-options {\n    policy-statement vrf-in {\n        then reject;\n    }\n", 1
+    )
+    config += "routing-instances {\n    vrf1 {\n        protocols {\n            bgp {\n                group g1 {\n"
+    config += "                    import vrf-in;\n                }\n            }\n        }\n    }\n}\n"
+    with open(juniper_config, "w", encoding="utf-8") as f:
+        f.write(config)
+
+    xr_config = os.path.join(config_dir, "cisco_ios_xr", "cisco_ios_xr.conf")
+    with open(xr_config, "r", encoding="utf-8") as f:
+        config = f.read()
+    policies = "route-policy grp-only\n  drop\nend-policy\n!\nroute-policy vrf-only\n  pass\nend-policy\n!\n"
+    bgp = (
+        " neighbor-group RR\n  address-family ipv4 unicast\n   route-policy grp-only in\n  !\n !\n"
+        " vrf A\n  neighbor 10.9.0.1\n   address-family ipv4 unicast\n    route-policy vrf-only out\n   !\n  !\n !\n"
+    )
+    config = config.replace("router bgp 65500\n", f"{policies}router bgp 65500\n{bgp}", 1)
+    with open(xr_config, "w", encoding="utf-8") as f:
+        f.write(config)
+
+
+@pytest.mark.parametrize("filter_config", [False, True])
+def test_parse_bgp_policies_referenced_only(tmp_path, monkeypatch, filter_config):
+    _setup_snapshot(tmp_path, monkeypatch, unuse_bgp=False)
+    _add_group_and_vrf_policies(tmp_path)
+
+    options = parse_bgp_policy.ParseOptions(
+        cache_dir=str(tmp_path / "cache"), referenced_only=True, filter_config=filter_config
+    )
+    summary = parse_bgp_policy.parse_bgp_policies("test", "original_asis", options)
+    assert summary["status"] == {"converted": 2}
+    assert summary["unreferenced"]["cisco_ios_xr"]["policies"] == ["POI-East_in"]
+    assert summary["unreferenced"]["juniper"]["policies"] == []
+    assert summary["unreferenced"]["juniper"]["as-path-set"] == ["multiple-as-path"]
+    output_dir = os.path.join(tmp_path, "policy_model_output", "test", "original_asis")
+    policy_model = load_json(os.path.join(output_dir, "juniper.json"))
+    assert "multiple-as-path" not in [s["group-name"] for s in policy_model["as-path-set"]]
+    assert "vrf-in" in [p["name"] for p in policy_model["policies"]]
+    policy_model = load_json(os.path.join(output_dir, "cisco_ios_xr.json"))
+    assert {"grp-only", "vrf-only"} <= {p["name"] for p in policy_model["policies"]}
+
+    # unreferenced objects are restored from parse cache
+    cached = parse_bgp_policy.parse_bgp_policies("test", "original_asis", options)
+    assert cached["cache"]["hits"] == 2
+    assert cached["unreferenced"] == summary["unreferenced"]
+    assert options.cache_variants() != parse_bgp_policy.ParseOptions().cache_variants()
+    assert "unreferenced" not in parse_bgp_policy.parse_bgp_policies(
+        "test", "original_asis", parse_bgp_policy.ParseOptions(cache_dir="")
+    )